@@ -1,127 +1,159 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify
 try:
     from flask_cors import CORS
 except Exception:
     CORS = None
-import pickle
+import importlib.util
 import numpy as np
 import os
-import sqlite3
+import atexit
 import json
 import csv
+import hashlib
+import io
+import threading
+import time
 from datetime import datetime
 
-# SHAP for model explainability
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
+from event_hub import EventHub, sse_stream
+from explain_service import ExplanationService
+from feature_pipeline import feature_matrix, pipeline_for
+from history_store import HISTORY_FIELDS, SUMMARY_COLUMNS, HistoryStore, history_row, risk_label
+from instrumentation import metrics, stage
+from market_data import MarketDataService, live_metrics
+from model_pool import BANKRUPTCY, FDI, ModelPool, pipeline_loader
+from model_registry import ModelRegistry, load_metadata
+from prediction_cache import PredictionCache, vector_key
+from sample_store import SampleStore
+from scoring_scheduler import ScoringScheduler
+from warmup import Warmup
+
+# SHAP for model explainability; imported when the first explainer is built
+SHAP_AVAILABLE = importlib.util.find_spec('shap') is not None
+if not SHAP_AVAILABLE:
     print("⚠️ SHAP not installed. Install with: pip install shap")
 
-# yfinance for real-time financial data
-try:
-    import yfinance as yf
-    YFINANCE_AVAILABLE = True
-except ImportError:
-    YFINANCE_AVAILABLE = False
-    print("⚠️ yfinance not installed. Install with: pip install yfinance")
-
-app = Flask(__name__)
-if CORS:
-    CORS(app)
+# routes; create_app() registers them on a Flask app
+api = Blueprint('api', __name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, "models")
-MODEL_META_PATH = os.path.join(MODEL_DIR, "model_metadata.json")
 
 # -----------------------------
-# Load model and assets
+# DB (predictions history)
 # -----------------------------
-with open(os.path.join(MODEL_DIR, "rf_model.pkl"), "rb") as f:
-    model = pickle.load(f)
+DB_PATH = os.environ.get('FINSENTINAL_DB_PATH', os.path.join(BASE_DIR, 'data', 'predictions.db'))
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-with open(os.path.join(MODEL_DIR, "scaler.pkl"), "rb") as f:
-    scaler = pickle.load(f)
+history_store = HistoryStore(DB_PATH)
 
-with open(os.path.join(MODEL_DIR, "feature_cols.pkl"), "rb") as f:
-    feature_cols = pickle.load(f)
+# fan-out of committed predictions to /history/stream clients; the store's tail
+# thread feeds it rows committed by every worker and script, not just this process
+history_hub = EventHub()
 
-print("✅ Model, scaler, and features loaded successfully.")
 
-# Initialize SHAP explainer for feature importance
-shap_explainer = None
-if SHAP_AVAILABLE:
-    try:
-        # Use TreeExplainer for tree-based models (RandomForest, XGBoost)
-        shap_explainer = shap.TreeExplainer(model)
-        print("✅ SHAP explainer initialized successfully.")
-    except Exception as e:
-        print(f"⚠️ Could not initialize SHAP explainer: {e}")
+def _publish_history(rows):
+    for row in rows:
+        history_hub.publish(row)
 
+history_store.add_listener(_publish_history)
 
-def _load_model_metadata():
-    fallback = {
-        "version": "1.0",
-        "training_date": None,
-        "metrics": {
-            "accuracy": 0.91,
-            "precision": 0.88,
-            "recall": 0.93,
-            "f1": 0.90,
-            "train_samples": 1200,
-            "test_samples": 300,
-        },
-        "notes": "Metadata file missing; returning defaults.",
-    }
-    try:
-        if os.path.exists(MODEL_META_PATH):
-            with open(MODEL_META_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                fallback.update({
-                    "version": data.get("version") or fallback["version"],
-                    "training_date": data.get("training_date"),
-                    "metrics": data.get("metrics", {}),
-                })
-        return fallback
-    except Exception:
-        return fallback
+
+def init_db():
+    history_store.init_schema()
+    atexit.register(history_store.close)
 
 # -----------------------------
-# DB (predictions history)
+# Sample data (indexed CSV)
 # -----------------------------
-DB_PATH = os.path.join(BASE_DIR, 'data', 'predictions.db')
-os.makedirs(os.path.join(BASE_DIR, 'data'), exist_ok=True)
+sample_store = SampleStore(os.path.join(BASE_DIR, 'data', 'FINSENTINAL_FINAL.csv'))
+
+
+def _training_sample_matrix(feature_cols, max_rows=500):
+    """Evenly spaced rows of FINSENTINAL_FINAL.csv as a raw feature matrix."""
+    total = len(sample_store)
+    if total == 0:
+        return np.empty((0, len(feature_cols)))
+    ids = np.unique(np.linspace(0, total - 1, num=min(total, max_rows)).astype(int))
+    rows = [_get_csv_row(int(idx)) or {} for idx in ids]
+    return pipeline_for(feature_cols).transform(rows, fill_value=0.0, strict=False)[0]
+
+
+# -----------------------------
+# Load model and assets
+# -----------------------------
+def _build_explain_service(artifacts):
+    """SHAP explanation service for one ArtifactSet (None without SHAP)."""
+    if not SHAP_AVAILABLE:
+        return None
+    import shap
+
+    # Use TreeExplainer for tree-based models (RandomForest, XGBoost)
+    service = ExplanationService(shap.TreeExplainer(artifacts.model), artifacts.model,
+                                 artifacts.feature_cols, artifacts.version)
+    # precompute the global importance table once per model load
+    try:
+        sample = _training_sample_matrix(artifacts.feature_cols)
+        service.build_global_importance(artifacts.scaler.transform(sample))
+    except Exception as e:
+        print(f"⚠️ Could not compute global SHAP importance: {e}")
+    return service
+
+
+registry = ModelRegistry(MODEL_DIR, explain_builder=_build_explain_service)
+
+# FDI is always resident (the registry owns it); the bankruptcy model is
+# loaded on first use and evicted when idle
+model_pool = ModelPool()
+model_pool.register(FDI, registry.current, resident=True, fill_value=0.0)
+model_pool.register(BANKRUPTCY, pipeline_loader(MODEL_DIR, BANKRUPTCY))
+
+# repeat requests for the same feature vector skip scaling and inference
+prediction_cache = PredictionCache()
+
+
+def _invalidate_prediction_cache(new, previous):
+    # keys carry the model fingerprint, so this only frees memory early; shared
+    # rows stay for workers that have not swapped yet and expire by TTL
+    prediction_cache.invalidate()
+
+
+registry.add_listener(_invalidate_prediction_cache)
+
+
+def _load_model_metadata():
+    return load_metadata(MODEL_DIR)
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS predictions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ts TEXT,
-        fdi REAL,
-        risk TEXT,
-        confidence REAL,
-        payload TEXT
-    )
-    ''')
-    conn.commit()
-    conn.close()
-
-init_db()
 
 # -----------------------------
 # Health check
 # -----------------------------
-@app.route("/", methods=["GET"])
+@api.route("/", methods=["GET"])
 def home():
     return jsonify({"message": "FinSentinal Flask API is running"})
 
 
-@app.route("/model-info", methods=["GET"])
+@api.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: 200 once the FDI model is loaded and the warm-up has finished, else 503.
+
+    "/" only says the process is up; the warm-up status lists each optional
+    subsystem (done, failed, skipped for lazy startup, or still pending).
+    """
+    model_loaded = registry.current() is not None
+    body = {
+        'ready': model_loaded and warmup.finished(),
+        'model_loaded': model_loaded,
+        'startup': startup_stats,
+        'warmup': warmup.status(),
+    }
+    return jsonify(body), 200 if body['ready'] else 503
+
+
+@api.route("/model-info", methods=["GET"])
 def model_info():
     info = _load_model_metadata()
+    info["serving"] = registry.current().describe()
     # include basic artifact flags so frontend can show context
     info["artifacts"] = {
         "model": os.path.exists(os.path.join(MODEL_DIR, "rf_model.pkl")) or os.path.exists(os.path.join(MODEL_DIR, "xgb_model.pkl")),
@@ -134,104 +166,226 @@ def model_info():
 # -----------------------------
 # Prediction endpoint
 # -----------------------------
-@app.route("/predict", methods=["POST"])
+@api.route("/predict", methods=["POST"])
 def predict():
+    """Score one record with the model(s) selected by ?model=fdi|bankruptcy|all."""
+    try:
+        names = model_pool.resolve(request.args.get('model'))
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 400
     try:
-        data = request.get_json()
+        # one artifact set per model for the whole request, even if a reload swaps mid-way
+        models = model_pool.load(names)
+        with stage('parse_json'):
+            data = request.get_json()
+
+        # missing features are 0 for FDI and imputed for the bankruptcy model
+        with stage('features'):
+            columns = model_pool.columns(models.values())
+            X_all, errors = feature_matrix([data], columns)
+        if errors:
+            raise ValueError(errors[0])
+        response = {"models": {}}
+        for name, model in models.items():
+            X = model_pool.matrix_for(name, model, X_all, columns)
+            with stage('cache_lookup'):
+                key = vector_key(name, model, X[0])
+                prob = prediction_cache.get(key)
+            cached = prob is not None
+            if not cached:
+                prob = float(model.predict_positive(X)[0])
+                prediction_cache.set(key, prob)
+                if name == FDI and model.explainer_loaded:
+                    model.explain_service.remember_predictions(model.transform(X), [prob])
+            response["models"][name] = {"score": prob, "risk": risk_label(prob), "version": model.version,
+                                        "cached": cached}
+
+        if FDI in models:
+            # We treat the predicted probability as FINANCIAL DISTRESS likelihood (higher = more risk)
+            art = models[FDI]
+            prob = response["models"][FDI]["score"]
+            risk = response["models"][FDI]["risk"]
+
+            # queue prediction for the background history writer (committed off-request)
+            with stage('history_enqueue'):
+                history_store.record(history_row(datetime.utcnow().isoformat(), prob, risk, data, art.version))
+            response.update({"fdi": prob, "risk": risk, "model_version": art.version,
+                             "cached": response["models"][FDI]["cached"]})
+
+        return jsonify(response)
 
-        # Ensure all features are present
-        features = [data.get(col, 0) for col in feature_cols]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-        X = np.array(features).reshape(1, -1)
-        X_scaled = scaler.transform(X)
 
-        # We treat the predicted probability as FINANCIAL DISTRESS likelihood (higher = more risk)
-        prob = model.predict_proba(X_scaled)[0][1]
-        if prob >= 0.7:
-            risk_label = "Distressed"
-        elif prob >= 0.4:
-            risk_label = "Moderate"
-        else:
-            risk_label = "Healthy"
+@api.route("/predict/stats", methods=["GET"])
+def predict_stats():
+    """Prediction cache hit rate and size."""
+    return jsonify(prediction_cache.stats())
 
-        # persist prediction to DB
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            cur.execute('INSERT INTO predictions (ts, fdi, risk, confidence, payload) VALUES (?,?,?,?,?)', (
-                datetime.utcnow().isoformat(), float(prob), risk_label, float(prob), json.dumps(data)
-            ))
-            conn.commit()
-        except Exception:
-            pass
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
 
-        return jsonify({
-            "fdi": float(prob),
-            "risk": risk_label
-        })
+def _read_batch_records():
+    """Read the records of a batch request, in input order.
+
+    Accepts a JSON array (or {"records": [...]}), an NDJSON body, or a CSV
+    body / multipart upload under the "file" field.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        text = upload.read().decode('utf-8-sig')
+        name = (upload.filename or '').lower()
+        kind = 'ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    else:
+        mimetype = (request.mimetype or '').lower()
+        if mimetype == 'application/json':
+            data = request.get_json()
+            if isinstance(data, dict):
+                data = data.get('records')
+            if not isinstance(data, list):
+                raise ValueError('expected a JSON array of records or {"records": [...]}')
+            return data
+        text = request.get_data(as_text=True)
+        kind = 'csv' if mimetype in ('text/csv', 'application/csv') else 'ndjson'
+
+    if kind == 'csv':
+        return list(csv.DictReader(io.StringIO(text)))
+
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            # keep the slot so results stay aligned with the input lines
+            records.append(e)
+    return records
+
+
+@api.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """Score many records with a single predict_positive call per model.
+
+    Results are returned in input order; records that cannot be scored carry
+    an "error" instead of a score. ?model=fdi|bankruptcy|all selects the
+    models; non-FDI scores are returned under "scores". All FDI-scored rows
+    are queued to the history writer as one unit and committed in one
+    transaction.
+    """
+    try:
+        names = model_pool.resolve(request.args.get('model'))
+        models = model_pool.load(names)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 400
+    except Exception as e:
+        return jsonify({"error": f"could not load model: {e}"}), 503
+    art = models.get(FDI)
+    started = time.perf_counter()
+    try:
+        with stage('parse') as parse:
+            records = _read_batch_records()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
+    # one shared matrix over the union of the selected models' features
+    with stage('features') as features_stage:
+        columns = model_pool.columns(models.values())
+        X_all, errors = feature_matrix(records, columns)
+        results = [None] * len(records)
+        for i, message in errors.items():
+            results[i] = {"index": i, "error": message}
+        row_index = [i for i in range(len(records)) if i not in errors]
+        X_all = X_all[row_index]
+
+    probs, other_scores = [], {}
+    try:
+        with stage('predict') as predict_stage:
+            if row_index and art is not None:
+                # same path as /predict, the scheduler and bulk scoring
+                X = model_pool.matrix_for(FDI, art, X_all, columns)
+                probs = art.predict_positive(X)
+                if art.explainer_loaded:
+                    art.explain_service.remember_predictions(art.transform(X), probs)
+            others = {name: model for name, model in models.items() if name != FDI}
+            if row_index and others:
+                other_scores = model_pool.score(others, X_all, columns)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+    ts = datetime.utcnow().isoformat()
+    db_rows = []
+    for n, i in enumerate(row_index):
+        results[i] = {"index": i}
+        if art is not None:
+            prob = float(probs[n])
+            risk = risk_label(prob)
+            results[i].update({"fdi": prob, "risk": risk})
+            db_rows.append(history_row(ts, prob, risk, records[i], art.version))
+        if other_scores:
+            results[i]["scores"] = {
+                name: {"score": float(p[n]), "risk": risk_label(float(p[n]))}
+                for name, p in other_scores.items()
+            }
+
+    # queued as one unit, so the writer commits the batch in one transaction
+    with stage('persist') as persist:
+        queued = history_store.record_many(db_rows)
+    timings = {f"{s.name}_ms": s.seconds * 1000 for s in (parse, features_stage, predict_stage, persist)}
+    timings['total_ms'] = (time.perf_counter() - started) * 1000
+
+    response = {
+        "results": results,
+        "count": len(records),
+        "scored": len(row_index),
+        "errors": len(errors),
+        "queued": queued,
+        "model_versions": {name: model.version for name, model in models.items()},
+        "timings": timings,
+    }
+    if art is not None:
+        response["model_version"] = art.version
+    return jsonify(response)
+
 
-@app.route("/features", methods=["GET"])
+@api.route("/features", methods=["GET"])
 def features():
     try:
         # return the list of feature column names so frontend can build a form
-        return jsonify({"features": list(feature_cols)})
+        return jsonify({"features": list(registry.current().feature_cols)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/samples', methods=['GET'])
+@api.route('/samples', methods=['GET'])
 def samples():
     try:
         limit = int(request.args.get('limit', 50))
-        csv_path = os.path.join(BASE_DIR, 'data', 'FINSENTINAL_FINAL.csv')
-        items = []
-        if not os.path.exists(csv_path):
-            return jsonify({'samples': items})
-        with open(csv_path, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for i, row in enumerate(reader):
-                if i >= limit:
-                    break
-                items.append({
-                    'id': i,
-                    'ticker': row.get('ticker'),
-                    'year': row.get('year'),
-                    'Close': row.get('Close'),
-                    'fdi': row.get('fdi')
-                })
-
-        return jsonify({'samples': items})
+        offset = int(request.args.get('offset', 0))
+        total, items = sample_store.page(
+            offset=offset,
+            limit=limit,
+            ticker=request.args.get('ticker'),
+            year=request.args.get('year'),
+        )
+        return jsonify({'samples': items, 'total': total, 'offset': offset, 'limit': limit})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 def _get_csv_row(idx):
-    csv_path = os.path.join(BASE_DIR, 'data', 'FINSENTINAL_FINAL.csv')
-    if not os.path.exists(csv_path):
-        return None
-    with open(csv_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i == idx:
-                return row
-    return None
+    return sample_store.get(idx)
 
 
-@app.route('/preprocess', methods=['POST'])
+@api.route('/preprocess', methods=['POST'])
 def preprocess():
     """Return a canonical feature mapping and scaled vector for a given sample or record.
 
-    Accepts JSON: {"sample_id": int} OR {"record": {..raw fields..}}
+    Accepts JSON: {"sample_id": int} OR {"ticker": str, "year": optional}
+    OR {"record": {..raw fields..}}
     """
+    art = registry.current()
+    feature_cols = art.feature_cols
     try:
         data = request.get_json() or {}
 
@@ -240,34 +394,21 @@ def preprocess():
             row = _get_csv_row(idx)
             if row is None:
                 return jsonify({'error': 'sample_id not found'}), 404
+        elif 'ticker' in data:
+            # latest row for the ticker (optionally restricted to a year)
+            ids = sample_store.find(ticker=data.get('ticker'), year=data.get('year'))
+            if not ids:
+                return jsonify({'error': 'ticker/year not found'}), 404
+            row = _get_csv_row(ids[-1])
         elif 'record' in data:
             row = data.get('record') or {}
         else:
             return jsonify({'error': 'provide sample_id or record'}), 400
 
-        # build feature map according to feature_cols
-        feature_map = {}
-        for col in feature_cols:
-            v = None
-            # try row as dict-like
-            try:
-                v = row.get(col)
-            except Exception:
-                v = None
-            if v is None or v == '':
-                feature_map[col] = 0.0
-            else:
-                try:
-                    feature_map[col] = float(v)
-                except Exception:
-                    # fallback: strip and try
-                    try:
-                        feature_map[col] = float(str(v).strip())
-                    except Exception:
-                        feature_map[col] = 0.0
-
-        X = np.array([feature_map[c] for c in feature_cols]).reshape(1, -1)
-        X_scaled = scaler.transform(X).tolist()[0]
+        # missing or non-numeric fields are 0.0, as for /explain
+        X = pipeline_for(feature_cols).transform_one(row)
+        feature_map = dict(zip(feature_cols, X[0].tolist()))
+        X_scaled = art.transform(X).tolist()[0]
 
         return jsonify({
             'feature_order': list(feature_cols),
@@ -279,131 +420,269 @@ def preprocess():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/history', methods=['GET'])
+DEFAULT_HISTORY_FIELDS = ('id', 'ts', 'fdi', 'risk', 'confidence', 'payload')
+
+
+@api.route('/history', methods=['GET'])
 def history():
+    """Prediction history, oldest first.
+
+    Query params: limit, since_id (only rows newer than this id), and
+    fields (comma-separated projection; omit "payload" to skip decoding it).
+    Responses carry ETag/Last-Modified so unchanged polls get a 304 without
+    a database query.
+    """
     try:
-        limit = int(request.args.get('limit', 50))
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute('SELECT ts,fdi,risk,confidence,payload FROM predictions ORDER BY id DESC LIMIT ?', (limit,))
-        rows = cur.fetchall()
-        conn.close()
-        items = []
-        for ts, fdi, risk, confidence, payload in rows[::-1]:
-            try:
-                pl = json.loads(payload) if payload else {}
-            except Exception:
-                pl = {}
-            items.append({
-                'ts': ts,
-                'fdi': fdi,
-                'risk': risk,
-                'confidence': confidence,
-                'payload': pl
-            })
-        return jsonify({'history': items})
+        etag = hashlib.md5(
+            f'{history_store.change_token()}|{request.query_string.decode()}'.encode()
+        ).hexdigest()
+        last_modified = history_store.last_modified()
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            # HTTP dates have 1 s resolution: a commit in the same second as the client's
+            # Last-Modified truncates to the same value, so only a strictly older one is unchanged
+            since = request.if_modified_since
+            not_modified = since is not None and last_modified.replace(microsecond=0) < since
+        if not_modified:
+            response = Response(status=304)
+        else:
+            limit = int(request.args.get('limit', 50))
+            since_id = request.args.get('since_id')
+            since_id = int(since_id) if since_id not in (None, '') else None
+            fields = request.args.get('fields')
+            if fields:
+                fields = [f.strip() for f in fields.split(',') if f.strip()]
+                unknown = [f for f in fields if f not in HISTORY_FIELDS]
+                if unknown:
+                    return jsonify({'error': f'unknown fields: {", ".join(unknown)}'}), 400
+                if 'id' not in fields:
+                    fields.insert(0, 'id')
+            else:
+                fields = list(DEFAULT_HISTORY_FIELDS)
+
+            rows = history_store.since(since_id=since_id, limit=limit, columns=fields)
+            items = []
+            for row in rows:
+                item = dict(zip(fields, row))
+                if 'payload' in item:
+                    try:
+                        item['payload'] = json.loads(item['payload']) if item['payload'] else {}
+                    except Exception:
+                        item['payload'] = {}
+                items.append(item)
+            last_id = items[-1]['id'] if items else since_id
+            response = jsonify({'history': items, 'last_id': last_id})
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _history_filters():
+    return {
+        'start': request.args.get('start'),
+        'end': request.args.get('end'),
+        'company': request.args.get('company'),
+        'ticker': request.args.get('ticker'),
+    }
+
+
+@api.route('/history/latest', methods=['GET'])
+def history_latest():
+    """Latest prediction per company, served from the company index."""
+    try:
+        return jsonify({'latest': history_store.latest_per_company()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/history/range', methods=['GET'])
+def history_range():
+    """Predictions within ?start=&end= (ISO timestamps), optionally per company/ticker."""
+    try:
+        limit = int(request.args.get('limit', 500))
+        return jsonify({'history': history_store.range(limit=limit, **_history_filters())})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/history/risk-counts', methods=['GET'])
+def history_risk_counts():
+    """Prediction counts per risk bucket, with the same filters as /history/range."""
+    try:
+        return jsonify({'counts': history_store.risk_counts(**_history_filters())})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@api.route('/history/stream', methods=['GET'])
+def history_stream():
+    """Server-sent events for newly committed predictions.
+
+    Resumes after the Last-Event-ID header (or ?since_id=) by replaying the
+    missed rows first. Events carry the indexed columns, not the payload.
+    A "resync" event means the client fell behind and should refetch.
+    """
+    sub = history_hub.subscribe()
+    if sub is None:
+        return jsonify({'error': 'too many stream clients'}), 503
+    try:
+        since_id = request.headers.get('Last-Event-ID') or request.args.get('since_id')
+        backlog = []
+        if since_id not in (None, ''):
+            rows = history_store.since(since_id=int(since_id), limit=500, columns=SUMMARY_COLUMNS)
+            backlog = [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+    except Exception as e:
+        sub.close()
+        return jsonify({'error': str(e)}), 400
+
+    return Response(sse_stream(sub, 'prediction', backlog), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@api.route('/history/stats', methods=['GET'])
+def history_stats():
+    """Writer queue depth and group-commit latency for the history store."""
+    stats = history_store.stats()
+    stats['stream'] = history_hub.stats()
+    return jsonify(stats)
+
+
 # -----------------------------
 # SHAP Explainability Endpoint
 # -----------------------------
-@app.route('/explain', methods=['POST'])
+def _unavailable_shap():
+    return jsonify({
+        'error': 'SHAP not available',
+        'message': 'Install SHAP with: pip install shap'
+    }), 503
+
+
+@api.route('/explain', methods=['POST'])
 def explain_prediction():
     """
     Returns SHAP values showing feature importance for a prediction.
-    Expects same input as /predict endpoint.
+    Expects same input as /predict endpoint. Repeat inputs are served from
+    the explanation cache, and the probability computed by /predict is
+    reused instead of rescoring.
     """
-    if not SHAP_AVAILABLE or shap_explainer is None:
-        return jsonify({
-            'error': 'SHAP not available',
-            'message': 'Install SHAP with: pip install shap'
-        }), 503
-    
+    art = registry.current()
+    if art.explain_service is None:
+        return _unavailable_shap()
+
     try:
         payload = request.get_json() or {}
-        
-        # Build feature vector (same as predict endpoint)
-        feature_map = {}
-        for col in feature_cols:
-            val = payload.get(col)
-            if val is None or val == '':
-                feature_map[col] = 0.0
-            else:
-                try:
-                    feature_map[col] = float(val)
-                except Exception:
-                    feature_map[col] = 0.0
-        
-        X = np.array([feature_map[c] for c in feature_cols]).reshape(1, -1)
-        X_scaled = scaler.transform(X)
-        
-        # Calculate SHAP values with defensive flattening
-        shap_values_raw = shap_explainer.shap_values(X_scaled)
-
-        # For binary classification, shap_values might be a list [class0, class1]; pick positive class when present
-        if isinstance(shap_values_raw, list):
-            shap_array = np.array(shap_values_raw[1] if len(shap_values_raw) > 1 else shap_values_raw[0])
-        else:
-            shap_array = np.array(shap_values_raw)
-
-        # Ensure we have the first sample and a 1-D vector of length n_features
-        if shap_array.ndim == 0:
-            shap_vals_flat = np.array([float(shap_array)])
-        elif shap_array.ndim == 1:
-            shap_vals_flat = shap_array
-        elif shap_array.ndim >= 2:
-            shap_vals_flat = shap_array[0]
-        else:
-            shap_vals_flat = shap_array.ravel()
-
-        shap_vals_flat = np.ravel(shap_vals_flat)
+        with stage('features'):
+            X = pipeline_for(art.feature_cols).transform_one(payload)
+        with stage('scaler_transform'):
+            X_scaled = art.scaler.transform(X)
+        with stage('shap'):
+            explanation = art.explain_service.explain(X, X_scaled)[0]
+        return jsonify(explanation)
 
-        # Get base value (expected value)
-        base_value_raw = shap_explainer.expected_value
-        base_array = np.array(base_value_raw)
-        if base_array.ndim == 0:
-            base_value = float(base_array)
-        else:
-            base_value = float(base_array[1] if base_array.size > 1 else base_array.flat[0])
-
-        # Get prediction probability
-        pred_proba = float(model.predict_proba(X_scaled)[0][1])
-
-        # Create feature importance data
-        importance_data = []
-        for i, col in enumerate(feature_cols):
-            shap_val = float(np.ravel(shap_vals_flat)[i])
-            importance_data.append({
-                'feature': col,
-                'value': float(X_scaled[0][i]),
-                'original_value': float(feature_map[col]),
-                'shap_value': shap_val,
-                'impact': 'positive' if shap_val > 0 else 'negative'
-            })
-        
-        # Sort by absolute SHAP value (most important first)
-        importance_data.sort(key=lambda x: abs(x['shap_value']), reverse=True)
-        
-        return jsonify({
-            'base_value': base_value,
-            'prediction': float(pred_proba),
-            'feature_importance': importance_data[:15],  # Top 15 features
-            'top_features': importance_data[:5],  # Top 5 for quick display
-            'total_features': len(feature_cols)
-        })
-        
     except Exception as e:
         import traceback
         print("SHAP Error:", str(e))
-        print("Shapes -> shap_values_raw:", 'list' if 'shap_values_raw' in locals() and isinstance(shap_values_raw, list) else (np.array(shap_values_raw).shape if 'shap_values_raw' in locals() else None))
-        print("Shapes -> shap_array:", 'list' if 'shap_array' in locals() and isinstance(shap_array, list) else (shap_array.shape if 'shap_array' in locals() and hasattr(shap_array, 'shape') else None))
-        print("Shapes -> shap_vals_flat:", shap_vals_flat.shape if 'shap_vals_flat' in locals() else None)
         print(traceback.format_exc())
         return jsonify({'error': str(e), 'details': traceback.format_exc()}), 500
 
 
+@api.route('/explain/batch', methods=['POST'])
+def explain_batch():
+    """SHAP explanations for many records with one shap_values call.
+
+    Accepts the same bodies as /predict/batch; results keep input order and
+    records that cannot be parsed carry an "error".
+    """
+    art = registry.current()
+    if art.explain_service is None:
+        return _unavailable_shap()
+
+    try:
+        records = _read_batch_records()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        top_n = int(request.args.get('top', 15))
+        results = [None] * len(records)
+        X, errors = feature_matrix(records, art.feature_cols)
+        for i, message in errors.items():
+            results[i] = {"index": i, "error": message}
+        row_index = [i for i in range(len(records)) if i not in errors]
+
+        if row_index:
+            X = np.nan_to_num(X[row_index], nan=0.0)
+            with stage('shap'):
+                explanations = art.explain_service.explain(X, art.scaler.transform(X), top_n=top_n)
+            for i, explanation in zip(row_index, explanations):
+                explanation['index'] = i
+                results[i] = explanation
+
+        return jsonify({"results": results, "count": len(records)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/explain/global', methods=['GET'])
+def explain_global():
+    """Mean |SHAP| per feature over the training sample, precomputed at load."""
+    service = registry.current().explain_service
+    if service is None:
+        return _unavailable_shap()
+    if service.global_importance is None:
+        return jsonify({'error': 'global importance not available (no training sample)'}), 404
+    return jsonify(service.global_importance)
+
+
+@api.route('/explain/stats', methods=['GET'])
+def explain_stats():
+    service = registry.current().explain_service
+    if service is None:
+        return _unavailable_shap()
+    return jsonify(service.stats())
+
+
+# -----------------------------
+# Model administration
+# -----------------------------
+ADMIN_TOKEN = os.environ.get('FINSENTINAL_ADMIN_TOKEN')
+
+
+def _admin_denied():
+    if ADMIN_TOKEN and request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'admin token required'}), 403
+    return None
+
+
+@api.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load the model artifacts in the background and swap them in atomically.
+
+    In-flight requests finish on the version they started with. Pass
+    ?wait=1 to block until the new version is serving.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    wait = request.args.get('wait') in ('1', 'true', 'yes')
+    registry.reload(wait=wait)
+    return jsonify(registry.status()), 200 if wait else 202
+
+
+@api.route('/admin/model-status', methods=['GET'])
+def admin_model_status():
+    status = registry.status()
+    status['pool'] = model_pool.stats()
+    return jsonify(status)
+
+
 # -----------------------------
 # Real-time Financial Data Endpoint
 # -----------------------------
@@ -418,77 +697,245 @@ TICKER_MAP = {
     'Netflix Inc.': 'NFLX',
 }
 
-@app.route('/fetch-live-data', methods=['POST'])
+# yfinance (or the fixture provider) behind a TTL cache, single-flight and a rate limiter
+market_data = MarketDataService()
+if not market_data.available():
+    print(f"⚠️ Market data provider {market_data.provider.name} not available. Install with: pip install yfinance")
+
+
+def _market_unavailable():
+    return jsonify({
+        'error': 'yfinance not available',
+        'message': 'Install yfinance with: pip install yfinance'
+    }), 503
+
+
+def _live_data_entry(company, symbol, result):
+    """(payload, ok) for one get_many() result."""
+    if isinstance(result, Exception):
+        return {'company': company, 'ticker': symbol, 'error': str(result)}, False
+    info, fetched_at, state = result
+    data = live_metrics(info, symbol, company, market_data.provider.name)
+    data['last_updated'] = fetched_at
+    data['cache'] = state
+    return data, True
+
+
+@api.route('/fetch-live-data', methods=['POST'])
 def fetch_live_data():
     """
     Fetches real-time financial data from Yahoo Finance.
     Returns key metrics that can be used for prediction.
+
+    Served from cache when fresh; a stale entry is returned immediately
+    while it is refreshed in the background ("cache": fresh|stale|miss).
     """
-    if not YFINANCE_AVAILABLE:
-        return jsonify({
-            'error': 'yfinance not available',
-            'message': 'Install yfinance with: pip install yfinance'
-        }), 503
+    if not market_data.available():
+        return _market_unavailable()
     
-    try:
-        payload = request.get_json() or {}
-        company = payload.get('company', 'Apple Inc.')
-        ticker_symbol = TICKER_MAP.get(company, 'AAPL')
-        
-        # Fetch stock data
-        ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
-        
-        # Get financial ratios and metrics
-        live_data = {
-            'ticker': ticker_symbol,
-            'company': company,
-            'current_price': info.get('currentPrice', 0),
-            'market_cap': info.get('marketCap', 0),
-            'pe_ratio': info.get('trailingPE', 0),
-            'pb_ratio': info.get('priceToBook', 0),
-            'debt_to_equity': info.get('debtToEquity', 0),
-            'current_ratio': info.get('currentRatio', 0),
-            'quick_ratio': info.get('quickRatio', 0),
-            'profit_margin': info.get('profitMargins', 0),
-            'operating_margin': info.get('operatingMargins', 0),
-            'roe': info.get('returnOnEquity', 0),
-            'roa': info.get('returnOnAssets', 0),
-            'revenue_growth': info.get('revenueGrowth', 0),
-            'earnings_growth': info.get('earningsGrowth', 0),
-            'total_cash': info.get('totalCash', 0),
-            'total_debt': info.get('totalDebt', 0),
-            'total_revenue': info.get('totalRevenue', 0),
-            'ebitda': info.get('ebitda', 0),
-            'free_cash_flow': info.get('freeCashflow', 0),
-            'beta': info.get('beta', 1.0),
-            'fifty_two_week_high': info.get('fiftyTwoWeekHigh', 0),
-            'fifty_two_week_low': info.get('fiftyTwoWeekLow', 0),
-            'last_updated': datetime.now().isoformat(),
-            'data_source': 'Yahoo Finance'
-        }
-        
-        # Calculate additional ratios
-        if live_data['total_revenue'] and live_data['total_revenue'] > 0:
-            live_data['debt_to_revenue'] = live_data['total_debt'] / live_data['total_revenue']
-            live_data['cash_to_revenue'] = live_data['total_cash'] / live_data['total_revenue']
-        
+    payload = request.get_json(silent=True) or {}
+    company = payload.get('company', 'Apple Inc.')
+    ticker_symbol = TICKER_MAP.get(company, 'AAPL')
+    with stage('market_data'):
+        result = market_data.get_many([ticker_symbol])[ticker_symbol]
+    live_data, ok = _live_data_entry(company, ticker_symbol, result)
+    if not ok:
         return jsonify({
-            'success': True,
-            'data': live_data,
-            'message': f'Live data fetched for {company} ({ticker_symbol})'
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'error': str(e),
+            'error': live_data['error'],
             'success': False,
             'message': 'Failed to fetch live data. Check ticker symbol or internet connection.'
         }), 500
 
+    return jsonify({
+        'success': True,
+        'data': live_data,
+        'message': f'Live data fetched for {company} ({ticker_symbol})'
+    })
 
-print("🚀 Starting FinSentinal Flask server...")
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+@api.route('/fetch-live-data/batch', methods=['POST'])
+def fetch_live_data_batch():
+    """Live data for several companies, fetched concurrently.
+
+    Body: {"companies": [...]} (TICKER_MAP names); defaults to every company
+    in TICKER_MAP. Results keep the request order; failures carry "error".
+    """
+    if not market_data.available():
+        return _market_unavailable()
+
+    payload = request.get_json(silent=True) or {}
+    companies = payload.get('companies') or list(TICKER_MAP)
+    unknown = [c for c in companies if c not in TICKER_MAP]
+    if unknown:
+        return jsonify({'error': f"unknown companies: {', '.join(map(str, unknown))}", 'success': False}), 400
+
+    started = time.perf_counter()
+    with stage('market_data'):
+        results = market_data.get_many([TICKER_MAP[c] for c in companies])
+    data, failed = [], 0
+    for company in companies:
+        entry, ok = _live_data_entry(company, TICKER_MAP[company], results[TICKER_MAP[company]])
+        data.append(entry)
+        failed += not ok
+    return jsonify({
+        'success': failed == 0,
+        'data': data,
+        'count': len(data),
+        'errors': failed,
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+    })
+
+
+@api.route('/fetch-live-data/stats', methods=['GET'])
+def fetch_live_data_stats():
+    return jsonify(market_data.stats())
+
+
+# -----------------------------
+# Scheduled scoring of the tracked companies
+# -----------------------------
+# rescoring reuses registry.current(); off unless FINSENTINAL_SCORING_INTERVAL > 0
+scoring_scheduler = ScoringScheduler(registry, history_store, sample_store.csv_path,
+                                     companies=list(TICKER_MAP.items()))
+
+
+@api.route('/scoring/status', methods=['GET'])
+def scoring_status():
+    """Last run time, duration and outcome of the scheduled rescoring."""
+    return jsonify(scoring_scheduler.status())
 
+
+@api.route('/scoring/run', methods=['POST'])
+def scoring_run():
+    """Rescore all tracked companies now (?wait=1 blocks and returns the run)."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.args.get('wait') in ('1', 'true', 'yes'):
+        return jsonify(scoring_scheduler.run_once())
+    scoring_scheduler.trigger()
+    return jsonify(scoring_scheduler.status()), 202
+
+
+# -----------------------------
+# Gauges reported on /metrics
+# -----------------------------
+metrics.add_gauge('history_queue_depth', 'Rows waiting for the history writer.',
+                  lambda: history_store.stats()['queue_depth'])
+metrics.add_gauge('prediction_cache_hit_rate', 'Prediction cache hit rate (memory + shared).',
+                  lambda: prediction_cache.stats()['overall_hit_rate'])
+metrics.add_gauge('market_data_hit_rate', 'Market data cache hit rate (fresh + stale).',
+                  lambda: market_data.stats()['hit_rate'])
+metrics.add_gauge('models_loaded', 'Scoring models currently in memory.',
+                  lambda: len(model_pool.loaded()))
+metrics.add_gauge('scoring_last_run_seconds', 'Duration of the last scheduled scoring run.',
+                  lambda: scoring_scheduler.last_run['duration_ms'] / 1000)
+metrics.add_gauge('ready', '1 once the model is loaded and the warm-up has finished.',
+                  lambda: registry.current() is not None and warmup.finished())
+
+
+# -----------------------------
+# Application factory
+# -----------------------------
+# what create_app() loads besides the core (history schema, sample index, FDI model):
+#   eager       SHAP explainer, bankruptcy model and yfinance load before the app is returned
+#   background  they warm up in a thread once the app serves; /ready answers 503 until done
+#   lazy        each loads on first use
+STARTUP_MODES = ('eager', 'background', 'lazy')
+STARTUP_MODE = os.environ.get('FINSENTINAL_STARTUP', 'background').lower()
+
+_startup_lock = threading.Lock()
+_startup_mode = None
+_background_pid = None
+startup_stats = {'mode': None, 'core_ms': None, 'loaded_at': None}
+
+
+def _warm_explainer():
+    if registry.current().build_explainer() is not None:
+        print("✅ SHAP explainer initialized successfully.")
+
+
+warmup = Warmup()
+warmup.add('shap_explainer', _warm_explainer)
+warmup.add('bankruptcy_model', lambda: model_pool.get(BANKRUPTCY))
+warmup.add('market_data', market_data.warm)
+
+
+def load_services(startup=None):
+    """Create the history schema, index the sample CSV and load the FDI model.
+
+    Runs once per process; `startup` (default FINSENTINAL_STARTUP) decides
+    when the optional subsystems load. Under `gunicorn --preload` (wsgi.py,
+    eager) that is all in the master, so the model arrays, explainer and
+    sample index are loaded once and shared copy-on-write by the workers.
+    """
+    global _startup_mode
+    mode = (startup or STARTUP_MODE).lower()
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"Unknown startup mode {mode!r} (choose from {', '.join(STARTUP_MODES)})")
+    with _startup_lock:
+        if _startup_mode is not None:
+            return
+        started = time.perf_counter()
+        init_db()
+        sample_store.refresh()
+        registry.load_initial(build_explainer=False)
+        print("✅ Model, scaler, and features loaded successfully.")
+        startup_stats.update(mode=mode, core_ms=(time.perf_counter() - started) * 1000,
+                             loaded_at=datetime.utcnow().isoformat())
+        if mode == 'eager':
+            warmup.run()
+        elif mode == 'lazy':
+            warmup.skip()
+        _startup_mode = mode
+
+
+def start_background():
+    """Start this process's threads: history writer, model watcher, pool reaper, scheduler, warm-up.
+
+    Threads do not survive fork(), so a preforking server calls this in each
+    worker (gunicorn.conf.py); otherwise the first request does.
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _startup_lock:
+        if _background_pid == os.getpid():
+            return
+        history_store.start()
+        registry.start_watcher()
+        model_pool.start_reaper()
+        # only one process per database runs the schedule (see ScoringScheduler.start)
+        if scoring_scheduler.start():
+            atexit.register(scoring_scheduler.stop)
+        if _startup_mode == 'background':
+            warmup.start()
+        _background_pid = os.getpid()
+
+
+def create_app(start_threads=True, startup=None):
+    """The Flask app over the process-wide services.
+
+    With start_threads=False (preloading in a server master) the background
+    threads, including a background warm-up, are left to start_background().
+    """
+    load_services(startup)
+    app = Flask(__name__)
+    if CORS:
+        CORS(app)
+    # per-endpoint request counts / latency and /metrics (Prometheus text format)
+    metrics.init_app(app)
+    app.before_request(start_background)
+    app.register_blueprint(api)
+    if start_threads:
+        start_background()
+    return app
+
+
+if __name__ == "__main__":
+    # development server (single process, reloader); production: gunicorn -c gunicorn.conf.py wsgi:app
+    print("🚀 Starting FinSentinal Flask server...")
+    debug = os.environ.get('FLASK_DEBUG', '1') != '0'
+    # with the reloader on, only the serving child runs the background threads
+    app = create_app(start_threads=not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
+    app.run(host="0.0.0.0", port=int(os.environ.get('FINSENTINAL_PORT', 5000)), debug=debug)
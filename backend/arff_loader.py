@@ -0,0 +1,231 @@
+"""
+ARFF Loader
+Streaming reader and columnar cache for the Polish bankruptcy datasets
+
+`data/1year.arff` ... `data/5year.arff` hold 64 numeric `Attr` columns, `?` for
+missing values and a nominal `class` label. The reader parses the header once,
+then converts the data section chunk by chunk into a preallocated float32
+matrix (numeric text is cast in bulk by NumPy, `?` becomes NaN).
+
+The first parse of a file is cached as `cache/<name>-<sha256>.npy` (+ `.json`
+with the attribute names) next to the source; later loads with an unchanged
+source hash memory-map that file instead of parsing text again.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARFF_DIR = os.path.join(os.path.dirname(BASE_DIR), 'data')
+
+DEFAULT_CHUNK_ROWS = 4096
+CACHE_DIRNAME = 'cache'
+
+
+class ArffHeader:
+    """Relation name, attributes and where the @data section starts."""
+
+    def __init__(self, relation, attributes, data_offset):
+        self.relation = relation
+        # list of (name, labels) where labels is None for numeric attributes
+        self.attributes = attributes
+        self.data_offset = data_offset
+
+    @property
+    def names(self):
+        return [name for name, _ in self.attributes]
+
+
+def _split_declaration(rest):
+    """Split '<name> <type>' where the name may be quoted."""
+    rest = rest.strip()
+    if rest[:1] in ("'", '"'):
+        quote = rest[0]
+        end = rest.index(quote, 1)
+        return rest[1:end], rest[end + 1:].strip()
+    name, _, kind = rest.partition(' ')
+    if not kind:
+        name, _, kind = rest.partition('\t')
+    return name, kind.strip()
+
+
+def read_header(path):
+    relation, attributes = None, []
+    with open(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{path}: no @data section")
+            text = line.decode('utf-8', errors='replace').strip()
+            if not text or text.startswith('%'):
+                continue
+            keyword = text.split(None, 1)[0].lower()
+            if keyword == '@relation':
+                relation = text.split(None, 1)[1].strip().strip("'\"") if ' ' in text else ''
+            elif keyword == '@attribute':
+                name, kind = _split_declaration(text.split(None, 1)[1])
+                if kind.startswith('{'):
+                    labels = [v.strip().strip("'\"") for v in kind.strip('{}').split(',')]
+                    attributes.append((name, labels))
+                elif kind.lower() in ('numeric', 'real', 'integer'):
+                    attributes.append((name, None))
+                else:
+                    raise ValueError(f"{path}: unsupported attribute type {kind!r} for {name}")
+            elif keyword == '@data':
+                return ArffHeader(relation, attributes, f.tell())
+
+
+def _count_lines(path, offset):
+    count = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            count += block.count(b'\n')
+    return count + 1
+
+
+def _nominal_codes(column, labels):
+    """Map nominal labels to numbers: the label itself if numeric, else its index."""
+    try:
+        return column.astype(np.float32)
+    except ValueError:
+        lookup = {label.encode(): float(i) for i, label in enumerate(labels)}
+        lookup.update({b'?': np.nan, b'nan': np.nan})
+        return np.array([lookup.get(v.strip(b"'\" "), np.nan) for v in column], dtype=np.float32)
+
+
+def _parse_chunk(lines, header):
+    n_cols = len(header.attributes)
+    body = b','.join(lines).replace(b'?', b'nan')
+    fields = np.array(body.split(b','))
+    if fields.size != len(lines) * n_cols:
+        for line in lines:
+            if line.count(b',') != n_cols - 1:
+                raise ValueError(f"expected {n_cols} fields, got {line.count(b',') + 1}: {line[:80]!r}")
+    fields = fields.reshape(len(lines), n_cols)
+    out = np.empty((len(lines), n_cols), dtype=np.float32)
+    nominal = [i for i, (_, labels) in enumerate(header.attributes) if labels is not None]
+    numeric = [i for i, (_, labels) in enumerate(header.attributes) if labels is None]
+    if numeric:
+        out[:, numeric] = fields[:, numeric].astype(np.float32)
+    for i in nominal:
+        out[:, i] = _nominal_codes(fields[:, i], header.attributes[i][1])
+    return out
+
+
+def iter_chunks(path, header=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield float32 arrays of up to `chunk_rows` data rows."""
+    header = header or read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(header.data_offset)
+        lines = []
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith(b'%'):
+                continue
+            if line.startswith(b'{'):
+                raise ValueError(f"{path}: sparse ARFF rows are not supported")
+            lines.append(line)
+            if len(lines) >= chunk_rows:
+                yield _parse_chunk(lines, header)
+                lines = []
+        if lines:
+            yield _parse_chunk(lines, header)
+
+
+def parse_arff(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Parse an ARFF file into (float32 matrix, header) without the cache."""
+    header = read_header(path)
+    capacity = _count_lines(path, header.data_offset)
+    matrix = np.empty((capacity, len(header.attributes)), dtype=np.float32)
+    n = 0
+    for chunk in iter_chunks(path, header, chunk_rows):
+        matrix[n:n + len(chunk)] = chunk
+        n += len(chunk)
+    return matrix[:n], header
+
+
+# -----------------------------
+# Columnar cache
+# -----------------------------
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(path, source_hash):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRNAME)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(cache_dir, f"{stem}-{source_hash[:16]}")
+    return cache_dir, stem, base + '.npy', base + '.json'
+
+
+def load_arff(path, cache=True, mmap=True):
+    """Return (matrix, attribute names) for an ARFF file.
+
+    With `cache=True` the parsed matrix is stored once per source hash and
+    later calls memory-map it (`mmap=True`) or read it (`mmap=False`).
+    """
+    if not cache:
+        matrix, header = parse_arff(path)
+        return matrix, header.names
+
+    source_hash = file_sha256(path)
+    cache_dir, stem, npy_path, meta_path = _cache_paths(path, source_hash)
+    if os.path.exists(npy_path) and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return np.load(npy_path, mmap_mode='r' if mmap else None, allow_pickle=False), meta['names']
+
+    matrix, header = parse_arff(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # drop caches of earlier versions of the same file
+    for name in os.listdir(cache_dir):
+        if name.startswith(stem + '-') and name.endswith(('.npy', '.json')):
+            os.remove(os.path.join(cache_dir, name))
+    tmp_path = npy_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix, allow_pickle=False)
+    os.replace(tmp_path, npy_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.basename(path), 'sha256': source_hash,
+                   'relation': header.relation, 'names': header.names,
+                   'rows': int(matrix.shape[0])}, f, indent=2)
+    if mmap:
+        return np.load(npy_path, mmap_mode='r', allow_pickle=False), header.names
+    return matrix, header.names
+
+
+def load_dataset(path, target='class', cache=True, mmap=True):
+    """Split an ARFF file into (X, y, feature_names) around the target column."""
+    matrix, names = load_arff(path, cache=cache, mmap=mmap)
+    if target not in names:
+        raise ValueError(f"{path}: no {target!r} attribute")
+    t = names.index(target)
+    feature_idx = [i for i in range(len(names)) if i != t]
+    if t == len(names) - 1:
+        X = matrix[:, :t]  # a view, so a memory-mapped matrix stays mapped
+    else:
+        X = matrix[:, feature_idx]
+    y = np.asarray(matrix[:, t]).astype(np.int8)
+    return X, y, [names[i] for i in feature_idx]
+
+
+def horizon_paths(arff_dir=ARFF_DIR):
+    """Map horizon name ('1year', '5year', ...) to its ARFF file."""
+    if not os.path.isdir(arff_dir):
+        return {}
+    return {
+        os.path.splitext(name)[0]: os.path.join(arff_dir, name)
+        for name in sorted(os.listdir(arff_dir))
+        if name.endswith('.arff')
+    }
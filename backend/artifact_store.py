@@ -0,0 +1,269 @@
+"""
+Artifact Store
+Content-addressed, deduplicated archive of model versions
+
+Files are stored once per content hash under `blobs/<aa>/<sha256>`, so a
+scaler or feature list shared by many versions takes space only once. One
+`index.json` lists every archived version with its metadata and the blob of
+each file, so listing and filtering never open per-version files.
+
+Archiving copies a live file into the blob store once per content hash;
+restoring copies a blob next to the target and renames it over the target,
+so each file switches atomically. Blobs never share an inode with the live
+model files: blobs are read-only, live files stay writable, and writing a
+live file in place cannot change an archived version.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+from datetime import datetime
+
+INDEX_FILE = 'index.json'
+BLOB_DIRNAME = 'blobs'
+
+# retention defaults for gc(), applied after every archive
+DEFAULT_KEEP_LAST = int(os.environ.get('FINSENTINAL_ARCHIVE_KEEP', 20))
+DEFAULT_KEEP_BEST = int(os.environ.get('FINSENTINAL_ARCHIVE_KEEP_BEST', 5))
+DEFAULT_BEST_METRIC = 'f1'
+
+# legacy per-directory archives stored metadata as metadata.json
+LEGACY_NAMES = {'metadata.json': 'model_metadata.json'}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _copy_to_temp(src, dst):
+    """Copy src to dst (replacing a stale temp file); the copy gets default permissions."""
+    if os.path.exists(dst):
+        os.chmod(dst, stat.S_IRUSR | stat.S_IWUSR)
+        os.remove(dst)
+    shutil.copyfile(src, dst)
+
+
+class ArtifactStore:
+    """Versions of a model directory, stored as hash-addressed blobs."""
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, BLOB_DIRNAME)
+        self.index_path = os.path.join(root, INDEX_FILE)
+
+    # -----------------------------
+    # Index
+    # -----------------------------
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return {'versions': []}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def versions(self, where=None, sort=None, descending=True):
+        """Index entries, optionally filtered by `where(entry)` and sorted by a metric."""
+        entries = self.load_index()['versions']
+        if where is not None:
+            entries = [e for e in entries if where(e)]
+        if sort:
+            entries = sorted((e for e in entries if isinstance(e.get('metrics', {}).get(sort), (int, float))),
+                             key=lambda e: e['metrics'][sort], reverse=descending)
+        return entries
+
+    def get(self, version_id):
+        for entry in self.load_index()['versions']:
+            if entry['id'] == version_id:
+                return entry
+        return None
+
+    # -----------------------------
+    # Blobs
+    # -----------------------------
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def put(self, path):
+        """Store the file's content once; returns its sha256."""
+        digest = file_sha256(path)
+        target = self.blob_path(digest)
+        if os.path.exists(target) and os.path.samefile(path, target):
+            # hardlinked by an older store: split the blob off and make the live file writable again
+            tmp_path = f"{target}.tmp"
+            _copy_to_temp(path, tmp_path)
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, target)
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f"{target}.tmp"
+            _copy_to_temp(path, tmp_path)
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, target)
+        return digest
+
+    # -----------------------------
+    # Archive / restore
+    # -----------------------------
+    def archive(self, model_dir, names, metadata, version_id=None):
+        """Record the current files as a version; returns (entry, created).
+
+        If an archived version has exactly the same file contents no entry is
+        added and that version is returned with created=False.
+        """
+        files = {}
+        for name in names:
+            path = os.path.join(model_dir, name)
+            if os.path.exists(path):
+                files[name] = self.put(path)
+
+        index = self.load_index()
+        for entry in reversed(index['versions']):
+            if entry['files'] == files:
+                return entry, False
+
+        version = str(metadata.get('version', 'unknown'))
+        entry = {
+            'id': version_id or f"model_v{version}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'version': version,
+            'archived_at': datetime.now().isoformat(),
+            'training_date': metadata.get('training_date'),
+            'metrics': metadata.get('metrics', {}),
+            'pinned': False,
+            'files': files,
+        }
+        index['versions'].append(entry)
+        self._save_index(index)
+        return entry, True
+
+    def restore(self, version_id, model_dir):
+        """Switch model_dir to an archived version; returns the names changed.
+
+        Files whose content already matches the blob are left alone (made
+        writable if an older store had hardlinked them to the blob); the
+        others are copied next to the target and renamed over it.
+        """
+        entry = self.get(version_id)
+        if entry is None:
+            raise ValueError(f"Version not found: {version_id}")
+        changed = []
+        for name, digest in entry['files'].items():
+            blob = self.blob_path(digest)
+            target = os.path.join(model_dir, name)
+            tmp_path = f"{target}.tmp"
+            if os.path.exists(target) and file_sha256(target) == digest:
+                if not os.path.samefile(blob, target):
+                    continue
+                # hardlinked to the blob by an older store: give the live file its own inode
+                _copy_to_temp(blob, tmp_path)
+                os.replace(tmp_path, target)
+                continue
+            _copy_to_temp(blob, tmp_path)
+            os.replace(tmp_path, target)
+            changed.append(name)
+        return changed
+
+    def pin(self, version_id, pinned=True):
+        index = self.load_index()
+        for entry in index['versions']:
+            if entry['id'] == version_id:
+                entry['pinned'] = pinned
+                self._save_index(index)
+                return entry
+        raise ValueError(f"Version not found: {version_id}")
+
+    # -----------------------------
+    # Retention
+    # -----------------------------
+    def gc(self, keep_last=DEFAULT_KEEP_LAST, keep_best=DEFAULT_KEEP_BEST, metric=DEFAULT_BEST_METRIC,
+           protect=(), dry_run=False):
+        """Apply the retention policy and delete unreferenced blobs.
+
+        Kept: the newest `keep_last` versions, the `keep_best` versions with
+        the highest `metric`, pinned versions, and any blob in `protect`
+        (e.g. the hashes of the files currently serving). Returns
+        (removed version ids, removed blob count, freed bytes).
+        """
+        index = self.load_index()
+        versions = index['versions']
+        keep = {e['id'] for e in versions[-keep_last:]} if keep_last > 0 else set()
+        keep |= {e['id'] for e in versions if e.get('pinned')}
+        if keep_best > 0:
+            ranked = sorted((e for e in versions if isinstance(e.get('metrics', {}).get(metric), (int, float))),
+                            key=lambda e: e['metrics'][metric], reverse=True)
+            keep |= {e['id'] for e in ranked[:keep_best]}
+        kept = [e for e in versions if e['id'] in keep]
+        removed = [e['id'] for e in versions if e['id'] not in keep]
+
+        referenced = set(protect)
+        for entry in kept:
+            referenced.update(entry['files'].values())
+        unreferenced = []
+        if os.path.isdir(self.blob_dir):
+            for prefix in os.listdir(self.blob_dir):
+                for digest in os.listdir(os.path.join(self.blob_dir, prefix)):
+                    if digest not in referenced and not digest.endswith('.tmp'):
+                        unreferenced.append(os.path.join(self.blob_dir, prefix, digest))
+        freed = sum(os.path.getsize(p) for p in unreferenced)
+
+        if not dry_run:
+            if removed:
+                index['versions'] = kept
+                self._save_index(index)
+            for path in unreferenced:
+                os.remove(path)
+        return removed, len(unreferenced), freed
+
+    # -----------------------------
+    # Migration
+    # -----------------------------
+    def import_legacy(self):
+        """Move old per-directory archives (model_v*_<timestamp>/) into the store.
+
+        Each directory is removed only after its files are in the blob store
+        and its entry is in the index. Returns the imported ids.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        known = {e['id'] for e in self.load_index()['versions']}
+        imported = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if name in (BLOB_DIRNAME, INDEX_FILE) or not os.path.isdir(path) or not name.startswith('model_v'):
+                continue
+            if name not in known:
+                files = {}
+                for filename in os.listdir(path):
+                    files[LEGACY_NAMES.get(filename, filename)] = self.put(os.path.join(path, filename))
+                metadata = {}
+                meta_path = os.path.join(path, 'metadata.json')
+                if os.path.exists(meta_path):
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                index = self.load_index()
+                index['versions'].append({
+                    'id': name,
+                    'version': str(metadata.get('version', 'unknown')),
+                    'archived_at': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+                    'training_date': metadata.get('training_date'),
+                    'metrics': metadata.get('metrics', {}),
+                    'pinned': False,
+                    'files': files,
+                })
+                index['versions'].sort(key=lambda e: e['archived_at'])
+                self._save_index(index)
+                imported.append(name)
+            shutil.rmtree(path)
+        return imported
@@ -0,0 +1,102 @@
+"""
+Benchmark: arff_loader vs scipy.io.arff and pandas on the bankruptcy datasets
+
+Usage (from backend/):
+    python benchmarks/bench_arff.py [--runs 5] [files ...]
+
+Defaults to every data/*.arff file. scipy / pandas rows are skipped when the
+library is not installed.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import arff_loader  # noqa: E402
+
+
+def _scipy_load(path):
+    from scipy.io import arff
+    data, meta = arff.loadarff(path)
+    # to the same float32 matrix the other loaders produce
+    columns = [data[name].astype(np.float32) if data[name].dtype.kind != 'S'
+               else data[name].astype(str).astype(np.float32) for name in meta.names()]
+    return np.column_stack(columns)
+
+
+def _pandas_load(path):
+    import pandas as pd
+    header = arff_loader.read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(header.data_offset)
+        df = pd.read_csv(f, header=None, names=header.names, na_values='?', comment='%',
+                         dtype=np.float32, skip_blank_lines=True)
+    return df.to_numpy()
+
+
+def _clear_cache(path):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), arff_loader.CACHE_DIRNAME)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.startswith(stem + '-'):
+                os.remove(os.path.join(cache_dir, name))
+        if not os.listdir(cache_dir):
+            shutil.rmtree(cache_dir)
+
+
+def _cold_cached(path):
+    _clear_cache(path)
+    return arff_loader.load_arff(path)[0]
+
+
+def _time(fn, path, runs):
+    times = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn(path)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('files', nargs='*')
+    args = parser.parse_args()
+    files = args.files or list(arff_loader.horizon_paths().values())
+
+    cases = [
+        ('arff_loader (no cache)', lambda p: arff_loader.parse_arff(p)[0]),
+        ('arff_loader (first, writes cache)', _cold_cached),
+        ('arff_loader (cached, mmap)', lambda p: np.asarray(arff_loader.load_arff(p)[0])),
+        ('scipy.io.arff', _scipy_load),
+        ('pandas.read_csv', _pandas_load),
+    ]
+    for path in files:
+        reference = arff_loader.parse_arff(path)[0]
+        print(f"\n📄 {os.path.basename(path)}: {reference.shape[0]} rows x {reference.shape[1]} columns")
+        print(f"   {'loader':<36} {'median ms':>10} {'vs no-cache':>12}  matches")
+        baseline = None
+        for name, fn in cases:
+            try:
+                elapsed, result = _time(fn, path, args.runs)
+            except ImportError as e:
+                print(f"   {name:<36} {'skipped':>10}  ({e.name} not installed)")
+                continue
+            baseline = baseline or elapsed
+            same = np.array_equal(np.asarray(result), reference, equal_nan=True)
+            print(f"   {name:<36} {elapsed * 1000:>10.1f} {baseline / elapsed:>11.1f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: feature_pipeline vs the per-column float() loops it replaced
+
+Usage (from backend/):
+    python benchmarks/bench_features.py [--rows 1 1000 100000] [--runs 5]
+
+Records are synthetic, over the serving model's feature_cols.pkl (or 95
+generated columns without one): mostly floats, some numeric strings, a few
+blanks and missing keys. Reports the per-row cost of each way of building
+the feature matrix; the DataFrame row is skipped when pandas is missing.
+"""
+
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from feature_pipeline import FeaturePipeline  # noqa: E402
+
+FEATURES_PATH = os.path.join(BACKEND_DIR, 'models', 'feature_cols.pkl')
+
+
+def _feature_cols():
+    if os.path.exists(FEATURES_PATH):
+        with open(FEATURES_PATH, 'rb') as f:
+            return list(pickle.load(f))
+    return [f' feature_{j}' for j in range(95)]
+
+
+def _records(columns, n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n, len(columns)))
+    records = []
+    for i in range(n):
+        record = dict(zip(columns, values[i].tolist()))
+        record[columns[i % len(columns)]] = str(values[i, 0])
+        if i % 7 == 0:
+            record[columns[-1]] = ''
+        if i % 11 == 0:
+            del record[columns[1]]
+        records.append(record)
+    return records
+
+
+def _legacy_map(records, columns):
+    """The old /explain and /preprocess construction: one float() per cell."""
+    rows = []
+    for payload in records:
+        feature_map = {}
+        for col in columns:
+            val = payload.get(col)
+            if val is None or val == '':
+                feature_map[col] = 0.0
+            else:
+                try:
+                    feature_map[col] = float(val)
+                except Exception:
+                    feature_map[col] = 0.0
+        rows.append([feature_map[c] for c in columns])
+    return np.array(rows, dtype=float)
+
+
+def _legacy_matrix(records, columns):
+    """The old model_pool.feature_matrix: per-key canonical lookup and float()."""
+    index = {c.strip(): j for j, c in enumerate(columns)}
+    X = np.full((len(records), len(columns)), np.nan)
+    for i, record in enumerate(records):
+        for key, value in record.items():
+            j = index.get(key.strip())
+            if j is None or value is None or value == '':
+                continue
+            try:
+                X[i, j] = float(value)
+            except (TypeError, ValueError):
+                X[i] = np.nan
+                break
+    return np.where(np.isnan(X), 0.0, X)
+
+
+def _time(fn, runs):
+    times = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 1000, 100000])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    columns = _feature_cols()
+
+    for n in args.rows:
+        records = _records(columns, n)
+        runs = args.runs if n <= 10000 else max(1, args.runs // 2)
+        cases = [
+            ('per-column float() map (old /explain)', lambda: _legacy_map(records, columns)),
+            ('per-key loop (old feature_matrix)', lambda: _legacy_matrix(records, columns)),
+            # a fresh pipeline each time includes compiling the column mapping
+            ('FeaturePipeline (cold)', lambda: FeaturePipeline(columns).transform(records, 0.0, strict=False)[0]),
+        ]
+        pipeline = FeaturePipeline(columns)
+        pipeline.transform(records[:1], 0.0)
+        cases.append(('FeaturePipeline (compiled)', lambda: pipeline.transform(records, 0.0, strict=False)[0]))
+        try:
+            import pandas as pd
+            frame = pd.DataFrame.from_records(records, columns=columns)
+            cases.append(('FeaturePipeline.transform_frame', lambda: pipeline.transform_frame(frame, 0.0)))
+        except ImportError:
+            print("   (pandas not installed; skipping the DataFrame case)")
+
+        reference = _legacy_map(records, columns)
+        print(f"\n🧮 {n} row(s) x {len(columns)} features")
+        print(f"   {'builder':<40} {'median ms':>10} {'us/row':>10} {'vs old':>8}  matches")
+        baseline = None
+        for name, fn in cases:
+            elapsed, result = _time(fn, runs)
+            baseline = baseline or elapsed
+            same = np.allclose(result, reference)
+            print(f"   {name:<40} {elapsed * 1000:>10.2f} {elapsed / n * 1e6:>10.2f} "
+                  f"{baseline / elapsed:>7.1f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Benchmark: development server vs gunicorn (preload + gthread workers)
+
+Starts each server as a subprocess on a free port, against a throw-away
+history database and the fixture market data provider, and reports:
+
+- startup: seconds from spawn until GET / answers
+- throughput: requests/s and latency p50/p95 with --concurrency clients
+  (one keep-alive connection each) for --duration seconds per workload
+- memory: summed PSS of the server's processes (Linux), where pages shared
+  copy-on-write between preloaded workers are counted once
+
+Workloads: predict (POST /predict with distinct synthetic records, CPU
+bound), history (GET /history, SQLite reads) and live (POST
+/fetch-live-data/batch from the fixture provider, I/O bound).
+
+Usage (from backend/):
+    python benchmarks/bench_serving.py [--duration 10] [--concurrency 16]
+        [--workers 4] [--threads 8] [--only dev gunicorn] [--workloads predict history]
+
+gunicorn is skipped when it is not installed (it does not run on Windows).
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_TIMEOUT = 180
+WORKLOADS = ('predict', 'history', 'live')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _server_command(mode, port, workers, threads):
+    if mode == 'dev':
+        return [sys.executable, 'app.py'], {'FINSENTINAL_PORT': str(port)}
+    return ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+            {'FINSENTINAL_BIND': f'127.0.0.1:{port}', 'WEB_CONCURRENCY': str(workers),
+             'FINSENTINAL_THREADS': str(threads)})
+
+
+def _request(conn, method, path, body=None):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def _wait_ready(proc, port):
+    started = time.perf_counter()
+    while time.perf_counter() - started < STARTUP_TIMEOUT:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with status {proc.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            if _request(conn, 'GET', '/') == 200:
+                return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f'no answer on port {port} after {STARTUP_TIMEOUT}s')
+
+
+def _process_tree(pid):
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _pss_mb(pid):
+    """Summed PSS of a process and its children in MB (None off Linux)."""
+    total = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            return None
+    return total / 1024
+
+
+def _workload(name, port, seed):
+    """A callable issuing one request of the workload on a client's connection."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    if name == 'predict':
+        probe = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        probe.request('GET', '/features')
+        features = json.loads(probe.getresponse().read())['features']
+        rng = random.Random(seed)
+        # distinct vectors, so the prediction cache does not answer them
+        bodies = [json.dumps({f: rng.gauss(0, 1) for f in features}) for _ in range(256)]
+        counter = iter(range(1 << 62))
+        return lambda: _request(conn, 'POST', '/predict', bodies[next(counter) % len(bodies)])
+    if name == 'history':
+        return lambda: _request(conn, 'GET', '/history?limit=50')
+    return lambda: _request(conn, 'POST', '/fetch-live-data/batch', '{}')
+
+
+def _load(name, port, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed):
+        issue = _workload(name, port, seed)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = issue() < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                issue = _workload(name, port, seed)
+            local.append(time.perf_counter() - started)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    latencies.sort()
+    if not latencies:
+        return {'requests': 0, 'errors': errors[0]}
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'req_per_s': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def run_server(mode, args, tmp_dir):
+    port = _free_port()
+    command, extra = _server_command(mode, port, args.workers, args.threads)
+    env = dict(os.environ, **extra,
+               FINSENTINAL_DB_PATH=os.path.join(tmp_dir, f'{mode}.db'),
+               FINSENTINAL_MARKET_PROVIDER='fixture',
+               FINSENTINAL_MODEL_WATCH_SECONDS='0',
+               FINSENTINAL_SCORING_INTERVAL='0')
+    env.pop('FINSENTINAL_PROFILE_SAMPLE', None)
+    env.pop('FINSENTINAL_PREDICTION_CACHE_DB', None)
+    # own session, so the dev server's reloader child is stopped with it
+    proc = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        result = {'startup_s': _wait_ready(proc, port), 'workloads': {}}
+        for name in args.workloads:
+            print(f"   {mode}: {name} ...", flush=True)
+            result['workloads'][name] = _load(name, port, args.concurrency, args.duration)
+        result['pss_mb'] = _pss_mb(proc.pid)
+        return result
+    finally:
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per workload')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--only', nargs='+', choices=('dev', 'gunicorn'), default=['dev', 'gunicorn'])
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    args = parser.parse_args()
+
+    modes = list(args.only)
+    if 'gunicorn' in modes and importlib.util.find_spec('gunicorn') is None:
+        print("⚠️ gunicorn not installed (pip install gunicorn); comparing the dev server only")
+        modes.remove('gunicorn')
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='finsentinal-serving-') as tmp_dir:
+        for mode in modes:
+            print(f"\n🚀 {mode} server", flush=True)
+            try:
+                results[mode] = run_server(mode, args, tmp_dir)
+            except Exception as e:
+                print(f"   ⚠️ {mode} failed: {e}")
+
+    label = {'dev': 'dev server', 'gunicorn': f'gunicorn {args.workers}x{args.threads}'}
+    print(f"\n📊 {args.concurrency} clients, {args.duration:.0f}s per workload")
+    print(f"   {'server':<16} {'startup s':>9} {'PSS MB':>8}")
+    for mode, result in results.items():
+        pss = f"{result['pss_mb']:.0f}" if result['pss_mb'] else '-'
+        print(f"   {label[mode]:<16} {result['startup_s']:>9.2f} {pss:>8}")
+    print(f"\n   {'workload':<10} {'server':<16} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for name in args.workloads:
+        for mode, result in results.items():
+            w = result['workloads'].get(name, {})
+            if not w.get('requests'):
+                print(f"   {name:<10} {label[mode]:<16} {'-':>9}")
+                continue
+            print(f"   {name:<10} {label[mode]:<16} {w['req_per_s']:>9.1f} {w['p50_ms']:>8.1f} "
+                  f"{w['p95_ms']:>8.1f} {w['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
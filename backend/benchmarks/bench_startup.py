@@ -0,0 +1,82 @@
+"""
+Benchmark: import-to-ready time for the pickle and bundle artifact formats
+
+Each run is a fresh interpreter that imports the registry, loads the model
+and scores one row. With --app the whole Flask app is built (create_app)
+instead (FINSENTINAL_MODEL_FORMAT selects the format), in the --startup mode:
+eager loads the SHAP explainer, bankruptcy model and yfinance too, lazy and
+background (warm-up thread, not waited for) leave them for later.
+
+Usage (from backend/):
+    python model_manager.py export-bundle      # once, to create models/bundle
+    python benchmarks/bench_startup.py [--runs 5] [--app [--startup eager|background|lazy]]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REGISTRY_PROBE = r'''
+import json, resource, time
+t0 = time.perf_counter()
+import numpy as np
+from model_registry import ModelRegistry
+registry = ModelRegistry("models", model_format=FORMAT, watch_interval=0)
+art = registry.load_initial()
+art.predict_positive(np.zeros((1, len(art.feature_cols))))
+ready = time.perf_counter() - t0
+print(json.dumps({"ready_s": ready, "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+APP_PROBE = r'''
+import json, resource, time
+t0 = time.perf_counter()
+import numpy as np
+import app
+app.create_app(start_threads=False, startup=STARTUP)
+art = app.registry.current()
+art.predict_positive(np.zeros((1, len(art.feature_cols))))
+ready = time.perf_counter() - t0
+print(json.dumps({"ready_s": ready, "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+
+def _run(model_format, use_app, startup='eager'):
+    code = (APP_PROBE if use_app else REGISTRY_PROBE).replace('FORMAT', repr(model_format))
+    code = code.replace('STARTUP', repr(startup))
+    env = dict(os.environ, FINSENTINAL_MODEL_FORMAT=model_format, FINSENTINAL_MODEL_WATCH_SECONDS='0')
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    # the app prints startup banners; the probe result is the last line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--app', action='store_true', help='build the full Flask app')
+    parser.add_argument('--startup', choices=('eager', 'background', 'lazy'), default='eager',
+                        help='create_app startup mode with --app')
+    args = parser.parse_args()
+
+    target = f'create_app, {args.startup}' if args.app else 'registry load'
+    print(f"\n⏱️  Import-to-ready ({target}, {args.runs} runs each)")
+    print(f"   {'format':<8} {'median s':>9} {'min s':>8} {'max s':>8} {'max RSS MB':>11}")
+    for model_format in ('pickle', 'bundle'):
+        try:
+            results = [_run(model_format, args.app, args.startup) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"   {model_format:<8} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        times = [r['ready_s'] for r in results]
+        rss = max(r['maxrss_kb'] for r in results) / 1024
+        print(f"   {model_format:<8} {statistics.median(times):>9.3f} {min(times):>8.3f} {max(times):>8.3f} {rss:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: compiled tree engine vs stock scaler.transform + predict_proba
+
+Usage (from backend/):
+    python benchmarks/bench_tree_engine.py [--repeat 200] [--model xgb_model.pkl]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import tree_engine  # noqa: E402
+from model_registry import MODEL_FILES  # noqa: E402
+
+MODEL_DIR = os.path.join(BACKEND_DIR, 'models')
+
+
+def _load(name):
+    with open(os.path.join(MODEL_DIR, name), 'rb') as f:
+        return pickle.load(f)
+
+
+def _time_per_call(fn, repeat):
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--model', default=None, help='model pickle in models/ (default: registry order)')
+    args = parser.parse_args()
+
+    model_file = args.model or next(n for n in MODEL_FILES if os.path.exists(os.path.join(MODEL_DIR, n)))
+    model = _load(model_file)
+    scaler = _load('scaler.pkl')
+    feature_cols = _load('feature_cols.pkl')
+
+    started = time.perf_counter()
+    engine = tree_engine.CompiledTreeEnsemble.compile(model, scaler)
+    compile_ms = (time.perf_counter() - started) * 1000
+    _, info = engine.arrays()
+
+    rows = tree_engine.verification_rows(scaler, len(feature_cols), n_rows=10000, seed=1, engine=engine)
+    diff = engine.verify(model, scaler, rows)
+
+    print(f"\n🌲 {model_file}: {info['n_trees']} trees, {info['n_nodes']} nodes, depth {info['max_depth']}")
+    print(f"   compile: {compile_ms:.1f} ms   max |p_compiled - p_stock| on 10k rows: {diff:.2e}")
+    print(f"\n   {'rows':>6} {'stock ms':>10} {'compiled ms':>12} {'speedup':>8} {'stock µs/row':>13} {'compiled µs/row':>16}")
+    for n in (1, 10, 100, 1000, 10000):
+        X = rows[:n]
+        repeat = max(3, args.repeat // max(1, n // 10))
+        stock = _time_per_call(lambda: model.predict_proba(scaler.transform(X))[:, 1], repeat)
+        compiled = _time_per_call(lambda: engine.predict_positive(X), repeat)
+        print(f"   {n:>6} {stock * 1000:>10.3f} {compiled * 1000:>12.3f} {stock / compiled:>7.1f}x "
+              f"{stock / n * 1e6:>13.2f} {compiled / n * 1e6:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Import-time report for the backend, checked against a budget
+
+Imports a module (default: app) in fresh interpreters with `-X importtime`
+and reports its total import time, the direct imports that cost the most
+and the slowest modules by self time. Importing app must stay cheap: no
+model is unpickled, no database touched and the heavy optional libraries
+(shap, yfinance, pandas, scikit-learn, ...) load later, in create_app() or
+on first use.
+
+With --budget (a JSON file, see benchmarks/import_budget.json) the exit
+status is 1 when the median total exceeds `max_total_ms` or a module listed
+in `forbidden` (or a submodule of one) was imported. -X importtime adds
+its own overhead, so only compare numbers produced by this script.
+
+Usage (from backend/):
+    python benchmarks/import_time.py [--module app] [--runs 3] [--top 10] [--json report.json]
+    python benchmarks/import_time.py --budget benchmarks/import_budget.json       # what CI runs
+    python benchmarks/import_time.py --budget benchmarks/import_budget.json --save-budget [--headroom 2]
+
+Re-measure the budget on the CI runner itself: run the "Backend startup
+budget" workflow by hand with `save_budget` ticked and commit the
+import-budget artifact it uploads.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(BACKEND_DIR, 'benchmarks', 'import_budget.json')
+
+# prints the loaded module names as the last stdout line (the app prints banners before it)
+PROBE = 'import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))'
+
+
+def parse_importtime(stderr):
+    """[(level, name, self_us, cumulative_us)] in output order (children before parents)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        field = parts[2][1:]
+        name = field.lstrip()
+        entries.append(((len(field) - len(name)) // 2, name, int(parts[0]), int(parts[1])))
+    return entries
+
+
+def _direct_imports(entries, module):
+    """[(name, cumulative_us)] of the imports made directly by the top-level `module`."""
+    children = []
+    for level, name, _, cumulative in entries:
+        if level == 0:
+            if name == module:
+                return children
+            children = []
+        elif level == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def measure(module):
+    """One fresh interpreter: (total ms, direct imports, entries, loaded module names)."""
+    with tempfile.TemporaryDirectory(prefix='finsentinal-import-') as tmp_dir:
+        env = dict(os.environ, FINSENTINAL_DB_PATH=os.path.join(tmp_dir, 'predictions.db'))
+        out = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module)],
+                             cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr[-2000:]}")
+    entries = parse_importtime(out.stderr)
+    top = [e for e in entries if e[0] == 0 and e[1] == module]
+    if not top:
+        raise RuntimeError(f'no -X importtime entry for {module}')
+    loaded = json.loads(out.stdout.strip().splitlines()[-1])
+    return top[-1][3] / 1000, _direct_imports(entries, module), entries, loaded
+
+
+def forbidden_imports(loaded, forbidden):
+    return sorted(name for name in loaded
+                  if any(name == f or name.startswith(f + '.') for f in forbidden))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', help='module to import (default: the budget\'s, else app)')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget', help=f'budget file to check against (e.g. {os.path.relpath(DEFAULT_BUDGET)})')
+    parser.add_argument('--save-budget', action='store_true',
+                        help='write max_total_ms = measured total x --headroom into the --budget file')
+    parser.add_argument('--headroom', type=float, default=2.0)
+    parser.add_argument('--json', help='also write the report here')
+    args = parser.parse_args()
+
+    budget = {}
+    if args.budget and os.path.exists(args.budget):
+        with open(args.budget, 'r', encoding='utf-8') as f:
+            budget = json.load(f)
+    module = args.module or budget.get('module', 'app')
+
+    runs = [measure(module) for _ in range(args.runs)]
+    totals = sorted(r[0] for r in runs)
+    total = statistics.median(totals)
+    _, direct, entries, loaded = min(runs, key=lambda r: abs(r[0] - total))
+
+    print(f"\n📦 import {module}: {total:.0f} ms median of {args.runs} "
+          f"(min {totals[0]:.0f}, max {totals[-1]:.0f}), {len(loaded)} modules loaded")
+    print(f"\n   {'direct import':<40} {'cumulative ms':>14}")
+    for name, cumulative in sorted(direct, key=lambda d: -d[1])[:args.top]:
+        print(f"   {name:<40} {cumulative / 1000:>14.1f}")
+    print(f"\n   {'module':<40} {'self ms':>14}")
+    for _, name, self_us, _ in sorted(entries, key=lambda e: -e[2])[:args.top]:
+        print(f"   {name:<40} {self_us / 1000:>14.1f}")
+
+    report = {
+        'module': module,
+        'total_ms': total,
+        'runs_ms': totals,
+        'modules_loaded': len(loaded),
+        'direct_imports_ms': {name: cumulative / 1000 for name, cumulative in direct},
+    }
+    failures = []
+    if budget:
+        bad = forbidden_imports(loaded, budget.get('forbidden', []))
+        report['forbidden_imported'] = bad
+        if bad:
+            failures.append(f"imported modules that must load lazily: {', '.join(bad[:10])}"
+                            f"{' ...' if len(bad) > 10 else ''}")
+        limit = budget.get('max_total_ms')
+        if limit is not None and total > limit and not args.save_budget:
+            failures.append(f'import took {total:.0f} ms, budget {limit:.0f} ms')
+        report['budget_ms'] = limit
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_budget:
+        if not args.budget:
+            parser.error('--save-budget needs --budget')
+        # keep what the limit was derived from next to it
+        budget.update(module=module, max_total_ms=round(total * args.headroom), measured_ms=round(total),
+                      headroom=args.headroom, python=platform.python_version())
+        with open(args.budget, 'w', encoding='utf-8') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        print(f"\n💾 Budget {budget['max_total_ms']} ms written to {args.budget}")
+
+    if failures:
+        for failure in failures:
+            print(f"\n❌ {failure}")
+        sys.exit(1)
+    if budget:
+        print(f"\n✅ Within budget ({budget.get('max_total_ms')} ms, no forbidden imports)")
+
+
+if __name__ == '__main__':
+    main()
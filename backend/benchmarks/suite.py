@@ -0,0 +1,353 @@
+"""
+Benchmark suite: scoring, history, explain, sample lookup and live data
+
+Drives the Flask app through its test client and calls the scoring
+functions directly. The app is imported against a throw-away history
+database, with the fixture market data provider (no network), the model
+file watcher and the scoring scheduler off. Records are synthetic, drawn
+around the serving scaler's mean/scale for every column of feature_cols.
+
+Every case reports latency p50/p95/p99 and throughput (calls/s, plus rows/s
+for batches) and the whole run is written as JSON. With --baseline the run
+is compared case by case and any p50/p95 slower than the baseline by more
+than --tolerance is flagged; the exit status is 1 when something regressed.
+
+Usage (from backend/):
+    python benchmarks/suite.py [--quick] [--only predict] [--output results.json]
+    python benchmarks/suite.py --save-baseline            # write benchmarks/baseline.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json [--tolerance 0.2]
+    python benchmarks/suite.py --compare new.json --baseline old.json   # no run
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, 'benchmarks')
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.2
+HISTORY_SIZES = (1000, 10000, 100000)
+BATCH_SIZES = (1, 100, 10000)
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(fn, iterations, warmup=2, rows=1):
+    """Call fn() `iterations` times; latency percentiles (ms) and throughput."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    wall = time.perf_counter() - started
+    times.sort()
+    result = {
+        'iterations': iterations,
+        'p50_ms': _percentile(times, 0.50) * 1000,
+        'p95_ms': _percentile(times, 0.95) * 1000,
+        'p99_ms': _percentile(times, 0.99) * 1000,
+        'mean_ms': statistics.fmean(times) * 1000,
+        'max_ms': times[-1] * 1000,
+        'calls_per_s': iterations / wall,
+    }
+    if rows != 1:
+        result['rows'] = rows
+        result['rows_per_s'] = iterations * rows / wall
+    return result
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+# -----------------------------
+# Environment
+# -----------------------------
+def _load_app(tmp_dir):
+    """(app module, Flask app) built against a temporary database and offline market data."""
+    os.environ['FINSENTINAL_DB_PATH'] = os.path.join(tmp_dir, 'predictions.db')
+    os.environ['FINSENTINAL_MARKET_PROVIDER'] = 'fixture'
+    os.environ['FINSENTINAL_MODEL_WATCH_SECONDS'] = '0'
+    os.environ['FINSENTINAL_SCORING_INTERVAL'] = '0'
+    os.environ.pop('FINSENTINAL_PREDICTION_CACHE_DB', None)
+    os.environ.pop('FINSENTINAL_PROFILE_SAMPLE', None)
+    os.environ.pop('FINSENTINAL_ADMIN_TOKEN', None)
+    import app as app_module
+    # eager: the explainer and bankruptcy model are loaded before the first case
+    return app_module, app_module.create_app(startup='eager')
+
+
+def synthetic_records(art, n, seed=0):
+    """n records over art.feature_cols, drawn around the scaler's mean/scale."""
+    k = len(art.feature_cols)
+    scaler = getattr(art, 'scaler', None)
+    mean = np.asarray(getattr(scaler, 'mean_', np.zeros(k)), dtype=float)
+    scale = np.asarray(getattr(scaler, 'scale_', np.ones(k)), dtype=float)
+    X = np.random.default_rng(seed).normal(mean, scale, size=(n, k))
+    return [dict(zip(art.feature_cols, row)) for row in X.tolist()]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# -----------------------------
+# Cases
+# -----------------------------
+def build_cases(app_module, flask_app, quick):
+    """[(name, thunk returning the measurement)] for every benchmark case."""
+    client = flask_app.test_client()
+    art = app_module.registry.current()
+    scale = 0.2 if quick else 1.0
+
+    def n(iterations):
+        return max(5, int(iterations * scale))
+
+    cases = []
+
+    # single /predict: unique records (cache misses) and one repeated record (hits)
+    unique = iter(synthetic_records(art, n(500) + 10, seed=1))
+    repeated = synthetic_records(art, 1, seed=2)[0]
+    cases.append(('predict_single', lambda: measure(
+        lambda: _check(client.post('/predict', json=next(unique))), n(500))))
+    cases.append(('predict_single_cached', lambda: measure(
+        lambda: _check(client.post('/predict', json=repeated)), n(500))))
+    one = np.array([list(repeated.values())])
+    cases.append(('score_direct_1', lambda: measure(lambda: art.predict_positive(one), n(2000))))
+
+    # batch scoring through the endpoint and directly
+    for size in BATCH_SIZES:
+        records = synthetic_records(art, size, seed=3)
+        body = json.dumps(records)
+        iterations = n(200) if size <= 100 else n(10)
+        cases.append((f'predict_batch_{size}', lambda body=body, size=size, iterations=iterations: measure(
+            lambda: _check(client.post('/predict/batch', data=body, content_type='application/json')),
+            iterations, rows=size)))
+
+        def direct(records=records):
+            X, _ = app_module.feature_matrix(records, art.feature_cols, fill_value=0.0)
+            return art.predict_positive(X)
+        cases.append((f'score_direct_{size}', lambda direct=direct, size=size, iterations=iterations: measure(
+            direct, iterations, rows=size)))
+
+    # /history at growing table sizes
+    def history_case(size):
+        def run():
+            _seed_history(app_module, size, art)
+            return {
+                'latest_100': measure(lambda: _check(client.get('/history?limit=100')), n(200)),
+                'latest_100_no_payload': measure(
+                    lambda: _check(client.get('/history?limit=100&fields=id,ts,fdi,risk,company,ticker')), n(200)),
+                'latest_per_company': measure(lambda: _check(client.get('/history/latest')), n(200)),
+                'risk_counts': measure(lambda: _check(client.get('/history/risk-counts')), n(50)),
+                'table_rows': size,
+            }
+        return run
+    for size in HISTORY_SIZES:
+        cases.append((f'history_{size}', history_case(size)))
+
+    # SHAP explanation (skipped without shap)
+    if art.explain_service is not None:
+        explain_records = iter(synthetic_records(art, n(50) + 5, seed=4))
+        cases.append(('explain', lambda: measure(
+            lambda: _check(client.post('/explain', json=next(explain_records))), n(50))))
+    else:
+        cases.append(('explain', lambda: {'skipped': 'shap not installed'}))
+
+    # CSV sample lookup
+    store = app_module.sample_store
+    if len(store):
+        ids = iter(np.random.default_rng(5).integers(0, len(store), size=n(2000) + 10).tolist())
+        cases.append(('sample_get_direct', lambda: measure(lambda: store.get(next(ids)), n(2000))))
+        cases.append(('samples_by_ticker', lambda: measure(
+            lambda: _check(client.get('/samples?ticker=AAPL&limit=20')), n(300))))
+        cases.append(('preprocess_sample', lambda: measure(
+            lambda: _check(client.post('/preprocess', json={'sample_id': 0})), n(300))))
+    else:
+        cases.append(('sample_lookup', lambda: {'skipped': 'data/FINSENTINAL_FINAL.csv not found'}))
+
+    # live data from the fixture provider (first call fetches, then the TTL cache serves)
+    cases.append(('fetch_live_data', lambda: measure(
+        lambda: _check(client.post('/fetch-live-data', json={'company': 'Apple Inc.'})), n(300))))
+    cases.append(('fetch_live_data_batch', lambda: measure(
+        lambda: _check(client.post('/fetch-live-data/batch', json={})), n(100), rows=len(app_module.TICKER_MAP))))
+    return cases
+
+
+def _seed_history(app_module, size, art):
+    """Grow the predictions table to `size` rows (committed before returning)."""
+    store = app_module.history_store
+    have = store.query('SELECT COUNT(*) FROM predictions')[0][0]
+    companies = list(app_module.TICKER_MAP.items())
+    # a 10-feature payload keeps a 100k-row table small
+    payload_cols = art.feature_cols[:10]
+    ts = datetime.utcnow().isoformat()
+    rng = np.random.default_rng(size)
+    while have < size:
+        chunk = min(5000, size - have)
+        probs = rng.random(chunk)
+        rows = []
+        for i, prob in enumerate(probs.tolist()):
+            company, ticker = companies[(have + i) % len(companies)]
+            record = {c: float(v) for c, v in zip(payload_cols, rng.normal(size=len(payload_cols)))}
+            record.update(company=company, ticker=ticker)
+            rows.append(app_module.history_row(ts, prob, app_module.risk_label(prob), record, art.version))
+        if not store.record_many(rows):
+            raise RuntimeError('history queue full while seeding')
+        have += chunk
+    store.flush()
+
+
+# -----------------------------
+# Compare
+# -----------------------------
+def _flatten(results):
+    """{case or case.sub: measurement} for every measurement with latencies."""
+    flat = {}
+    for name, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        if 'p50_ms' in value:
+            flat[name] = value
+        else:
+            for sub, inner in value.items():
+                if isinstance(inner, dict) and 'p50_ms' in inner:
+                    flat[f'{name}.{sub}'] = inner
+    return flat
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Print a p50/p95 comparison; returns the names of regressed cases."""
+    now, base = _flatten(current['results']), _flatten(baseline['results'])
+    regressions = []
+    print(f"\n📊 vs baseline {baseline.get('meta', {}).get('git_commit') or ''} "
+          f"({baseline.get('meta', {}).get('timestamp', '?')}), tolerance {tolerance:.0%}")
+    print(f"   {'case':<42} {'p50 ms':>9} {'base':>9} {'Δ':>7}   {'p95 ms':>9} {'base':>9} {'Δ':>7}")
+    for name in sorted(set(now) | set(base)):
+        if name not in now or name not in base:
+            print(f"   {name:<42} {'(only in ' + ('current' if name in now else 'baseline') + ')':>30}")
+            continue
+        cells, regressed = [], False
+        for key in ('p50_ms', 'p95_ms'):
+            value, ref = now[name][key], base[name][key]
+            change = value / ref - 1 if ref else 0.0
+            regressed |= change > tolerance
+            cells.append(f"{value:>9.3f} {ref:>9.3f} {change:>+6.0%}")
+        if regressed:
+            regressions.append(name)
+        print(f"   {name:<42} {'   '.join(cells)}{'  ⚠️ REGRESSION' if regressed else ''}")
+    print(f"\n{'❌' if regressions else '✅'} {len(regressions)} regression(s)")
+    return regressions
+
+
+def _print_results(results):
+    print(f"\n   {'case':<42} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/s':>10} {'rows/s':>12}")
+    for name, m in _flatten(results).items():
+        rows_per_s = f"{m['rows_per_s']:>12.0f}" if 'rows_per_s' in m else f"{'':>12}"
+        print(f"   {name:<42} {m['p50_ms']:>9.3f} {m['p95_ms']:>9.3f} {m['p99_ms']:>9.3f} "
+              f"{m['calls_per_s']:>10.1f} {rows_per_s}")
+    for name, m in results.items():
+        if isinstance(m, dict) and 'skipped' in m:
+            print(f"   {name:<42} skipped ({m['skipped']})")
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='fewer iterations (smoke run)')
+    parser.add_argument('--only', action='append', default=[], help='run cases whose name contains this')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', help='compare against this result file')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also write {DEFAULT_BASELINE}')
+    parser.add_argument('--compare', help='compare this result file with --baseline instead of running')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown before a case is flagged (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.baseline:
+            parser.error('--compare needs --baseline')
+        sys.exit(1 if compare(_read(args.compare), _read(args.baseline), args.tolerance) else 0)
+
+    with tempfile.TemporaryDirectory(prefix='finsentinal-bench-') as tmp_dir:
+        app_module, flask_app = _load_app(tmp_dir)
+        art = app_module.registry.current()
+        results = {}
+        for name, run in build_cases(app_module, flask_app, args.quick):
+            if args.only and not any(part in name for part in args.only):
+                continue
+            print(f"⏱️  {name} ...", flush=True)
+            try:
+                results[name] = run()
+            except Exception as e:
+                results[name] = {'error': f'{type(e).__name__}: {e}'}
+                print(f"   ⚠️ {results[name]['error']}")
+        app_module.history_store.close()
+
+    run = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'model_version': art.version,
+            'inference': art.describe()['inference'],
+            'features': len(art.feature_cols),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    _print_results(results)
+    _write(args.output, run)
+    print(f"\n💾 Results written to {args.output}")
+    if args.save_baseline:
+        _write(DEFAULT_BASELINE, run)
+        print(f"💾 Baseline written to {DEFAULT_BASELINE}")
+    if args.baseline:
+        sys.exit(1 if compare(run, _read(args.baseline), args.tolerance) else 0)
+
+
+if __name__ == '__main__':
+    main()
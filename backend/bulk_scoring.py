@@ -0,0 +1,281 @@
+"""
+Bulk Scoring
+Offline scoring of whole CSV / ARFF files in fixed-size chunks
+
+The input is read `chunk_rows` rows at a time (pandas chunked read_csv, or
+arff_loader.iter_chunks), its columns are aligned to the model's
+feature_cols once from the header, and every chunk is scored with one
+vectorized predict call, optionally on a pool of worker processes that each
+load the model once. Results are streamed to a CSV or Parquet file, or
+queued to the predictions table one chunk (= one transaction) at a time.
+At most a few chunks are in memory at once, whatever the file size.
+
+Models: 'fdi' (the serving model), 'bankruptcy', or a trained ARFF horizon
+name such as '1year'.
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import arff_loader
+from feature_pipeline import canonical, pipeline_for
+from history_store import HistoryStore, history_row, risk_label
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+HORIZON_DIR = os.path.join(MODEL_DIR, 'horizons')
+DB_PATH = os.path.join(BASE_DIR, 'data', 'predictions.db')
+
+DEFAULT_CHUNK_ROWS = int(os.environ.get('FINSENTINAL_SCORE_CHUNK_ROWS', 10000))
+
+# passed through from the input to every output row when present
+ID_COLUMNS = ('company', 'ticker', 'year', 'class')
+
+
+# -----------------------------
+# Models
+# -----------------------------
+def load_scorer(spec):
+    """(model with predict_positive, fill value for missing features) for a model name."""
+    from model_registry import ModelRegistry
+
+    if spec == 'fdi':
+        return ModelRegistry(MODEL_DIR, watch_interval=0).load_initial(), 0.0
+    if spec == 'bankruptcy':
+        from model_pool import pipeline_loader
+        return pipeline_loader(MODEL_DIR, 'bankruptcy')(), np.nan
+    latest = os.path.join(HORIZON_DIR, spec, 'latest.json')
+    if not os.path.exists(latest):
+        raise ValueError(f"Unknown model {spec!r} (fdi, bankruptcy or a trained ARFF horizon)")
+    with open(latest, 'r', encoding='utf-8') as f:
+        version_dir = json.load(f)['path']
+    # horizon models were trained on ARFF data with NaN for '?', so NaN stays NaN
+    return ModelRegistry(os.path.join(HORIZON_DIR, spec, version_dir), watch_interval=0).load_initial(), np.nan
+
+
+_worker_scorer = None
+
+
+def _init_worker(spec):
+    global _worker_scorer
+    _worker_scorer = load_scorer(spec)[0]
+
+
+def _score_chunk(X):
+    return _worker_scorer.predict_positive(X)
+
+
+# -----------------------------
+# Sources
+# -----------------------------
+def _place(block, dst, n_features, fill_value):
+    X = np.full((len(block), n_features), fill_value, dtype=np.float64)
+    X[:, dst] = block
+    if not np.isnan(fill_value):
+        X[np.isnan(X)] = fill_value
+    return X
+
+
+def csv_chunks(path, feature_cols, fill_value, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """(missing features, iterator of (X, ids)) over a CSV file."""
+    import pandas as pd
+
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f))
+    src, dst, missing = pipeline_for(feature_cols).plan(header)
+    feature_names = [header[i] for i in src]
+    id_names = [h for h in header if canonical(h) in ID_COLUMNS]
+
+    def chunks():
+        reader = pd.read_csv(path, usecols=list(dict.fromkeys(feature_names + id_names)), chunksize=chunk_rows)
+        for chunk in reader:
+            block = chunk[feature_names]
+            if any(dtype.kind not in 'biuf' for dtype in block.dtypes):
+                block = block.apply(pd.to_numeric, errors='coerce')
+            X = _place(block.to_numpy(dtype=np.float64, na_value=np.nan), dst, len(feature_cols), fill_value)
+            yield X, {canonical(c): chunk[c].to_numpy() for c in id_names}
+    return missing, chunks()
+
+
+def arff_chunks(path, feature_cols, fill_value, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """(missing features, iterator of (X, ids)) over an ARFF file."""
+    header = arff_loader.read_header(path)
+    src, dst, missing = pipeline_for(feature_cols).plan(header.names)
+    label = header.names.index('class') if 'class' in header.names else None
+
+    def chunks():
+        for chunk in arff_loader.iter_chunks(path, header, chunk_rows):
+            ids = {'class': chunk[:, label].astype(np.int8)} if label is not None else {}
+            yield _place(chunk[:, src], dst, len(feature_cols), fill_value), ids
+    return missing, chunks()
+
+
+# -----------------------------
+# Sinks
+# -----------------------------
+def _risk_labels(probs):
+    """history_store.risk_label for a whole array."""
+    return np.select([probs >= 0.7, probs >= 0.4], ['Distressed', 'Moderate'], 'Healthy')
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._header = False
+
+    def write(self, offset, ids, probs):
+        if not self._header:
+            self._writer.writerow(['row', *ids, 'score', 'risk'])
+            self._header = True
+        rows = np.arange(offset, offset + len(probs))
+        self._writer.writerows(zip(rows.tolist(), *(v.tolist() for v in ids.values()),
+                                   probs.tolist(), _risk_labels(probs).tolist()))
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Parquet output needs pyarrow. Install with: pip install pyarrow')
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self._writer = None
+
+    def write(self, offset, ids, probs):
+        columns = {'row': np.arange(offset, offset + len(probs)), **ids,
+                   'score': probs, 'risk': _risk_labels(probs)}
+        table = self._pa.table(columns)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class HistorySink:
+    """Queues each chunk to the predictions table as one unit (one transaction)."""
+
+    def __init__(self, db_path, source, model_name, model_version):
+        # no enqueue timeout: a full writer queue blocks the reader instead of dropping rows
+        self.store = HistoryStore(db_path, enqueue_timeout=None)
+        self.store.init_schema()
+        self.store.start()
+        self.source = source
+        self.model_name = model_name
+        self.model_version = model_version
+
+    def write(self, offset, ids, probs):
+        ts = datetime.utcnow().isoformat()
+        columns = {name: values.tolist() for name, values in ids.items()}
+        rows = []
+        for n, prob in enumerate(probs.tolist()):
+            record = {name: values[n] for name, values in columns.items()}
+            record.update(source=self.source, row=offset + n, model=self.model_name)
+            rows.append(history_row(ts, prob, risk_label(prob), record, self.model_version))
+        self.store.record_many(rows)
+
+    def close(self):
+        # the whole backlog of chunks has to land; wait as long as the writer is alive
+        self.store.flush(timeout=None)
+        self.store.close()
+
+
+def open_sink(output, db_path, source, model_name, model_version):
+    if db_path:
+        return HistorySink(db_path, source, model_name, model_version)
+    if output.lower().endswith(('.parquet', '.pq')):
+        return ParquetSink(output)
+    return CsvSink(output)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def score_file(input_path, output=None, db_path=None, model='fdi', chunk_rows=DEFAULT_CHUNK_ROWS, workers=1):
+    """Score every row of a CSV or ARFF file; returns a summary dict."""
+    scorer, fill_value = load_scorer(model)
+    reader = arff_chunks if input_path.lower().endswith('.arff') else csv_chunks
+    missing, chunks = reader(input_path, scorer.feature_cols, fill_value, chunk_rows)
+    if len(missing) == len(scorer.feature_cols):
+        raise ValueError(f"{input_path} has none of the {model} model's features")
+    if missing:
+        print(f"⚠️ {len(missing)} feature(s) not in the input, scored as "
+              f"{'missing' if np.isnan(fill_value) else fill_value}: {missing[:5]}{' ...' if len(missing) > 5 else ''}")
+
+    source = os.path.basename(input_path)
+    sink = open_sink(output, db_path, source, model, scorer.version)
+    target = db_path or output
+    print(f"\n🧮 Scoring {source} with {model} v{scorer.version} in chunks of {chunk_rows} rows "
+          f"on {workers} worker(s) -> {target}")
+
+    started = time.perf_counter()
+    rows = 0
+
+    def emit(ids, probs):
+        nonlocal rows
+        sink.write(rows, ids, np.asarray(probs, dtype=np.float64))
+        rows += len(probs)
+
+    try:
+        if workers <= 1:
+            for X, ids in chunks:
+                emit(ids, scorer.predict_positive(X))
+        else:
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker, initargs=(model,)) as pool:
+                # bounded read-ahead keeps memory flat; results are written in input order
+                pending = deque()
+                for X, ids in chunks:
+                    pending.append((pool.submit(_score_chunk, X), ids))
+                    if len(pending) >= 2 * workers:
+                        future, ready_ids = pending.popleft()
+                        emit(ready_ids, future.result())
+                while pending:
+                    future, ready_ids = pending.popleft()
+                    emit(ready_ids, future.result())
+    finally:
+        sink.close()
+
+    seconds = time.perf_counter() - started
+    summary = {
+        'input': input_path,
+        'output': target,
+        'model': model,
+        'model_version': scorer.version,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_s': rows / seconds if seconds else 0.0,
+        'workers': workers,
+        'chunk_rows': chunk_rows,
+        'missing_features': missing,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+    rss = f", peak RSS {summary['peak_rss_mb']:.0f} MB" if summary['peak_rss_mb'] else ''
+    print(f"✅ {rows} rows in {seconds:.2f}s ({summary['rows_per_s']:,.0f} rows/s){rss}")
+    return summary
@@ -0,0 +1,124 @@
+"""
+Event Hub
+In-process fan-out of new predictions to server-sent event clients
+
+Publishers (the history store's tail thread) push each event once; the hub appends it to
+every subscriber's bounded buffer, which costs O(1) per client. A client that
+falls behind loses its oldest buffered events and is told to resync from
+/history?since_id= instead of stalling the publisher.
+"""
+
+import collections
+import json
+import threading
+import time
+
+DEFAULT_BUFFER = 256
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_MAX_SUBSCRIBERS = 200
+
+
+class Subscription:
+    """One client's bounded event buffer."""
+
+    def __init__(self, hub, maxlen):
+        self._hub = hub
+        self._buffer = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.lagged = False
+        self.closed = False
+
+    def _push(self, event):
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.lagged = True
+            self._buffer.append(event)
+        self._ready.set()
+
+    def drain(self, timeout):
+        """Wait up to `timeout` seconds; return (events, lagged)."""
+        self._ready.wait(timeout)
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            lagged, self.lagged = self.lagged, False
+            self._ready.clear()
+        return events, lagged
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._hub._unsubscribe(self)
+            self._ready.set()
+
+
+class EventHub:
+    """Thread-safe publish/subscribe hub."""
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER, max_subscribers=DEFAULT_MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self):
+        """Register a client; returns None when the hub is at capacity."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            sub = Subscription(self, self.buffer_size)
+            self._subscribers.add(sub)
+            return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = tuple(self._subscribers)
+            self.published += 1
+        for sub in subscribers:
+            sub._push(event)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self.published}
+
+
+def sse_stream(sub, event_name, backlog=(), heartbeat=DEFAULT_HEARTBEAT):
+    """Yield server-sent event frames for a subscription until it closes.
+
+    Each event must carry an "id" so clients can resume with Last-Event-ID.
+    Idle periods emit a comment line every `heartbeat` seconds, which keeps
+    proxies from timing out the connection and surfaces dead clients.
+    """
+
+    def frame(event):
+        return f"id: {event['id']}\nevent: {event_name}\ndata: {json.dumps(event)}\n\n"
+
+    try:
+        yield "retry: 3000\n\n"
+        last_id = None
+        for event in backlog:
+            yield frame(event)
+            last_id = event['id']
+        last_sent = time.monotonic()
+        while not sub.closed:
+            events, lagged = sub.drain(heartbeat)
+            if lagged:
+                yield "event: resync\ndata: {}\n\n"
+            for event in events:
+                # skip events already delivered as part of the backlog
+                if last_id is not None and event['id'] <= last_id:
+                    continue
+                yield frame(event)
+            if events or lagged:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
+    finally:
+        sub.close()
@@ -0,0 +1,166 @@
+"""
+Explanation Service
+Batched, cached SHAP explanations for the serving model
+
+- SHAP values are cached per (model version, quantized scaled feature vector)
+  in an LRU+TTL cache, so repeat explanations skip the TreeExplainer call.
+- Cache misses from a batch are computed with a single shap_values call.
+- Probabilities computed by /predict are remembered under the same key, so
+  /explain does not rescore the model.
+- A global mean-|SHAP| importance table is computed once from a training
+  sample when the service is built.
+"""
+
+import hashlib
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+DEFAULT_CACHE_SIZE = 2048
+DEFAULT_CACHE_TTL = 900.0
+# scaled features are rounded to this step before hashing
+DEFAULT_QUANTUM = 1e-6
+
+
+def positive_class_shap(raw, n_rows):
+    """Normalise shap_values output to an (n_rows, n_features) array for class 1.
+
+    Depending on the shap version and model type this is a list per class,
+    an (n, f) array, or an (n, f, classes) array.
+    """
+    if isinstance(raw, list):
+        arr = np.asarray(raw[1] if len(raw) > 1 else raw[0])
+    else:
+        arr = np.asarray(raw)
+        if arr.ndim == 3:
+            arr = arr[:, :, 1] if arr.shape[2] > 1 else arr[:, :, 0]
+    return arr.reshape(n_rows, -1)
+
+
+def positive_class_base(expected_value):
+    base = np.asarray(expected_value)
+    if base.ndim == 0:
+        return float(base)
+    return float(base[1] if base.size > 1 else base.flat[0])
+
+
+class ExplanationService:
+    """SHAP explanations with caching, batching and a global importance table."""
+
+    def __init__(self, explainer, model, feature_cols, model_version,
+                 cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                 quantum=DEFAULT_QUANTUM):
+        self.explainer = explainer
+        self.model = model
+        self.feature_cols = list(feature_cols)
+        self.model_version = str(model_version)
+        self.quantum = quantum
+        self.base_value = positive_class_base(explainer.expected_value)
+        self._shap_cache = TTLCache(cache_size, cache_ttl)
+        self._proba_cache = TTLCache(cache_size, cache_ttl)
+        self.global_importance = None
+
+    def _key(self, x_scaled):
+        q = np.round(np.asarray(x_scaled, dtype=np.float64) / self.quantum).astype(np.int64)
+        return self.model_version + ':' + hashlib.blake2b(q.tobytes(), digest_size=16).hexdigest()
+
+    # -----------------------------
+    # Probabilities
+    # -----------------------------
+    def remember_predictions(self, X_scaled, probs):
+        """Record probabilities already computed by a predict call."""
+        for x, prob in zip(X_scaled, probs):
+            self._proba_cache.set(self._key(x), float(prob))
+
+    def probabilities(self, X_scaled, keys=None):
+        """Class-1 probabilities, scoring only rows not seen by predict."""
+        keys = keys or [self._key(x) for x in X_scaled]
+        probs = [self._proba_cache.get(k) for k in keys]
+        missing = [i for i, p in enumerate(probs) if p is None]
+        if missing:
+            fresh = self.model.predict_proba(X_scaled[missing])[:, 1]
+            for i, p in zip(missing, fresh):
+                probs[i] = float(p)
+                self._proba_cache.set(keys[i], float(p))
+        return probs
+
+    # -----------------------------
+    # SHAP
+    # -----------------------------
+    def shap_rows(self, X_scaled):
+        """Return (shap matrix, keys, cached flags) for a 2-D scaled matrix."""
+        X_scaled = np.asarray(X_scaled, dtype=np.float64)
+        keys = [self._key(x) for x in X_scaled]
+        rows = [self._shap_cache.get(k) for k in keys]
+        cached = [r is not None for r in rows]
+        missing = [i for i, r in enumerate(rows) if r is None]
+        if missing:
+            raw = self.explainer.shap_values(X_scaled[missing])
+            values = positive_class_shap(raw, len(missing))
+            for i, vec in zip(missing, values):
+                vec = np.array(vec, dtype=np.float64)
+                rows[i] = vec
+                self._shap_cache.set(keys[i], vec)
+        return np.vstack(rows) if rows else np.empty((0, len(self.feature_cols))), keys, cached
+
+    def explain(self, X_raw, X_scaled, top_n=15):
+        """Explanations for each row, in the shape returned by /explain."""
+        X_scaled = np.asarray(X_scaled, dtype=np.float64)
+        shap_matrix, keys, cached = self.shap_rows(X_scaled)
+        probs = self.probabilities(X_scaled, keys)
+        results = []
+        for r in range(len(X_scaled)):
+            importance = []
+            for i, col in enumerate(self.feature_cols):
+                shap_val = float(shap_matrix[r, i])
+                importance.append({
+                    'feature': col,
+                    'value': float(X_scaled[r, i]),
+                    'original_value': float(X_raw[r][i]),
+                    'shap_value': shap_val,
+                    'impact': 'positive' if shap_val > 0 else 'negative',
+                })
+            # Sort by absolute SHAP value (most important first)
+            importance.sort(key=lambda x: abs(x['shap_value']), reverse=True)
+            results.append({
+                'base_value': self.base_value,
+                'prediction': probs[r],
+                'feature_importance': importance[:top_n],
+                'top_features': importance[:5],
+                'total_features': len(self.feature_cols),
+                'cached': cached[r],
+            })
+        return results
+
+    # -----------------------------
+    # Global importance
+    # -----------------------------
+    def build_global_importance(self, X_sample_scaled):
+        """Compute mean |SHAP| per feature over a training sample."""
+        X_sample_scaled = np.asarray(X_sample_scaled, dtype=np.float64)
+        if X_sample_scaled.size == 0:
+            return None
+        raw = self.explainer.shap_values(X_sample_scaled)
+        values = positive_class_shap(raw, len(X_sample_scaled))
+        mean_abs = np.abs(values).mean(axis=0)
+        mean_signed = values.mean(axis=0)
+        table = [
+            {'feature': col, 'mean_abs_shap': float(mean_abs[i]), 'mean_shap': float(mean_signed[i])}
+            for i, col in enumerate(self.feature_cols)
+        ]
+        table.sort(key=lambda x: x['mean_abs_shap'], reverse=True)
+        self.global_importance = {
+            'model_version': self.model_version,
+            'sample_size': int(len(X_sample_scaled)),
+            'importance': table,
+        }
+        return self.global_importance
+
+    def stats(self):
+        return {
+            'model_version': self.model_version,
+            'shap_cache': self._shap_cache.stats(),
+            'probability_cache': self._proba_cache.stats(),
+            'global_importance_ready': self.global_importance is not None,
+        }
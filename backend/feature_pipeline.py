@@ -0,0 +1,181 @@
+"""
+Feature Pipeline
+Raw records and CSV frames to model feature matrices, in one place
+
+A FeaturePipeline is compiled once per feature order: it maps canonical
+(whitespace-stripped) field names to column positions and remembers, per
+distinct record key layout, which record keys land in which columns. A batch
+is gathered into one object array and coerced to float64 in a single NumPy
+pass; only rows that fail that pass are re-checked cell by cell to report
+the offending feature. Serving (/predict, /preprocess, /explain), batch
+scoring, the scoring scheduler and training all build their matrices here.
+
+Derived columns (roa_trend, price_momentum) are computed per ticker with
+grouped rolling / pct_change over the whole frame.
+"""
+
+import functools
+
+import numpy as np
+
+ROA_COLUMN = 'ROA(A) before interest and % after tax'
+
+# record key layouts remembered per pipeline; clients normally send one or two
+MAX_LAYOUTS = 64
+
+
+def canonical(name):
+    """Column key used to match record fields to model features."""
+    return name.strip() if isinstance(name, str) else name
+
+
+class FeaturePipeline:
+    """Compiled mapping from record fields to one feature order."""
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.names = [canonical(c) for c in self.columns]
+        self.index = {name: j for j, name in enumerate(self.names)}
+        # tuple(record keys) -> (keys used, their column positions)
+        self._layouts = {}
+
+    def _layout(self, keys):
+        layout = self._layouts.get(keys)
+        if layout is None:
+            used = [(key, self.index[canonical(key)]) for key in keys if canonical(key) in self.index]
+            layout = ([key for key, _ in used], [j for _, j in used])
+            if len(self._layouts) < MAX_LAYOUTS:
+                self._layouts[keys] = layout
+        return layout
+
+    def plan(self, names):
+        """Align a file's columns once: (source indices, feature positions, missing features).
+
+        `block[:, src]` of a matrix over `names` fills columns `dst` of the
+        feature matrix; features in `missing` have no source column.
+        """
+        source = {}
+        for i, name in enumerate(names):
+            source.setdefault(canonical(name), i)
+        src, dst, missing = [], [], []
+        for j, name in enumerate(self.names):
+            i = source.get(name)
+            if i is None:
+                missing.append(self.columns[j])
+            else:
+                src.append(i)
+                dst.append(j)
+        return np.array(src, dtype=np.intp), np.array(dst, dtype=np.intp), missing
+
+    def _coerce(self, raw, strict):
+        """(float matrix, {row: message}) for an object array of raw values."""
+        raw = raw.copy()
+        raw[np.equal(raw, None) | np.equal(raw, '')] = np.nan
+        try:
+            return raw.astype(np.float64), {}
+        except (TypeError, ValueError):
+            pass
+        X = np.empty(raw.shape, dtype=np.float64)
+        errors = {}
+        for i, row in enumerate(raw):
+            try:
+                X[i] = row.astype(np.float64)
+                continue
+            except (TypeError, ValueError):
+                pass
+            first_bad = None
+            for j, value in enumerate(row):
+                try:
+                    X[i, j] = float(value)
+                except (TypeError, ValueError):
+                    X[i, j] = np.nan
+                    first_bad = j if first_bad is None else first_bad
+            if strict:
+                errors[i] = f'feature {self.columns[first_bad]!r} is not numeric: {row[first_bad]!r}'
+                X[i] = np.nan
+        return X, errors
+
+    def transform(self, records, fill_value=np.nan, strict=True):
+        """Build one float matrix over the pipeline's columns for all records.
+
+        Returns (X, errors): X has a row per record with `fill_value` where
+        the record has no value; `errors` maps the index of each record that
+        cannot be used to a message (its row is left NaN). With
+        strict=False non-numeric values are treated as missing instead.
+        """
+        raw = np.full((len(records), len(self.columns)), None, dtype=object)
+        errors = {}
+        for i, record in enumerate(records):
+            if isinstance(record, Exception):
+                errors[i] = f'invalid JSON: {record}'
+            elif not isinstance(record, dict):
+                errors[i] = 'record must be an object'
+            else:
+                keys, positions = self._layout(tuple(record))
+                values = [record[key] for key in keys]
+                try:
+                    raw[i, positions] = values
+                except (TypeError, ValueError):
+                    # sequence values; store them as objects and let coercion report them
+                    for j, value in zip(positions, values):
+                        raw[i, j] = value
+        X, bad = self._coerce(raw, strict)
+        errors.update(bad)
+        if not np.isnan(fill_value):
+            valid = np.ones(len(records), dtype=bool)
+            valid[list(errors)] = False
+            X[valid] = np.where(np.isnan(X[valid]), fill_value, X[valid])
+        return X, errors
+
+    def transform_one(self, record, fill_value=0.0):
+        """1 x n matrix for one record; missing or non-numeric values become `fill_value`."""
+        return self.transform([record if isinstance(record, dict) else {}], fill_value, strict=False)[0]
+
+    def transform_frame(self, df, fill_value=np.nan):
+        """Float matrix for a DataFrame (column names matched canonically)."""
+        df = df.rename(columns=canonical)
+        block = df.reindex(columns=self.names)
+        if all(dtype.kind in 'biuf' for dtype in block.dtypes):
+            X = block.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            X, _ = self._coerce(block.to_numpy(dtype=object), strict=False)
+        if not np.isnan(fill_value):
+            X = np.where(np.isnan(X), fill_value, X)
+        return X
+
+
+@functools.lru_cache(maxsize=32)
+def _compiled(columns):
+    return FeaturePipeline(columns)
+
+
+def pipeline_for(columns):
+    """The compiled pipeline for a feature order (shared, built once)."""
+    return _compiled(tuple(columns))
+
+
+def feature_matrix(records, columns, fill_value=np.nan):
+    """(X, errors) for records over `columns`; see FeaturePipeline.transform."""
+    return pipeline_for(columns).transform(records, fill_value)
+
+
+def add_derived_features(df):
+    """Fill in roa_trend / price_momentum per ticker where they are missing.
+
+    roa_trend is the 3-period rolling mean of ROA(A) and price_momentum the
+    period-over-period change of Close, both within each ticker (ordered by
+    year when present). Column names are matched canonically and left as
+    they are.
+    """
+    names = {canonical(c): c for c in df.columns}
+    ticker = names.get('ticker')
+    if ticker is None:
+        return df
+    df = df.sort_values([ticker, names['year']], kind='stable') if 'year' in names else df.copy()
+    grouped = df.groupby(ticker, sort=False)
+    if 'roa_trend' not in names and ROA_COLUMN in names:
+        df['roa_trend'] = grouped[names[ROA_COLUMN]].rolling(window=3, min_periods=1).mean() \
+            .reset_index(level=0, drop=True)
+    if 'price_momentum' not in names and 'Close' in names:
+        df['price_momentum'] = grouped[names['Close']].pct_change().fillna(0)
+    return df
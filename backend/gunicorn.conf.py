@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for the FinSentinal API
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+- preload_app: the master imports wsgi.py (model, scaler, explainer, sample
+  index) before forking, so workers share one loaded copy copy-on-write
+  instead of each unpickling its own; gc.freeze() keeps the collector from
+  touching (and so copying) those pages in the workers
+- gthread workers: /fetch-live-data, /history and the SSE stream spend their
+  time waiting on the network or SQLite, so each worker serves
+  FINSENTINAL_THREADS requests at once; CPU-bound scoring scales with workers
+- post_worker_init starts the history writer, model watcher, pool reaper and
+  scheduler in each worker (threads do not survive fork())
+
+Environment: FINSENTINAL_BIND (0.0.0.0:5000), WEB_CONCURRENCY (workers,
+default min(4, CPUs)), FINSENTINAL_THREADS (8), FINSENTINAL_WORKER_TIMEOUT (120s),
+FINSENTINAL_MAX_REQUESTS (0 = never recycle workers).
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('FINSENTINAL_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+worker_class = 'gthread'
+threads = int(os.environ.get('FINSENTINAL_THREADS', 8))
+preload_app = True
+timeout = int(os.environ.get('FINSENTINAL_WORKER_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get('FINSENTINAL_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+
+def pre_fork(server, worker):
+    # move everything loaded so far out of the GC's reach; its refcounts are
+    # still written, but full collections no longer touch every object
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import app as app_module
+    app_module.start_background()
@@ -0,0 +1,482 @@
+"""
+Prediction History Store
+SQLite storage for the predictions table
+
+Writes go through one background writer thread that drains a bounded queue
+and commits whatever is pending as a single transaction (group commit), so
+request threads never wait on disk I/O. The database runs in WAL mode, which
+lets per-thread reader connections query history while the writer commits.
+
+Listeners are fed by a tail thread that reads rows past the last id it has
+published whenever the database changes (change_token), so every process
+sees the commits of every other worker and script, not only its own.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from instrumentation import metrics
+
+INSERT_COLUMNS = ('ts', 'fdi', 'risk', 'confidence', 'payload', 'company', 'ticker', 'model_version')
+
+# Columns added after the original table layout, with their SQL types
+MIGRATED_COLUMNS = (('company', 'TEXT'), ('ticker', 'TEXT'), ('model_version', 'TEXT'))
+
+INDEXES = {
+    'idx_predictions_company': 'predictions (company, id)',
+    'idx_predictions_ticker': 'predictions (ticker, id)',
+    'idx_predictions_model_version': 'predictions (model_version)',
+    'idx_predictions_ts': 'predictions (ts)',
+    'idx_predictions_risk_ts': 'predictions (risk, ts)',
+}
+
+# Projection used by the indexed queries; never touches the payload blob
+SUMMARY_COLUMNS = ('id', 'ts', 'fdi', 'risk', 'confidence', 'company', 'ticker', 'model_version')
+
+# Columns a client may request from /history via fields=
+HISTORY_FIELDS = SUMMARY_COLUMNS + ('payload',)
+
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get('FINSENTINAL_HISTORY_FLUSH_MS', 50)) / 1000.0
+DEFAULT_MAX_QUEUE = int(os.environ.get('FINSENTINAL_HISTORY_QUEUE', 10000))
+DEFAULT_MAX_BATCH = 500
+DEFAULT_FLUSH_TIMEOUT = 30.0
+DEFAULT_TAIL_INTERVAL = float(os.environ.get('FINSENTINAL_HISTORY_TAIL_MS', 250)) / 1000.0
+# re-read the table this often even if change_token looks unchanged
+TAIL_FORCE_SECONDS = 5.0
+
+_STOP = object()
+
+
+def risk_label(prob):
+    if prob >= 0.7:
+        return "Distressed"
+    elif prob >= 0.4:
+        return "Moderate"
+    return "Healthy"
+
+
+def history_row(ts, prob, risk, record, model_version):
+    """Row tuple in INSERT_COLUMNS order."""
+    record = record if isinstance(record, dict) else {}
+    ticker = record.get('ticker')
+    return (
+        ts, prob, risk, prob, json.dumps(record),
+        record.get('company'), ticker.upper() if isinstance(ticker, str) else ticker,
+        model_version,
+    )
+
+
+class HistoryStore:
+    """WAL-mode SQLite store with a group-committing background writer."""
+
+    def __init__(self, db_path, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue=DEFAULT_MAX_QUEUE, max_batch=DEFAULT_MAX_BATCH,
+                 enqueue_timeout=1.0, tail_interval=DEFAULT_TAIL_INTERVAL):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.enqueue_timeout = enqueue_timeout
+        self.tail_interval = tail_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._writer = None
+        self._listeners = []
+        self._tail = None
+        # set by our own commits so they are published without waiting for the poll
+        self._tail_wake = threading.Event()
+        self._tail_stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued_rows': 0,
+            'committed_rows': 0,
+            'commits': 0,
+            'dropped_rows': 0,
+            'failed_commits': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'total_commit_ms': 0.0,
+            'last_batch_rows': 0,
+        }
+
+    # -----------------------------
+    # Connections
+    # -----------------------------
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=check_same_thread)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def reader(self):
+        """Return this thread's read connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def query(self, sql, params=()):
+        return self.reader().execute(sql, params).fetchall()
+
+    def init_schema(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT,
+                fdi REAL,
+                risk TEXT,
+                confidence REAL,
+                payload TEXT
+            )
+            ''')
+            self._migrate(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _migrate(self, conn):
+        """Add the indexed company/ticker/model_version columns.
+
+        Rows written before the migration are backfilled from their JSON
+        payload once, so later queries never have to decode it.
+        """
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(predictions)')}
+        added = [name for name, _ in MIGRATED_COLUMNS if name not in existing]
+        for name, sql_type in MIGRATED_COLUMNS:
+            if name in added:
+                conn.execute(f'ALTER TABLE predictions ADD COLUMN {name} {sql_type}')
+
+        if 'company' in added or 'ticker' in added:
+            self._backfill(conn)
+        else:
+            # databases backfilled before tickers were upper-cased there
+            conn.execute('UPDATE predictions SET ticker = UPPER(ticker) WHERE ticker <> UPPER(ticker)')
+
+        for name, target in INDEXES.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+    def _backfill(self, conn):
+        try:
+            conn.execute('''
+            UPDATE predictions
+            SET company = json_extract(payload, '$.company'),
+                ticker = UPPER(json_extract(payload, '$.ticker')),
+                model_version = COALESCE(model_version, json_extract(payload, '$.model_version'))
+            WHERE payload IS NOT NULL AND json_valid(payload)
+            ''')
+            return
+        except sqlite3.OperationalError:
+            # SQLite built without JSON1; decode in Python instead
+            pass
+        updates = []
+        for row_id, payload in conn.execute('SELECT id, payload FROM predictions WHERE payload IS NOT NULL'):
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                # upper-cased like history_row(), so ticker filters match old and new rows alike
+                ticker = data.get('ticker')
+                ticker = ticker.upper() if isinstance(ticker, str) else ticker
+                updates.append((data.get('company'), ticker, data.get('model_version'), row_id))
+        conn.executemany(
+            'UPDATE predictions SET company = ?, ticker = ?, model_version = COALESCE(model_version, ?) WHERE id = ?',
+            updates)
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def _ensure_writer(self):
+        # a thread object inherited through fork() is not running in the child
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name='history-writer', daemon=True)
+            self._writer.start()
+
+    def start(self):
+        """Start the writer thread, and the tail thread if there are listeners."""
+        self._ensure_writer()
+        if self._listeners and (self._tail is None or not self._tail.is_alive()):
+            self._tail_stop.clear()
+            self._tail = threading.Thread(target=self._run_tail, name='history-tail', daemon=True)
+            self._tail.start()
+
+    def add_listener(self, callback):
+        """Call `callback(rows)` for rows committed by any process.
+
+        `rows` is a list of dicts with the SUMMARY_COLUMNS of newly
+        committed rows (payload excluded), in id order, delivered from the
+        tail thread. Register listeners before start().
+        """
+        self._listeners.append(callback)
+
+    def record(self, row):
+        """Queue one row (a tuple in INSERT_COLUMNS order) for insertion."""
+        return self.record_many([row])
+
+    def record_many(self, rows):
+        """Queue rows to be committed together; returns False if dropped.
+
+        A full queue applies backpressure for up to `enqueue_timeout`
+        seconds before the rows are counted as dropped.
+        """
+        rows = list(rows)
+        if not rows:
+            return True
+        self._ensure_writer()
+        try:
+            self._queue.put(rows, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['dropped_rows'] += len(rows)
+            return False
+        with self._stats_lock:
+            self._stats['enqueued_rows'] += len(rows)
+        return True
+
+    def flush(self, timeout=DEFAULT_FLUSH_TIMEOUT):
+        """Block until everything queued so far has been committed.
+
+        Returns False when that takes longer than `timeout` seconds or the
+        writer dies first; timeout=None waits as long as the writer runs.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._ensure_writer()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        while not done.wait(0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic()))):
+            if not self._writer.is_alive():
+                return done.is_set()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def close(self, timeout=5.0):
+        self._tail_stop.set()
+        self._tail_wake.set()
+        if self._writer is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._writer.join(timeout)
+        self._writer = None
+
+    def _run_writer(self):
+        conn = self._connect(check_same_thread=False)
+        sql = 'INSERT INTO predictions ({}) VALUES ({})'.format(
+            ', '.join(INSERT_COLUMNS), ', '.join('?' for _ in INSERT_COLUMNS))
+        stopping = False
+        try:
+            while not stopping:
+                item = self._queue.get()
+                pending, waiters = [], []
+                deadline = time.monotonic() + self.flush_interval
+                # gather everything that arrives within the flush window
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        pending.extend(item)
+                    if stopping or len(pending) >= self.max_batch:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if pending:
+                    self._commit(conn, sql, pending)
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            conn.close()
+
+    def _commit(self, conn, sql, rows):
+        started = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(sql, rows)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats['failed_commits'] += 1
+                self._stats['dropped_rows'] += len(rows)
+            print(f"⚠️ History commit failed ({len(rows)} rows): {e}")
+            return
+        elapsed = time.perf_counter() - started
+        metrics.observe('sqlite_commit', elapsed, endpoint='history_writer')
+        elapsed_ms = elapsed * 1000
+        with self._stats_lock:
+            s = self._stats
+            s['commits'] += 1
+            s['committed_rows'] += len(rows)
+            s['last_commit_ms'] = elapsed_ms
+            s['max_commit_ms'] = max(s['max_commit_ms'], elapsed_ms)
+            s['total_commit_ms'] += elapsed_ms
+            s['last_batch_rows'] = len(rows)
+        self._tail_wake.set()
+
+    # -----------------------------
+    # Tail (committed rows of every process -> listeners)
+    # -----------------------------
+    def _run_tail(self):
+        """Publish rows past the last published id whenever the database changes.
+
+        Writers serialize on SQLite's write lock, so ids become visible in
+        increasing order and an id cursor never skips a committed row.
+        """
+        try:
+            last_id = self.query('SELECT COALESCE(MAX(id), 0) FROM predictions')[0][0]
+        except sqlite3.Error as e:
+            print(f"⚠️ History tail could not start: {e}")
+            return
+        token = self.change_token()
+        checked = time.monotonic()
+        while not self._tail_stop.is_set():
+            self._tail_wake.wait(self.tail_interval)
+            self._tail_wake.clear()
+            # read the token before the rows, so a commit in between is seen next round
+            current = self.change_token()
+            if current == token and time.monotonic() - checked < TAIL_FORCE_SECONDS:
+                continue
+            token, checked = current, time.monotonic()
+            try:
+                while not self._tail_stop.is_set():
+                    rows = self.since(since_id=last_id, limit=self.max_batch)
+                    if not rows:
+                        break
+                    summaries = [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+                    last_id = summaries[-1]['id']
+                    self._notify(summaries)
+                    if len(rows) < self.max_batch:
+                        break
+            except sqlite3.Error as e:
+                print(f"⚠️ History tail read failed: {e}")
+
+    def _notify(self, summaries):
+        for callback in self._listeners:
+            try:
+                callback(summaries)
+            except Exception as e:
+                print(f"⚠️ History listener failed: {e}")
+
+    # -----------------------------
+    # Change tracking (no SQLite access)
+    # -----------------------------
+    def change_token(self):
+        """Cheap token that changes whenever any process commits.
+
+        Built from the stat() of the database and its WAL file, so it also
+        sees rows written by other workers or scripts, plus this process's
+        own commit counter.
+        """
+        parts = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                st = os.stat(path)
+                parts.append(f'{st.st_mtime_ns:x}.{st.st_size:x}')
+            except OSError:
+                parts.append('-')
+        parts.append(str(self._stats['commits']))
+        return '-'.join(parts)
+
+    def last_modified(self):
+        """Latest mtime of the database files, as a UTC datetime."""
+        latest = 0.0
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                latest = max(latest, os.stat(path).st_mtime)
+            except OSError:
+                pass
+        return datetime.fromtimestamp(latest, tz=timezone.utc)
+
+    # -----------------------------
+    # Indexed queries (no payload decoding)
+    # -----------------------------
+    @staticmethod
+    def _filters(start=None, end=None, company=None, ticker=None):
+        clauses, params = [], []
+        if company:
+            clauses.append('company = ?')
+            params.append(company)
+        if ticker:
+            clauses.append('ticker = ?')
+            params.append(ticker.upper())
+        if start:
+            clauses.append('ts >= ?')
+            params.append(start)
+        if end:
+            clauses.append('ts <= ?')
+            params.append(end)
+        where = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return where, params
+
+    def since(self, since_id=None, limit=50, columns=SUMMARY_COLUMNS):
+        """Rows in `columns`, oldest first.
+
+        With a `since_id` cursor only rows with a larger id are returned;
+        otherwise the latest `limit` rows.
+        """
+        cols = ', '.join(columns)
+        if since_id is not None:
+            return self.query(
+                f'SELECT {cols} FROM predictions WHERE id > ? ORDER BY id ASC LIMIT ?',
+                (since_id, limit))
+        rows = self.query(f'SELECT {cols} FROM predictions ORDER BY id DESC LIMIT ?', (limit,))
+        return rows[::-1]
+
+    def _summaries(self, sql, params):
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in self.query(sql, params)]
+
+    def latest_per_company(self):
+        """Most recent prediction for every company, via the company index."""
+        cols = ', '.join('p.' + c for c in SUMMARY_COLUMNS)
+        return self._summaries(f'''
+            SELECT {cols} FROM predictions p
+            JOIN (SELECT company, MAX(id) AS id FROM predictions
+                  WHERE company IS NOT NULL GROUP BY company) latest
+              ON p.id = latest.id
+            ORDER BY p.company
+        ''', ())
+
+    def range(self, start=None, end=None, company=None, ticker=None, limit=500):
+        """Predictions inside a ts window, oldest first."""
+        where, params = self._filters(start, end, company, ticker)
+        return self._summaries(
+            f'SELECT {", ".join(SUMMARY_COLUMNS)} FROM predictions{where} ORDER BY ts, id LIMIT ?',
+            params + [limit])
+
+    def risk_counts(self, start=None, end=None, company=None, ticker=None):
+        """Number of predictions per risk bucket."""
+        where, params = self._filters(start, end, company, ticker)
+        rows = self.query(f'SELECT risk, COUNT(*) FROM predictions{where} GROUP BY risk', params)
+        return {risk or 'Unknown': count for risk, count in rows}
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        total_ms = s.pop('total_commit_ms')
+        s['avg_commit_ms'] = total_ms / s['commits'] if s['commits'] else 0.0
+        s['avg_batch_rows'] = s['committed_rows'] / s['commits'] if s['commits'] else 0.0
+        s['queue_depth'] = self._queue.qsize()
+        s['queue_bound'] = self._queue.maxsize
+        s['flush_interval_ms'] = self.flush_interval * 1000
+        s['writer_alive'] = bool(self._writer and self._writer.is_alive())
+        return s
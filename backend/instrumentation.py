@@ -0,0 +1,340 @@
+"""
+Instrumentation
+Per-endpoint / per-stage latency histograms, request counters and sampled profiles
+
+`stage(name)` (context manager) and `timed(name)` (decorator) add the
+elapsed time of a block to the histogram of (endpoint, stage), where the
+endpoint is the route of the request being handled on this thread, or
+"background" outside a request. Recording is a perf_counter pair, a bisect
+and a short locked update.
+
+`Metrics.init_app(app)` adds Flask hooks that count requests by endpoint,
+method and status, count errors (5xx or an unhandled exception) and time
+every request. `render()` produces the Prometheus text format served at
+/metrics.
+
+Profiling is opt-in: with FINSENTINAL_PROFILE_SAMPLE=<rate> that fraction
+of requests runs under cProfile (or pyinstrument with
+FINSENTINAL_PROFILER=pyinstrument) and the profiles of the slowest
+FINSENTINAL_PROFILE_KEEP requests are kept in FINSENTINAL_PROFILE_DIR.
+"""
+
+import bisect
+import contextvars
+import cProfile
+import functools
+import math
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_SAMPLE = float(os.environ.get('FINSENTINAL_PROFILE_SAMPLE', 0))
+PROFILE_KEEP = int(os.environ.get('FINSENTINAL_PROFILE_KEEP', 10))
+PROFILE_DIR = os.environ.get('FINSENTINAL_PROFILE_DIR', os.path.join(BASE_DIR, 'data', 'profiles'))
+PROFILER = os.environ.get('FINSENTINAL_PROFILER', 'cprofile').lower()
+
+BACKGROUND = 'background'
+
+# route of the request being handled in this context
+_endpoint = contextvars.ContextVar('finsentinal_endpoint', default=BACKGROUND)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (seconds)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative counts per bucket incl. +Inf, sum, count)."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+
+
+class Metrics:
+    """Registry of request counters, latency histograms and gauges."""
+
+    def __init__(self, namespace='finsentinal', profile_sample=PROFILE_SAMPLE, profile_keep=PROFILE_KEEP,
+                 profile_dir=PROFILE_DIR, profiler=PROFILER):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        # (endpoint, stage) -> Histogram
+        self._stages = {}
+        # endpoint -> Histogram
+        self._requests = {}
+        # (endpoint, method, status) -> count
+        self._responses = {}
+        # endpoint -> count
+        self._errors = {}
+        # name -> (help, callable returning a number)
+        self._gauges = {}
+        self.started_at = time.time()
+
+        self.profile_sample = profile_sample
+        self.profile_keep = profile_keep
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        # cProfile cannot run two profilers at once (3.12+), so one request at a time
+        self._profile_lock = threading.Lock()
+        # [(seconds, path)] of the kept profiles, slowest last
+        self._profiles = []
+
+    # -----------------------------
+    # Recording
+    # -----------------------------
+    def _histogram(self, table, key):
+        hist = table.get(key)
+        if hist is None:
+            with self._lock:
+                hist = table.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, stage_name, seconds, endpoint=None):
+        self._histogram(self._stages, (endpoint or _endpoint.get(), stage_name)).observe(seconds)
+
+    def stage(self, name, endpoint=None):
+        """Context manager timing a block as stage `name` of the current endpoint."""
+        return _Stage(self, name, endpoint)
+
+    def timed(self, name=None, endpoint=None):
+        """Decorator timing every call as a stage (default: the function name)."""
+        def decorator(fn):
+            stage_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(stage_name, time.perf_counter() - started, endpoint)
+            return wrapper
+        return decorator
+
+    def add_gauge(self, name, help_text, fn):
+        """Report fn() as gauge `<namespace>_<name>` on every scrape."""
+        self._gauges[name] = (help_text, fn)
+
+    def record_request(self, endpoint, method, status, seconds, error=False):
+        self._histogram(self._requests, endpoint).observe(seconds)
+        with self._lock:
+            key = (endpoint, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    # -----------------------------
+    # Flask integration
+    # -----------------------------
+    def init_app(self, app):
+        from flask import g, jsonify, request
+
+        @app.before_request
+        def _start_request():
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            _endpoint.set(endpoint)
+            g._metrics_endpoint = endpoint
+            g._metrics_status = None
+            g._metrics_profiler = self._start_profile()
+            g._metrics_started = time.perf_counter()
+
+        @app.after_request
+        def _note_status(response):
+            g._metrics_status = response.status_code
+            return response
+
+        @app.teardown_request
+        def _finish_request(exc):
+            started = g.pop('_metrics_started', None)
+            _endpoint.set(BACKGROUND)
+            if started is None:
+                return
+            elapsed = time.perf_counter() - started
+            status = 500 if exc is not None else (g.get('_metrics_status') or 500)
+            endpoint = g.get('_metrics_endpoint', 'unmatched')
+            self.record_request(endpoint, request.method, status, elapsed, error=status >= 500)
+            profiler = g.pop('_metrics_profiler', None)
+            if profiler is not None:
+                self._finish_profile(profiler, endpoint, elapsed)
+
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            return self.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+        @app.route('/metrics/profiles', methods=['GET'])
+        def metrics_profiles():
+            return jsonify(self.profiles())
+
+    # -----------------------------
+    # Sampled profiling
+    # -----------------------------
+    def _start_profile(self):
+        if self.profile_sample <= 0 or random.random() >= self.profile_sample:
+            return None
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        try:
+            if self.profiler == 'pyinstrument':
+                from pyinstrument import Profiler
+                profiler = Profiler()
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            return profiler
+        except Exception as e:
+            self._profile_lock.release()
+            print(f"⚠️ Profiling disabled: {e}")
+            self.profile_sample = 0
+            return None
+
+    def _finish_profile(self, profiler, endpoint, seconds):
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+        finally:
+            self._profile_lock.release()
+        with self._lock:
+            if len(self._profiles) >= self.profile_keep and seconds <= self._profiles[0][0]:
+                return
+            evicted = self._profiles.pop(0) if len(self._profiles) >= self.profile_keep else None
+            slug = re.sub(r'[^a-zA-Z0-9]+', '_', endpoint).strip('_') or 'root'
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            ext = 'prof' if isinstance(profiler, cProfile.Profile) else 'html'
+            path = os.path.join(self.profile_dir, f"{seconds * 1000:09.1f}ms_{slug}_{stamp}.{ext}")
+            bisect.insort(self._profiles, (seconds, path))
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if isinstance(profiler, cProfile.Profile):
+            profiler.dump_stats(path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        if evicted is not None and os.path.exists(evicted[1]):
+            os.remove(evicted[1])
+
+    def profiles(self):
+        with self._lock:
+            kept = list(reversed(self._profiles))
+        return {
+            'sample_rate': self.profile_sample,
+            'keep': self.profile_keep,
+            'profiler': self.profiler,
+            'profiles': [{'duration_ms': s * 1000, 'path': p} for s, p in kept],
+        }
+
+    # -----------------------------
+    # Exposition
+    # -----------------------------
+    def _render_histogram(self, lines, name, labels, hist):
+        cumulative, total, count = hist.snapshot()
+        label_text = ','.join(f'{k}="{_label_value(v)}"' for k, v in labels)
+        sep = ',' if label_text else ''
+        for bound, c in zip(hist.buckets + (math.inf,), cumulative):
+            le = '+Inf' if bound == math.inf else repr(bound)
+            lines.append(f'{name}_bucket{{{label_text}{sep}le="{le}"}} {c}')
+        lines.append(f'{name}_sum{{{label_text}}} {total}')
+        lines.append(f'{name}_count{{{label_text}}} {count}')
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        ns = self.namespace
+        with self._lock:
+            stages = sorted(self._stages.items())
+            requests = sorted(self._requests.items())
+            responses = sorted(self._responses.items())
+            errors = sorted(self._errors.items())
+            gauges = sorted(self._gauges.items())
+        lines = []
+
+        name = f'{ns}_request_duration_seconds'
+        lines += [f'# HELP {name} Request latency by endpoint.', f'# TYPE {name} histogram']
+        for endpoint, hist in requests:
+            self._render_histogram(lines, name, [('endpoint', endpoint)], hist)
+
+        name = f'{ns}_requests_total'
+        lines += [f'# HELP {name} Requests by endpoint, method and status.', f'# TYPE {name} counter']
+        for (endpoint, method, status), count in responses:
+            lines.append(f'{name}{{endpoint="{_label_value(endpoint)}",method="{method}",status="{status}"}} {count}')
+
+        name = f'{ns}_request_errors_total'
+        lines += [f'# HELP {name} Requests that failed with a 5xx or an unhandled exception.',
+                  f'# TYPE {name} counter']
+        for endpoint, count in errors:
+            lines.append(f'{name}{{endpoint="{_label_value(endpoint)}"}} {count}')
+
+        name = f'{ns}_stage_duration_seconds'
+        lines += [f'# HELP {name} Latency of instrumented stages by endpoint.', f'# TYPE {name} histogram']
+        for (endpoint, stage_name), hist in stages:
+            self._render_histogram(lines, name, [('endpoint', endpoint), ('stage', stage_name)], hist)
+
+        for gauge, (help_text, fn) in gauges:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            name = _metric_name(f'{ns}_{gauge}')
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+
+        name = f'{ns}_uptime_seconds'
+        lines += [f'# HELP {name} Seconds since the metrics registry was created.', f'# TYPE {name} gauge',
+                  f'{name} {time.time() - self.started_at}']
+        return '\n'.join(lines) + '\n'
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'endpoint', 'started', 'seconds')
+
+    def __init__(self, metrics, name, endpoint):
+        self.metrics = metrics
+        self.name = name
+        self.endpoint = endpoint
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # kept on the stage so callers can report it too
+        self.seconds = time.perf_counter() - self.started
+        self.metrics.observe(self.name, self.seconds, self.endpoint)
+        return False
+
+
+# process-wide registry used by the app and the modules it instruments
+metrics = Metrics()
+stage = metrics.stage
+timed = metrics.timed
@@ -0,0 +1,298 @@
+"""
+Market Data Service
+Cached, coalesced and rate-limited live market data behind a provider interface
+
+Providers only know how to fetch the raw quote/fundamentals dict for one
+symbol (`YFinanceProvider`, or `FixtureProvider` reading a local JSON file for
+tests and offline development). MarketDataService adds:
+
+- a TTL cache; entries older than the TTL but younger than `stale_ttl` are
+  served immediately while one background fetch revalidates them
+- single-flight: concurrent requests for the same symbol share one fetch
+- a bounded thread pool so several symbols are fetched concurrently
+- a token-bucket rate limiter in front of the provider
+"""
+
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+from instrumentation import stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROVIDER = os.environ.get('FINSENTINAL_MARKET_PROVIDER', 'yfinance').lower()
+FIXTURE_PATH = os.environ.get('FINSENTINAL_MARKET_FIXTURE', os.path.join(BASE_DIR, 'fixtures', 'market_data.json'))
+DEFAULT_TTL = float(os.environ.get('FINSENTINAL_MARKET_TTL', 300))
+DEFAULT_STALE_TTL = float(os.environ.get('FINSENTINAL_MARKET_STALE_TTL', 3600))
+DEFAULT_WORKERS = int(os.environ.get('FINSENTINAL_MARKET_WORKERS', 4))
+DEFAULT_RATE = float(os.environ.get('FINSENTINAL_MARKET_RATE', 2))  # fetches per second
+DEFAULT_TIMEOUT = float(os.environ.get('FINSENTINAL_MARKET_TIMEOUT', 20))
+
+
+class ProviderUnavailable(RuntimeError):
+    """The provider cannot be used (e.g. its library is not installed)."""
+
+
+# -----------------------------
+# Providers
+# -----------------------------
+class MarketDataProvider:
+    """Fetches the raw info dict (yfinance `Ticker.info` keys) for one symbol."""
+
+    name = 'provider'
+
+    def available(self):
+        return True
+
+    def warm(self):
+        """Load whatever the first fetch would otherwise load (imports, files)."""
+
+    def fetch(self, symbol):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = 'Yahoo Finance'
+
+    def available(self):
+        return importlib.util.find_spec('yfinance') is not None
+
+    def warm(self):
+        if self.available():
+            import yfinance  # noqa: F401  (slow: pulls in pandas, requests, ...)
+
+    def fetch(self, symbol):
+        try:
+            import yfinance as yf
+        except ImportError:
+            raise ProviderUnavailable('yfinance not installed. Install with: pip install yfinance')
+        return yf.Ticker(symbol).info
+
+
+class FixtureProvider(MarketDataProvider):
+    """Serves info dicts from a JSON file {symbol: {...}}, with optional latency."""
+
+    name = 'Fixture'
+
+    def __init__(self, path=FIXTURE_PATH, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self._data = None
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def warm(self):
+        if self._data is None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+
+    def fetch(self, symbol):
+        self.warm()
+        if self.latency:
+            time.sleep(self.latency)
+        if symbol not in self._data:
+            raise KeyError(f'no fixture data for {symbol}')
+        return dict(self._data[symbol])
+
+
+def default_provider():
+    if PROVIDER == 'fixture':
+        return FixtureProvider()
+    return YFinanceProvider()
+
+
+def live_metrics(info, symbol, company, source):
+    """The /fetch-live-data payload for one provider info dict."""
+    live_data = {
+        'ticker': symbol,
+        'company': company,
+        'current_price': info.get('currentPrice', 0),
+        'market_cap': info.get('marketCap', 0),
+        'pe_ratio': info.get('trailingPE', 0),
+        'pb_ratio': info.get('priceToBook', 0),
+        'debt_to_equity': info.get('debtToEquity', 0),
+        'current_ratio': info.get('currentRatio', 0),
+        'quick_ratio': info.get('quickRatio', 0),
+        'profit_margin': info.get('profitMargins', 0),
+        'operating_margin': info.get('operatingMargins', 0),
+        'roe': info.get('returnOnEquity', 0),
+        'roa': info.get('returnOnAssets', 0),
+        'revenue_growth': info.get('revenueGrowth', 0),
+        'earnings_growth': info.get('earningsGrowth', 0),
+        'total_cash': info.get('totalCash', 0),
+        'total_debt': info.get('totalDebt', 0),
+        'total_revenue': info.get('totalRevenue', 0),
+        'ebitda': info.get('ebitda', 0),
+        'free_cash_flow': info.get('freeCashflow', 0),
+        'beta': info.get('beta', 1.0),
+        'fifty_two_week_high': info.get('fiftyTwoWeekHigh', 0),
+        'fifty_two_week_low': info.get('fiftyTwoWeekLow', 0),
+        'data_source': source,
+    }
+
+    # Calculate additional ratios
+    if live_data['total_revenue'] and live_data['total_revenue'] > 0:
+        live_data['debt_to_revenue'] = (live_data['total_debt'] or 0) / live_data['total_revenue']
+        live_data['cash_to_revenue'] = (live_data['total_cash'] or 0) / live_data['total_revenue']
+    return live_data
+
+
+# -----------------------------
+# Rate limiting
+# -----------------------------
+class RateLimiter:
+    """Token bucket: `rate` acquisitions per second with bursts up to `burst`."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+                self.waited_seconds += delay
+            time.sleep(delay)
+
+
+# -----------------------------
+# Service
+# -----------------------------
+class MarketDataService:
+    """TTL-cached, single-flight, rate-limited access to a provider."""
+
+    def __init__(self, provider=None, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL,
+                 max_workers=DEFAULT_WORKERS, rate=DEFAULT_RATE):
+        self.provider = provider or default_provider()
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.limiter = RateLimiter(rate)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='market-data')
+        self._lock = threading.Lock()
+        # symbol -> (fetched_at monotonic, fetched_at iso, info)
+        self._cache = {}
+        # symbol -> Future of the fetch in progress
+        self._inflight = {}
+        self._stats = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0, 'fetches': 0,
+                       'coalesced': 0, 'errors': 0, 'revalidations': 0}
+
+    def available(self):
+        return self.provider.available()
+
+    def warm(self):
+        self.provider.warm()
+
+    def _fetch(self, symbol):
+        try:
+            with stage('rate_limit_wait', endpoint='market_data'):
+                self.limiter.acquire()
+            with stage('provider_fetch', endpoint='market_data'):
+                info = self.provider.fetch(symbol) or {}
+        except Exception:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+                self._stats['errors'] += 1
+            raise
+        # cache before leaving the in-flight map, so no caller sees neither
+        with self._lock:
+            self._cache[symbol] = (time.monotonic(), datetime.now().isoformat(), info)
+            self._inflight.pop(symbol, None)
+            self._stats['fetches'] += 1
+        return info
+
+    def _start_fetch(self, symbol):
+        """The in-flight fetch for `symbol`, starting one if there is none. Caller holds _lock."""
+        future = self._inflight.get(symbol)
+        if future is None:
+            future = self._pool.submit(self._fetch, symbol)
+            self._inflight[symbol] = future
+        else:
+            self._stats['coalesced'] += 1
+        return future
+
+    def lookup(self, symbol):
+        """(entry, future, state) for one symbol without blocking.
+
+        state is 'fresh' or 'stale' with a cached entry (a stale entry also
+        starts a background revalidation), or 'miss' with a future to wait on.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(symbol)
+            age = now - entry[0] if entry else None
+            if entry and age < self.ttl:
+                self._stats['fresh_hits'] += 1
+                return entry, None, 'fresh'
+            if entry and age < self.stale_ttl:
+                self._stats['stale_hits'] += 1
+                if symbol not in self._inflight:
+                    self._stats['revalidations'] += 1
+                    future = self._pool.submit(self._fetch, symbol)
+                    self._inflight[symbol] = future
+                    # a failed revalidation keeps the stale entry; mark the error as retrieved
+                    future.add_done_callback(lambda f: f.exception())
+                return entry, None, 'stale'
+            self._stats['misses'] += 1
+            return None, self._start_fetch(symbol), 'miss'
+
+    def get(self, symbol, timeout=DEFAULT_TIMEOUT):
+        """(info, fetched_at iso, state) for one symbol; raises on fetch failure."""
+        return self.get_many([symbol], timeout=timeout)[symbol]
+
+    def get_many(self, symbols, timeout=DEFAULT_TIMEOUT):
+        """{symbol: (info, fetched_at, state) or Exception}, fetching misses concurrently."""
+        results, pending = {}, {}
+        for symbol in dict.fromkeys(symbols):
+            entry, future, state = self.lookup(symbol)
+            if entry is not None:
+                results[symbol] = (entry[2], entry[1], state)
+            else:
+                pending[symbol] = future
+        if pending:
+            wait(pending.values(), timeout=timeout)
+            for symbol, future in pending.items():
+                if not future.done():
+                    results[symbol] = TimeoutError(f'{symbol}: no response within {timeout:.0f}s')
+                    continue
+                error = future.exception()
+                if error is not None:
+                    results[symbol] = error
+                    continue
+                with self._lock:
+                    entry = self._cache.get(symbol)
+                results[symbol] = (entry[2], entry[1], 'miss')
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'provider': self.provider.name,
+                'cached_symbols': len(self._cache),
+                'inflight': len(self._inflight),
+                'ttl_seconds': self.ttl,
+                'stale_ttl_seconds': self.stale_ttl,
+                'rate_per_second': self.limiter.rate,
+                'rate_limit_wait_seconds': round(self.limiter.waited_seconds, 3),
+            })
+        lookups = stats['fresh_hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['fresh_hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
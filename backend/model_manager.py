@@ -4,22 +4,53 @@ Handles model versioning, retraining, and artifact management
 """
 
 import os
+import io
 import shutil
 import pickle
 import json
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
+import multiprocessing
 from pathlib import Path
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, log_loss
+
+import arff_loader
+import artifact_store
+import bulk_scoring
+import tree_engine
+import tuning
+from feature_pipeline import canonical, pipeline_for
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, "models")
 ARCHIVE_DIR = os.path.join(BASE_DIR, "models", "archive")
 DATA_DIR = os.path.join(BASE_DIR, "data")
+# one versioned artifact set per ARFF horizon: horizons/<name>/v<version>/
+HORIZON_DIR = os.path.join(MODEL_DIR, "horizons")
+
+# used until `tune` has written a best configuration into the metadata
+DEFAULT_XGB_PARAMS = {'n_estimators': 100, 'max_depth': 5, 'learning_rate': 0.1}
+
+# incremental retrain: boosting rounds added per run, and the gate that
+# decides between keeping the continued model and a full refit
+INCREMENTAL_ROUNDS = 25
+MIN_DELTA_ROWS = 20
+DRIFT_THRESHOLD = 0.5      # max |mean shift| in units of the serving scaler's std
+LOGLOSS_TOLERANCE = 0.02   # continued model may be at most 2% worse on the delta holdout
+
+# native thread pools that must be capped per worker process
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# files recorded for each archived version
+ARCHIVED_FILES = ('xgb_model.pkl', 'scaler.pkl', 'feature_cols.pkl', 'model_metadata.json')
 
 # Create archive directory if it doesn't exist
 os.makedirs(ARCHIVE_DIR, exist_ok=True)
@@ -42,7 +73,32 @@ def increment_version(version):
     return '.'.join(parts)
 
 
-def save_model_metadata(version, metrics, training_date, data_samples):
+def _atomic_pickle(obj, path):
+    """Pickle to a temp file and rename it over `path`.
+
+    The running Flask app hot-reloads these files, so it must never see a
+    half-written pickle.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def _write_json(data, path):
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def save_model_metadata(version, metrics, training_date, data_samples, tuning_info=None, extra=None):
     """Save model metadata for tracking"""
     metadata = {
         'version': version,
@@ -50,34 +106,38 @@ def save_model_metadata(version, metrics, training_date, data_samples):
         'data_samples': data_samples,
         'metrics': metrics,
     }
-    metadata_path = os.path.join(MODEL_DIR, "model_metadata.json")
-    with open(metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    if tuning_info:
+        metadata['tuning'] = tuning_info
+    metadata.update(extra or {})
+    _write_json(metadata, os.path.join(MODEL_DIR, "model_metadata.json"))
     print(f"✅ Model metadata saved: v{version}")
 
 
-def archive_current_model():
+def _archive_store():
+    """The content-addressed archive, with any old per-directory archives imported."""
+    store = artifact_store.ArtifactStore(ARCHIVE_DIR)
+    imported = store.import_legacy()
+    if imported:
+        print(f"📦 Imported {len(imported)} legacy archive(s) into the artifact store")
+    return store
+
+
+def archive_current_model(store=None):
     """Archive the current model before retraining"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    version = get_model_version()
-    
-    archive_name = f"model_v{version}_{timestamp}"
-    archive_path = os.path.join(ARCHIVE_DIR, archive_name)
-    os.makedirs(archive_path, exist_ok=True)
-    
-    # Copy model artifacts
-    for artifact in ['xgb_model.pkl', 'scaler.pkl', 'feature_cols.pkl']:
-        src = os.path.join(MODEL_DIR, artifact)
-        if os.path.exists(src):
-            shutil.copy(src, os.path.join(archive_path, artifact))
-    
-    # Copy metadata
-    metadata_path = os.path.join(MODEL_DIR, "model_metadata.json")
-    if os.path.exists(metadata_path):
-        shutil.copy(metadata_path, os.path.join(archive_path, "metadata.json"))
-    
-    print(f"📦 Model archived: {archive_name}")
-    return archive_path
+    store = store or _archive_store()
+    metadata = _read_json(os.path.join(MODEL_DIR, "model_metadata.json"))
+    metadata.setdefault('version', get_model_version())
+    entry, created = store.archive(MODEL_DIR, ARCHIVED_FILES, metadata)
+    if created:
+        print(f"📦 Model archived: {entry['id']}")
+    else:
+        print(f"📦 Model already archived as {entry['id']}")
+
+    # retention: never collect the blobs of the version being archived (= serving)
+    removed, blobs, freed = store.gc(protect=entry['files'].values())
+    if removed or blobs:
+        print(f"🧹 Archive GC: {len(removed)} version(s), {blobs} blob(s), {freed / 1e6:.1f} MB freed")
+    return entry['id']
 
 
 def load_training_data(csv_path):
@@ -97,31 +157,19 @@ def load_training_data(csv_path):
     
     # Use all numeric columns as features (except target)
     feature_cols = [col for col in df.columns if col != 'fdi' and pd.api.types.is_numeric_dtype(df[col])]
-    X = df[feature_cols].fillna(0).values
+    X = pipeline_for(feature_cols).transform_frame(df, fill_value=0.0)
     
     print(f"🔧 Using {len(feature_cols)} features for training")
     return X, y, feature_cols
 
 
-def retrain_model(csv_path=None):
-    """Retrain the XGBoost model"""
-    if csv_path is None:
-        csv_path = os.path.join(DATA_DIR, 'FINSENTINAL_FINAL.csv')
-    
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Training data not found: {csv_path}")
-    
-    print(f"\n🚀 Starting model retraining from {csv_path}...")
-    
-    # Archive current model
-    archive_current_model()
-    
-    # Load training data
-    X, y, feature_cols = load_training_data(csv_path)
-    
-    # Split data
+def _fit_xgb(X, y, n_jobs=None, params=None):
+    """Split, scale, fit and evaluate one XGBoost classifier on binary labels y.
+
+    `params` (e.g. the tuned configuration) override DEFAULT_XGB_PARAMS.
+    """
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=(y > 0.5)
+        X, y, test_size=0.2, random_state=42, stratify=y
     )
     
     # Scale features
@@ -129,31 +177,25 @@ def retrain_model(csv_path=None):
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
     
-    # Convert continuous FDI to binary classification (>0.5 = distressed)
-    y_train_binary = (y_train > 0.5).astype(int)
-    y_test_binary = (y_test > 0.5).astype(int)
-    
     # Train XGBoost model
     print("🤖 Training XGBoost model...")
     model = XGBClassifier(
-        n_estimators=100,
-        max_depth=5,
-        learning_rate=0.1,
+        **{**DEFAULT_XGB_PARAMS, **(params or {})},
         random_state=42,
         eval_metric='logloss',
+        n_jobs=n_jobs,
         verbose=0
     )
-    model.fit(X_train_scaled, y_train_binary)
+    model.fit(X_train_scaled, y_train)
     
     # Evaluate
     y_pred = model.predict(X_test_scaled)
-    y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
     
     metrics = {
-        'accuracy': float(accuracy_score(y_test_binary, y_pred)),
-        'precision': float(precision_score(y_test_binary, y_pred)),
-        'recall': float(recall_score(y_test_binary, y_pred)),
-        'f1': float(f1_score(y_test_binary, y_pred)),
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'precision': float(precision_score(y_test, y_pred, zero_division=0)),
+        'recall': float(recall_score(y_test, y_pred, zero_division=0)),
+        'f1': float(f1_score(y_test, y_pred, zero_division=0)),
         'test_samples': len(y_test),
         'train_samples': len(y_train),
     }
@@ -163,77 +205,532 @@ def retrain_model(csv_path=None):
     print(f"   Precision: {metrics['precision']:.4f}")
     print(f"   Recall:    {metrics['recall']:.4f}")
     print(f"   F1 Score:  {metrics['f1']:.4f}")
+    return model, scaler, metrics
+
+
+def retrain_model(csv_path=None, n_jobs=None):
+    """Retrain the XGBoost model"""
+    if csv_path is None:
+        csv_path = os.path.join(DATA_DIR, 'FINSENTINAL_FINAL.csv')
     
-    # Save new model
-    version = increment_version(get_model_version())
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Training data not found: {csv_path}")
     
-    with open(os.path.join(MODEL_DIR, 'xgb_model.pkl'), 'wb') as f:
-        pickle.dump(model, f)
+    print(f"\n🚀 Starting model retraining from {csv_path}...")
     
-    with open(os.path.join(MODEL_DIR, 'scaler.pkl'), 'wb') as f:
-        pickle.dump(scaler, f)
+    # Archive current model
+    archive_current_model()
     
-    with open(os.path.join(MODEL_DIR, 'feature_cols.pkl'), 'wb') as f:
-        pickle.dump(feature_cols, f)
+    # Load training data
+    csv_bytes = os.path.getsize(csv_path)
+    X, y, feature_cols = load_training_data(csv_path)
+    
+    tuning_info = _read_json(os.path.join(MODEL_DIR, "model_metadata.json")).get('tuning')
+    params = tuning_info['best_params'] if tuning_info else None
+    model, scaler, metrics = _fit_xgb(X, (y > 0.5).astype(int), n_jobs=n_jobs, params=params)
+    
+    # Save new model
+    version = increment_version(get_model_version())
+    
+    _atomic_pickle(model, os.path.join(MODEL_DIR, 'xgb_model.pkl'))
+    _atomic_pickle(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+    _atomic_pickle(feature_cols, os.path.join(MODEL_DIR, 'feature_cols.pkl'))
     
     # Save metadata
     save_model_metadata(
         version=version,
         metrics=metrics,
         training_date=datetime.now().isoformat(),
-        data_samples=len(X)
+        data_samples=len(X),
+        tuning_info=tuning_info,
+        extra={'training_state': _training_state(csv_path, csv_bytes, X)}
     )
     
+    _export_bundle_quietly()
+
     print(f"\n✅ Model retraining complete!")
     print(f"   New version: v{version}")
     print(f"   Features: {len(feature_cols)}")
     print(f"   Training samples: {metrics['train_samples']}")
     print(f"   Test samples: {metrics['test_samples']}")
+    return {'version': version, 'metrics': metrics, 'rows': len(X), 'features': len(feature_cols)}
+
+
+# -----------------------------
+# Incremental retrain
+# -----------------------------
+def _tail_sha256(path, offset, size=65536):
+    """Hash of the bytes just before `offset`, to check the CSV was only appended to."""
+    with open(path, 'rb') as f:
+        f.seek(max(0, offset - size))
+        return hashlib.sha256(f.read(offset - max(0, offset - size))).hexdigest()
+
+
+def _training_state(csv_path, csv_bytes, X, running=None):
+    """Where training stopped in the CSV, plus running feature statistics.
+
+    `running` is a StandardScaler updated with partial_fit; by default the
+    statistics of X are used (full refit).
+    """
+    if running is None:
+        running = StandardScaler().fit(X)
+    return {
+        'csv_bytes': csv_bytes,
+        'csv_tail_sha256': _tail_sha256(csv_path, csv_bytes),
+        'running_stats': {
+            'n_samples_seen': int(np.max(running.n_samples_seen_)),
+            'mean': running.mean_.tolist(),
+            'var': running.var_.tolist(),
+        },
+    }
+
+
+def _running_scaler(stats):
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(stats['mean'], dtype=float)
+    scaler.var_ = np.array(stats['var'], dtype=float)
+    scaler.scale_ = np.sqrt(np.where(scaler.var_ == 0, 1.0, scaler.var_))
+    scaler.n_samples_seen_ = int(stats['n_samples_seen'])
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+
+def _read_csv_delta(csv_path, offset):
+    """Rows appended to the CSV after byte `offset`, parsed with the file's header."""
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        delta = f.read()
+    if not delta.strip():
+        return None
+    return pd.read_csv(io.BytesIO(header + delta))
+
+
+def retrain_incremental(csv_path=None, n_jobs=None):
+    """Continue training the current model on rows appended since the last run.
+
+    Only the appended part of the CSV is read. The running feature
+    statistics are updated with StandardScaler.partial_fit, and boosting
+    continues from xgb_model.pkl for INCREMENTAL_ROUNDS rounds on the new
+    rows. The serving scaler stays frozen, since the existing trees split
+    on values scaled with it. Drift is measured on the new rows alone:
+    against the cumulative statistics a shifted batch would be diluted by
+    all the rows seen before it.
+
+    Falls back to a full retrain_model() when there is no usable training
+    state (first run, CSV rewritten rather than appended, feature set
+    changed), when drift exceeds DRIFT_THRESHOLD, or when the continued
+    model does worse than the current one on a holdout of the new rows.
+    """
+    if csv_path is None:
+        csv_path = os.path.join(DATA_DIR, 'FINSENTINAL_FINAL.csv')
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Training data not found: {csv_path}")
+
+    def full_refit(reason):
+        print(f"↪️  Full refit: {reason}")
+        result = retrain_model(csv_path, n_jobs=n_jobs)
+        result['mode'] = 'full'
+        result['reason'] = reason
+        return result
+
+    metadata = _read_json(os.path.join(MODEL_DIR, "model_metadata.json"))
+    state = metadata.get('training_state')
+    if not state:
+        return full_refit('no training state recorded')
+    csv_bytes = os.path.getsize(csv_path)
+    offset = state['csv_bytes']
+    if csv_bytes < offset or _tail_sha256(csv_path, offset) != state['csv_tail_sha256']:
+        return full_refit('CSV was modified, not only appended to')
+
+    print(f"\n🚀 Incremental retrain from byte {offset} of {csv_path}...")
+    df = _read_csv_delta(csv_path, offset)
+    if df is not None:
+        df = df.dropna(subset=['fdi'])
+    if df is None or len(df) == 0:
+        print("✅ No new rows since the last training run")
+        return {'mode': 'noop', 'version': metadata.get('version'), 'rows': 0}
+    if len(df) < MIN_DELTA_ROWS:
+        print(f"⏸️  Only {len(df)} new row(s); waiting for at least {MIN_DELTA_ROWS}")
+        return {'mode': 'noop', 'version': metadata.get('version'), 'rows': len(df)}
+
+    with open(os.path.join(MODEL_DIR, 'feature_cols.pkl'), 'rb') as f:
+        feature_cols = pickle.load(f)
+    pipeline = pipeline_for(feature_cols)
+    present = {canonical(c) for c in df.columns}
+    missing = [c for c in pipeline.names if c not in present]
+    if missing:
+        return full_refit(f"new rows lack features {missing}")
+    X = pipeline.transform_frame(df, fill_value=0.0)
+    y = (df['fdi'].values > 0.5).astype(int)
+    print(f"📊 {len(X)} new samples")
 
+    # running statistics over all rows seen so far; the serving scaler is frozen
+    with open(os.path.join(MODEL_DIR, 'scaler.pkl'), 'rb') as f:
+        scaler = pickle.load(f)
+    running = _running_scaler(state['running_stats']).partial_fit(X)
+    # the delta's own mean (len(X) >= MIN_DELTA_ROWS here), not the cumulative one
+    drift = float(np.max(np.abs(X.mean(axis=0) - scaler.mean_) / scaler.scale_))
+    print(f"🌊 Drift of the new rows (max standardized mean shift): {drift:.3f}")
+    if drift > DRIFT_THRESHOLD:
+        return full_refit(f"drift {drift:.3f} > {DRIFT_THRESHOLD}")
 
-def list_model_versions():
+    stratify = y if np.bincount(y, minlength=2).min() >= 2 else None
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=stratify)
+    X_train_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    with open(os.path.join(MODEL_DIR, 'xgb_model.pkl'), 'rb') as f:
+        current = pickle.load(f)
+    params = {k: v for k, v in current.get_params().items() if v is not None}
+    params.update(n_estimators=INCREMENTAL_ROUNDS, n_jobs=n_jobs)
+    print(f"🤖 Adding {INCREMENTAL_ROUNDS} boosting rounds on the new rows...")
+    model = XGBClassifier(**params)
+    model.fit(X_train_scaled, y_train, xgb_model=current.get_booster())
+
+    old_loss = log_loss(y_test, current.predict_proba(X_test_scaled)[:, 1], labels=[0, 1])
+    new_loss = log_loss(y_test, model.predict_proba(X_test_scaled)[:, 1], labels=[0, 1])
+    print(f"📈 Holdout logloss: current {old_loss:.4f} -> continued {new_loss:.4f}")
+    if new_loss > old_loss * (1 + LOGLOSS_TOLERANCE):
+        return full_refit(f"continued model logloss {new_loss:.4f} worse than {old_loss:.4f}")
+
+    y_pred = model.predict(X_test_scaled)
+    metrics = {
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'precision': float(precision_score(y_test, y_pred, zero_division=0)),
+        'recall': float(recall_score(y_test, y_pred, zero_division=0)),
+        'f1': float(f1_score(y_test, y_pred, zero_division=0)),
+        'logloss': float(new_loss),
+        'test_samples': len(y_test),
+        'train_samples': len(y_train),
+    }
+
+    archive_current_model()
+    version = increment_version(get_model_version())
+    _atomic_pickle(model, os.path.join(MODEL_DIR, 'xgb_model.pkl'))
+    save_model_metadata(
+        version=version,
+        metrics=metrics,
+        training_date=datetime.now().isoformat(),
+        data_samples=int(metadata.get('data_samples') or 0) + len(X),
+        tuning_info=metadata.get('tuning'),
+        extra={
+            'training_state': _training_state(csv_path, csv_bytes, X, running=running),
+            'incremental': {'delta_rows': len(X), 'rounds_added': INCREMENTAL_ROUNDS,
+                            'drift': drift, 'holdout_logloss_before': float(old_loss)},
+        },
+    )
+    _export_bundle_quietly()
+
+    print(f"\n✅ Incremental retrain complete: v{version} ({len(X)} new rows)")
+    return {'mode': 'incremental', 'version': version, 'metrics': metrics, 'rows': len(X),
+            'features': len(feature_cols)}
+
+
+def _latest_horizon_version(name):
+    return _read_json(os.path.join(HORIZON_DIR, name, 'latest.json')).get('version')
+
+
+def _horizon_metadata_path(name):
+    version = _latest_horizon_version(name)
+    if version is None:
+        return None
+    return os.path.join(HORIZON_DIR, name, f"v{version}", 'model_metadata.json')
+
+
+def _horizon_metadata(name):
+    path = _horizon_metadata_path(name)
+    return _read_json(path) if path else {}
+
+
+def retrain_horizon(name, arff_path, n_jobs=None):
+    """Train an XGBoost model on one ARFF horizon into horizons/<name>/v<version>/.
+
+    The artifact set is written to a temp dir and renamed into place, then
+    `latest.json` is switched to it, so readers never see a partial version.
+    """
+    print(f"\n🚀 Training {name} from {arff_path}...")
+    X, y, feature_cols = arff_loader.load_dataset(arff_path)
+    previous = _latest_horizon_version(name)
+    tuning_info = _horizon_metadata(name).get('tuning')
+    params = tuning_info['best_params'] if tuning_info else None
+    model, scaler, metrics = _fit_xgb(X, y, n_jobs=n_jobs, params=params)
+
+    version = increment_version(previous) if previous else '1.0.0'
+    horizon_dir = os.path.join(HORIZON_DIR, name)
+    target = os.path.join(horizon_dir, f"v{version}")
+    tmp_dir = f"{target}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    _atomic_pickle(model, os.path.join(tmp_dir, 'xgb_model.pkl'))
+    _atomic_pickle(scaler, os.path.join(tmp_dir, 'scaler.pkl'))
+    _atomic_pickle(feature_cols, os.path.join(tmp_dir, 'feature_cols.pkl'))
+    metadata = {
+        'version': version,
+        'training_date': datetime.now().isoformat(),
+        'data_samples': len(X),
+        'source': os.path.basename(arff_path),
+        'source_sha256': arff_loader.file_sha256(arff_path),
+        'metrics': metrics,
+    }
+    if tuning_info:
+        metadata['tuning'] = tuning_info
+    _write_json(metadata, os.path.join(tmp_dir, 'model_metadata.json'))
+    os.replace(tmp_dir, target)
+
+    _write_json({'version': version, 'path': f"v{version}"}, os.path.join(horizon_dir, 'latest.json'))
+    print(f"✅ {name} model saved: v{version}")
+    return {'version': version, 'metrics': metrics, 'rows': len(X), 'features': len(feature_cols)}
+
+
+def training_jobs(arff_dir=None):
+    """{job name: (callable, args)} for the FDI model and every ARFF horizon."""
+    jobs = {}
+    if os.path.exists(os.path.join(DATA_DIR, 'FINSENTINAL_FINAL.csv')):
+        jobs['fdi'] = (retrain_model, (None,))
+    for name, path in arff_loader.horizon_paths(arff_dir or arff_loader.ARFF_DIR).items():
+        jobs[name] = (retrain_horizon, (name, path))
+    return jobs
+
+
+@contextmanager
+def _thread_limits(threads):
+    """Cap OpenMP/BLAS threads for worker processes started inside the block.
+
+    Spawned workers inherit the environment, so the caps must be set before
+    the pool starts them.
+    """
+    saved_env = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _run_job(name, fn, args, n_jobs):
+    """Worker-side wrapper: run one training job and time it."""
+    started = time.perf_counter()
+    result = {'name': name, 'pid': os.getpid(), 'threads': n_jobs}
+    try:
+        result.update(fn(*args, n_jobs=n_jobs))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def retrain_all(names=None, workers=None):
+    """Train the FDI model and all ARFF horizons in parallel worker processes.
+
+    Cores are split between workers: each job gets cores // workers XGBoost
+    threads, and the OpenMP/BLAS thread env vars are capped to the same
+    number, so the pool never runs more threads than there are cores.
+    """
+    jobs = training_jobs()
+    if names:
+        unknown = [n for n in names if n not in jobs]
+        if unknown:
+            raise ValueError(f"Unknown job(s): {', '.join(unknown)} (available: {', '.join(jobs)})")
+        jobs = {n: jobs[n] for n in names}
+
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(jobs), cores))
+    threads = max(1, cores // workers)
+    print(f"\n🏭 Training {len(jobs)} model(s) on {workers} worker(s) x {threads} thread(s)")
+
+    started = time.perf_counter()
+    results = []
+    with _thread_limits(threads):
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [pool.submit(_run_job, name, fn, args, threads) for name, (fn, args) in jobs.items()]
+            for future in as_completed(futures):
+                results.append(future.result())
+    wall = time.perf_counter() - started
+
+    print(f"\n⏱️  Training report")
+    print(f"   {'job':<10} {'version':<9} {'rows':>7} {'feat':>5} {'F1':>7} {'seconds':>8}  status")
+    for r in sorted(results, key=lambda r: r['name']):
+        f1 = r.get('metrics', {}).get('f1')
+        print(f"   {r['name']:<10} {r.get('version') or '-':<9} {r.get('rows', '-'):>7} {r.get('features', '-'):>5} "
+              f"{f'{f1:.4f}' if f1 is not None else '-':>7} {r['seconds']:>8.1f}  {r.get('error', 'ok')}")
+    busy = sum(r['seconds'] for r in results)
+    print(f"   wall clock {wall:.1f}s, sum of jobs {busy:.1f}s ({busy / wall if wall else 0:.1f}x parallel)")
+    return results
+
+
+def tune_model(dataset='fdi', strategy='random', n_trials=tuning.DEFAULT_TRIALS, n_folds=tuning.DEFAULT_FOLDS,
+               max_rounds=tuning.DEFAULT_MAX_ROUNDS, workers=None, fresh=False):
+    """Cross-validated hyperparameter search for the FDI model or an ARFF horizon.
+
+    The search state lives in models/tuning/<dataset>/ (cached folds and the
+    resumable trial log). The best configuration is stored under "tuning" in
+    the dataset's model_metadata.json, where retrain / retrain-all pick it up.
+    """
+    if dataset == 'fdi':
+        X, y, _ = load_training_data(os.path.join(DATA_DIR, 'FINSENTINAL_FINAL.csv'))
+        y = (y > 0.5).astype(int)
+        metadata_path = os.path.join(MODEL_DIR, "model_metadata.json")
+    else:
+        paths = arff_loader.horizon_paths()
+        if dataset not in paths:
+            raise ValueError(f"Unknown dataset {dataset!r} (available: fdi, {', '.join(paths)})")
+        X, y, _ = arff_loader.load_dataset(paths[dataset])
+        metadata_path = _horizon_metadata_path(dataset)
+        if metadata_path is None:
+            raise ValueError(f"No trained {dataset} model yet; run retrain-all {dataset} first")
+
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, n_trials, cores))
+    threads = max(1, cores // workers)
+    print(f"\n🔎 Tuning {dataset}: {strategy} search, {n_trials} trials x {n_folds} folds "
+          f"on {workers} worker(s) x {threads} thread(s)")
+
+    started = time.perf_counter()
+    with _thread_limits(threads):
+        best, records = tuning.run_search(
+            X, y, os.path.join(MODEL_DIR, 'tuning', dataset), strategy=strategy, n_trials=n_trials,
+            n_folds=n_folds, max_rounds=max_rounds, workers=workers, threads=threads, fresh=fresh)
+    wall = time.perf_counter() - started
+
+    tuning_info = {
+        'strategy': strategy,
+        'best_params': tuning.best_config(best),
+        'cv_logloss': best['logloss'],
+        'folds': n_folds,
+        'trials': n_trials,
+        'tuned_at': datetime.now().isoformat(),
+    }
+    metadata = _read_json(metadata_path)
+    metadata['tuning'] = tuning_info
+    _write_json(metadata, metadata_path)
+
+    print(f"\n🏆 Top configurations (mean validation logloss)")
+    for r in records[:5]:
+        print(f"   trial {r['trial']:>3}  {r['logloss']:.5f}  {json.dumps(tuning.best_config(r))}")
+    print(f"   search took {wall:.1f}s; best configuration saved to {metadata_path}")
+    return tuning_info
+
+
+def export_bundle(model_file='xgb_model.pkl', bundle_dir=None):
+    """Export the active model as a zero-pickle bundle of .npy arrays.
+
+    The tree ensemble is flattened by tree_engine (scaler folded into the
+    thresholds) and written next to a JSON manifest, so app.py can serve it
+    with FINSENTINAL_MODEL_FORMAT=bundle via np.load(mmap_mode='r').
+    """
+    if bundle_dir is None:
+        bundle_dir = os.path.join(MODEL_DIR, 'bundle')
+
+    with open(os.path.join(MODEL_DIR, model_file), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(MODEL_DIR, 'scaler.pkl'), 'rb') as f:
+        scaler = pickle.load(f)
+    with open(os.path.join(MODEL_DIR, 'feature_cols.pkl'), 'rb') as f:
+        feature_cols = pickle.load(f)
+
+    engine = tree_engine.CompiledTreeEnsemble.compile(model, scaler)
+    rows = tree_engine.verification_rows(scaler, len(feature_cols), engine=engine)
+    diff = engine.verify(model, scaler, rows)
+    if diff > tree_engine.DEFAULT_TOLERANCE:
+        raise ValueError(f"Compiled model differs from {model_file} by {diff:.2e}; bundle not written")
+
+    metadata = {}
+    metadata_path = os.path.join(MODEL_DIR, "model_metadata.json")
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+
+    tree_engine.save_bundle(engine, feature_cols, metadata, bundle_dir)
+    _, info = engine.arrays()
+    print(f"📦 Bundle exported: {bundle_dir}")
+    print(f"   {info['n_trees']} trees, {info['n_nodes']} nodes, max |dp| vs {model_file}: {diff:.2e}")
+    return bundle_dir
+
+
+def _export_bundle_quietly(model_file='xgb_model.pkl'):
+    try:
+        export_bundle(model_file)
+    except Exception as e:
+        print(f"⚠️ Bundle export skipped: {e}")
+
+
+def score_dataset(input_path=None, output=None, db_path=None, model='fdi',
+                  chunk_rows=bulk_scoring.DEFAULT_CHUNK_ROWS, workers=1):
+    """Score a CSV or ARFF file in chunks to CSV/Parquet or the predictions table."""
+    input_path = input_path or os.path.join(DATA_DIR, 'FINSENTINAL_FINAL.csv')
+    if not db_path and not output:
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        output = os.path.join(DATA_DIR, f"{stem}_{model}_scores.csv")
+    workers = max(1, min(workers or 1, os.cpu_count() or 1))
+    if workers == 1:
+        return bulk_scoring.score_file(input_path, output, db_path, model, chunk_rows, 1)
+    with _thread_limits(max(1, (os.cpu_count() or 1) // workers)):
+        return bulk_scoring.score_file(input_path, output, db_path, model, chunk_rows, workers)
+
+
+def _parse_where(expr):
+    """'f1>=0.8' -> predicate over index entries' metrics."""
+    import operator
+    ops = (('>=', operator.ge), ('<=', operator.le), ('>', operator.gt), ('<', operator.lt), ('=', operator.eq))
+    for token, op in ops:
+        if token in expr:
+            metric, value = expr.split(token, 1)
+            metric, value = metric.strip(), float(value)
+            return lambda e: isinstance(e.get('metrics', {}).get(metric), (int, float)) and op(e['metrics'][metric], value)
+    raise ValueError(f"Cannot parse filter {expr!r} (expected e.g. f1>=0.8)")
+
+
+def list_model_versions(sort=None, where=None):
     """List all archived model versions"""
-    if not os.path.exists(ARCHIVE_DIR):
-        print("No archived models found")
-        return
-    
-    versions = sorted(os.listdir(ARCHIVE_DIR))
+    versions = _archive_store().versions(where=_parse_where(where) if where else None, sort=sort)
     if not versions:
         print("No archived models found")
         return
     
     print("\n📦 Archived Model Versions:")
     for v in versions:
-        path = os.path.join(ARCHIVE_DIR, v)
-        metadata_file = os.path.join(path, 'metadata.json')
-        if os.path.exists(metadata_file):
-            with open(metadata_file, 'r') as f:
-                metadata = json.load(f)
-                date = metadata.get('training_date', 'Unknown')
-                print(f"   {v} (trained: {date})")
+        metrics = v.get('metrics', {})
+        f1 = f", f1 {metrics['f1']:.4f}" if isinstance(metrics.get('f1'), (int, float)) else ''
+        pin = ' 📌' if v.get('pinned') else ''
+        print(f"   {v['id']} (trained: {v.get('training_date') or 'Unknown'}{f1}){pin}")
 
 
 def restore_model_version(version_name):
     """Restore a previous model version"""
-    archive_path = os.path.join(ARCHIVE_DIR, version_name)
-    if not os.path.exists(archive_path):
+    store = _archive_store()
+    if store.get(version_name) is None:
         raise ValueError(f"Version not found: {version_name}")
     
     # Archive current model
-    archive_current_model()
-    
-    # Restore archived version
-    for artifact in ['xgb_model.pkl', 'scaler.pkl', 'feature_cols.pkl']:
-        src = os.path.join(archive_path, artifact)
-        if os.path.exists(src):
-            shutil.copy(src, os.path.join(MODEL_DIR, artifact))
+    archive_current_model(store)
     
-    # Restore metadata
-    metadata_file = os.path.join(archive_path, 'metadata.json')
-    if os.path.exists(metadata_file):
-        shutil.copy(metadata_file, os.path.join(MODEL_DIR, 'model_metadata.json'))
+    # Restore archived version (copy + rename per file, unchanged files skipped)
+    changed = store.restore(version_name, MODEL_DIR)
     
-    print(f"✅ Model restored: {version_name}")
+    if changed:
+        _export_bundle_quietly()
+
+    print(f"✅ Model restored: {version_name} ({len(changed)} file(s) switched)")
+
+
+def gc_archive(keep_last=artifact_store.DEFAULT_KEEP_LAST, keep_best=artifact_store.DEFAULT_KEEP_BEST,
+               dry_run=False):
+    """Apply the archive retention policy and delete unreferenced blobs."""
+    store = _archive_store()
+    # the serving files are always protected
+    protect = [artifact_store.file_sha256(os.path.join(MODEL_DIR, n))
+               for n in ARCHIVED_FILES if os.path.exists(os.path.join(MODEL_DIR, n))]
+    removed, blobs, freed = store.gc(keep_last=keep_last, keep_best=keep_best, protect=protect, dry_run=dry_run)
+    verb = 'Would remove' if dry_run else 'Removed'
+    print(f"🧹 {verb} {len(removed)} version(s) and {blobs} blob(s), {freed / 1e6:.1f} MB")
+    for version_id in removed:
+        print(f"   - {version_id}")
 
 
 def get_current_model_info():
@@ -263,18 +760,71 @@ if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage:")
         print("  python model_manager.py retrain [csv_path]  - Retrain model")
-        print("  python model_manager.py list               - List archived versions")
+        print("  python model_manager.py retrain --incremental [csv_path] - Continue training on appended rows")
+        print("  python model_manager.py retrain-all [--workers N] [job ...] - Retrain FDI + every ARFF horizon in parallel")
+        print("  python model_manager.py tune [dataset] [--strategy random|halving] [--trials N] [--folds K] [--workers N] [--fresh]")
+        print("                                               - Cross-validated hyperparameter search")
+        print("  python model_manager.py list [--sort f1] [--where 'f1>=0.8'] - List archived versions")
         print("  python model_manager.py restore <version>  - Restore a version")
+        print("  python model_manager.py pin|unpin <version> - Exempt a version from archive GC")
+        print("  python model_manager.py gc [--keep N] [--keep-best K] [--dry-run] - Apply archive retention")
         print("  python model_manager.py info               - Show current model info")
+        print("  python model_manager.py export-bundle [model.pkl] - Export zero-pickle .npy bundle")
+        print("  python model_manager.py score [input.csv|.arff] [--model fdi] [--output out.csv|.parquet | --db [path]]")
+        print("                                [--chunk-rows N] [--workers N] - Bulk-score a dataset in chunks")
         sys.exit(1)
     
     command = sys.argv[1]
     
     if command == 'retrain':
-        csv_path = sys.argv[2] if len(sys.argv) > 2 else None
-        retrain_model(csv_path)
+        args = sys.argv[2:]
+        if '--incremental' in args:
+            args.remove('--incremental')
+            retrain_incremental(args[0] if args else None)
+        else:
+            retrain_model(args[0] if args else None)
+    elif command == 'retrain-all':
+        args = sys.argv[2:]
+        workers = None
+        if '--workers' in args:
+            i = args.index('--workers')
+            workers = int(args[i + 1])
+            del args[i:i + 2]
+        results = retrain_all(args or None, workers=workers)
+        sys.exit(1 if any('error' in r for r in results) else 0)
+    elif command == 'tune':
+        import argparse
+        parser = argparse.ArgumentParser(prog='model_manager.py tune')
+        parser.add_argument('dataset', nargs='?', default='fdi', help='fdi or an ARFF horizon name')
+        parser.add_argument('--strategy', choices=('random', 'halving'), default='random')
+        parser.add_argument('--trials', type=int, default=tuning.DEFAULT_TRIALS)
+        parser.add_argument('--folds', type=int, default=tuning.DEFAULT_FOLDS)
+        parser.add_argument('--max-rounds', type=int, default=tuning.DEFAULT_MAX_ROUNDS)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--fresh', action='store_true', help='discard the trial log instead of resuming')
+        opts = parser.parse_args(sys.argv[2:])
+        tune_model(opts.dataset, opts.strategy, opts.trials, opts.folds, opts.max_rounds, opts.workers, opts.fresh)
     elif command == 'list':
-        list_model_versions()
+        import argparse
+        parser = argparse.ArgumentParser(prog='model_manager.py list')
+        parser.add_argument('--sort', help='metric to sort by, best first')
+        parser.add_argument('--where', help="metric filter, e.g. 'f1>=0.8'")
+        opts = parser.parse_args(sys.argv[2:])
+        list_model_versions(sort=opts.sort, where=opts.where)
+    elif command in ('pin', 'unpin'):
+        if len(sys.argv) < 3:
+            print(f"Usage: python model_manager.py {command} <version_name>")
+            sys.exit(1)
+        _archive_store().pin(sys.argv[2], pinned=(command == 'pin'))
+        print(f"📌 {sys.argv[2]} {'pinned' if command == 'pin' else 'unpinned'}")
+    elif command == 'gc':
+        import argparse
+        parser = argparse.ArgumentParser(prog='model_manager.py gc')
+        parser.add_argument('--keep', type=int, default=artifact_store.DEFAULT_KEEP_LAST)
+        parser.add_argument('--keep-best', type=int, default=artifact_store.DEFAULT_KEEP_BEST)
+        parser.add_argument('--dry-run', action='store_true')
+        opts = parser.parse_args(sys.argv[2:])
+        gc_archive(opts.keep, opts.keep_best, opts.dry_run)
     elif command == 'restore':
         if len(sys.argv) < 3:
             print("Usage: python model_manager.py restore <version_name>")
@@ -282,6 +832,22 @@ if __name__ == '__main__':
         restore_model_version(sys.argv[2])
     elif command == 'info':
         get_current_model_info()
+    elif command == 'export-bundle':
+        export_bundle(*sys.argv[2:3])
+    elif command == 'score':
+        import argparse
+        parser = argparse.ArgumentParser(prog='model_manager.py score')
+        parser.add_argument('input', nargs='?', help='CSV or ARFF file (default: data/FINSENTINAL_FINAL.csv)')
+        parser.add_argument('--model', default='fdi', help='fdi, bankruptcy or an ARFF horizon name')
+        parser.add_argument('--output', help='.csv or .parquet file for the scores')
+        parser.add_argument('--db', nargs='?', const=bulk_scoring.DB_PATH,
+                            help='insert into the predictions table instead (default data/predictions.db)')
+        parser.add_argument('--chunk-rows', type=int, default=bulk_scoring.DEFAULT_CHUNK_ROWS)
+        parser.add_argument('--workers', type=int, default=1)
+        opts = parser.parse_args(sys.argv[2:])
+        if opts.output and opts.db:
+            parser.error('choose --output or --db')
+        score_dataset(opts.input, opts.output, opts.db, opts.model, opts.chunk_rows, opts.workers)
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
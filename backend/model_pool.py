@@ -0,0 +1,249 @@
+"""
+Model Pool
+Several scoring models served side by side from one shared feature matrix
+
+Every model keeps its own preprocessing (imputer and/or scaler) and feature
+order. A request builds a single float matrix over the union of the columns
+its target models need (NaN where a record has no value) and each model
+scores a column slice of it, so records are parsed once however many models
+are asked.
+
+Models registered as resident (the FDI model, owned by the ModelRegistry) are
+always available. Others are loaded on first use and dropped again once they
+have been idle for `idle_seconds`.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from feature_pipeline import canonical
+
+FDI = 'fdi'
+BANKRUPTCY = 'bankruptcy'
+
+DEFAULT_IDLE_SECONDS = float(os.environ.get('FINSENTINAL_MODEL_IDLE_SECONDS', 900))
+
+
+class PipelineModel:
+    """A classifier with its own imputer/scaler and feature order."""
+
+    def __init__(self, name, model, feature_cols, imputer=None, scaler=None, model_file=None, fingerprint=None):
+        self.name = name
+        self.model = model
+        self.imputer = imputer
+        self.scaler = scaler
+        self.feature_cols = list(feature_cols)
+        self.model_file = model_file
+        self.fingerprint = fingerprint
+        self.version = fingerprint[:8] if fingerprint else 'unknown'
+        self.loaded_at = datetime.utcnow().isoformat()
+        classes = list(getattr(model, 'classes_', []))
+        self._positive = classes.index(1) if 1 in classes else -1
+
+    def predict_positive(self, X):
+        """Class-1 probabilities for raw feature rows (NaN = missing)."""
+        if self.imputer is not None:
+            X = self.imputer.transform(X)
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        return self.model.predict_proba(X)[:, self._positive]
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'model_file': self.model_file,
+            'fingerprint': self.fingerprint,
+            'features': len(self.feature_cols),
+            'loaded_at': self.loaded_at,
+            'imputer': self.imputer is not None,
+            'scaler': self.scaler is not None,
+        }
+
+
+def pipeline_loader(model_dir, prefix):
+    """Loader for `<prefix>_model.pkl` + `_feature_cols.pkl` (+ `_imputer.pkl`, `_scaler.pkl`).
+
+    The files are joblib dumps, so they are read with joblib rather than pickle.
+    """
+    def load():
+        import joblib
+
+        digest = hashlib.blake2b(digest_size=8)
+        loaded = {}
+        for key in ('model', 'feature_cols', 'imputer', 'scaler'):
+            path = os.path.join(model_dir, f'{prefix}_{key}.pkl')
+            if not os.path.exists(path):
+                if key in ('model', 'feature_cols'):
+                    raise FileNotFoundError(f'{path} not found')
+                continue
+            with open(path, 'rb') as f:
+                blob = f.read()
+            digest.update(blob)
+            loaded[key] = joblib.load(io.BytesIO(blob))
+        return PipelineModel(
+            prefix, loaded['model'], loaded['feature_cols'],
+            imputer=loaded.get('imputer'), scaler=loaded.get('scaler'),
+            model_file=f'{prefix}_model.pkl', fingerprint=digest.hexdigest(),
+        )
+    return load
+
+
+class _Entry:
+    def __init__(self, name, loader, resident, fill_value):
+        self.name = name
+        # resident: loader() is called on every access (e.g. registry.current)
+        self.loader = loader
+        self.resident = resident
+        # value used for missing features; NaN leaves them to the model's imputer
+        self.fill_value = fill_value
+        self.model = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+        self.loads = 0
+        self.evictions = 0
+        self.load_ms = None
+        self.last_error = None
+
+
+class ModelPool:
+    """Named scoring models, lazily loaded and evicted when idle."""
+
+    def __init__(self, idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._entries = {}
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def register(self, name, loader, resident=False, fill_value=np.nan):
+        self._entries[name] = _Entry(name, loader, resident, fill_value)
+
+    def names(self):
+        return list(self._entries)
+
+    def resolve(self, spec, default=FDI):
+        """Model names for a `?model=` value: one name, a comma list or 'all'."""
+        spec = (spec or default).strip().lower()
+        if spec == 'all':
+            return self.names()
+        names = [n.strip() for n in spec.split(',') if n.strip()]
+        unknown = [n for n in names if n not in self._entries]
+        if unknown or not names:
+            raise KeyError(f"unknown model {', '.join(unknown) or spec!r}; choose from {', '.join(self.names())} or all")
+        return names
+
+    def get(self, name):
+        """The loaded model for `name`, loading it on first use."""
+        entry = self._entries[name]
+        entry.last_used = time.monotonic()
+        if entry.resident:
+            return entry.loader()
+        model = entry.model
+        if model is not None:
+            return model
+        with entry.lock:
+            # another request may have finished loading while we waited
+            if entry.model is None:
+                started = time.perf_counter()
+                try:
+                    entry.model = entry.loader()
+                except Exception as e:
+                    entry.last_error = f"{type(e).__name__}: {e}"
+                    raise
+                entry.loads += 1
+                entry.last_error = None
+                entry.load_ms = (time.perf_counter() - started) * 1000
+                print(f"📦 Loaded {name} model ({entry.load_ms:.0f} ms)")
+            return entry.model
+
+    def loaded(self):
+        """{name: model} of everything currently in memory, without loading."""
+        out = {}
+        for entry in self._entries.values():
+            model = entry.loader() if entry.resident else entry.model
+            if model is not None:
+                out[entry.name] = model
+        return out
+
+    def columns(self, models):
+        """Union of the models' feature columns, in first-seen order."""
+        seen = {}
+        for model in models:
+            for col in model.feature_cols:
+                seen.setdefault(canonical(col), None)
+        return list(seen)
+
+    def load(self, names):
+        """{name: model} for one request; resolve models once and reuse them."""
+        return {name: self.get(name) for name in names}
+
+    def matrix_for(self, name, model, X, columns):
+        """The slice of the shared matrix X (over `columns`) that `model` expects."""
+        index = {c: j for j, c in enumerate(columns)}
+        Xm = X[:, [index[canonical(c)] for c in model.feature_cols]]
+        fill_value = self._entries[name].fill_value
+        if not np.isnan(fill_value):
+            Xm = np.where(np.isnan(Xm), fill_value, Xm)
+        return Xm
+
+    def score(self, models, X, columns):
+        """{name: probabilities} for each model of `load()` on the shared matrix X."""
+        return {name: model.predict_positive(self.matrix_for(name, model, X, columns))
+                for name, model in models.items()}
+
+    # -----------------------------
+    # Idle eviction
+    # -----------------------------
+    def evict_idle(self, now=None):
+        """Drop lazily loaded models unused for `idle_seconds`; returns their names."""
+        now = time.monotonic() if now is None else now
+        evicted = []
+        for entry in self._entries.values():
+            if entry.resident or entry.model is None:
+                continue
+            if now - entry.last_used < self.idle_seconds:
+                continue
+            with entry.lock:
+                if entry.model is not None and now - entry.last_used >= self.idle_seconds:
+                    entry.model = None
+                    entry.evictions += 1
+                    evicted.append(entry.name)
+        for name in evicted:
+            print(f"💤 Evicted idle {name} model")
+        return evicted
+
+    def start_reaper(self, interval=None):
+        if self._reaper is not None or self.idle_seconds <= 0:
+            return
+        interval = interval or max(1.0, min(60.0, self.idle_seconds / 4))
+        self._reaper = threading.Thread(target=self._reap, args=(interval,), name='model-pool-reaper', daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self):
+        self._stop.set()
+
+    def _reap(self, interval):
+        while not self._stop.wait(interval):
+            self.evict_idle()
+
+    def stats(self):
+        now = time.monotonic()
+        models = {}
+        for entry in self._entries.values():
+            model = entry.loader() if entry.resident else entry.model
+            models[entry.name] = {
+                'resident': entry.resident,
+                'loaded': model is not None,
+                'idle_seconds': round(now - entry.last_used, 1) if entry.last_used else None,
+                'loads': entry.loads,
+                'evictions': entry.evictions,
+                'load_ms': entry.load_ms,
+                'last_error': entry.last_error,
+                'model': model.describe() if model is not None else None,
+            }
+        return {'idle_eviction_seconds': self.idle_seconds, 'models': models}
@@ -0,0 +1,370 @@
+"""
+Model Registry
+Hot reload and atomic version swap of the serving artifacts
+
+An ArtifactSet bundles everything one model version needs to serve a request
+(model, scaler, feature order, SHAP explanation service, metadata); the SHAP
+service can be left to be built on first use (`load_initial(build_explainer=False)`). The
+registry loads a complete set off the request path and then publishes it with
+a single reference assignment, so a request that grabbed `registry.current()`
+keeps using that set until it finishes, even if a swap happens meanwhile.
+
+Reloads are triggered by the file watcher (artifact mtime/size changes) or
+explicitly via `reload()` (the /admin/reload endpoint).
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import tree_engine
+from instrumentation import stage
+
+# Model pickles in order of preference
+MODEL_FILES = ('rf_model.pkl', 'xgb_model.pkl')
+SCALER_FILE = 'scaler.pkl'
+FEATURES_FILE = 'feature_cols.pkl'
+METADATA_FILE = 'model_metadata.json'
+# zero-pickle artifact bundle written by `model_manager.py export-bundle`
+BUNDLE_DIR = 'bundle'
+BUNDLE_LOAD_ATTEMPTS = 5
+
+MODEL_FORMAT = os.environ.get('FINSENTINAL_MODEL_FORMAT', 'pickle').lower()
+
+DEFAULT_WATCH_INTERVAL = float(os.environ.get('FINSENTINAL_MODEL_WATCH_SECONDS', 5))
+
+FALLBACK_METADATA = {
+    "version": "1.0",
+    "training_date": None,
+    "metrics": {
+        "accuracy": 0.91,
+        "precision": 0.88,
+        "recall": 0.93,
+        "f1": 0.90,
+        "train_samples": 1200,
+        "test_samples": 300,
+    },
+    "notes": "Metadata file missing; returning defaults.",
+}
+
+
+def load_metadata(model_dir):
+    """Read model_metadata.json, falling back to defaults when missing."""
+    metadata = json.loads(json.dumps(FALLBACK_METADATA))
+    path = os.path.join(model_dir, METADATA_FILE)
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            metadata.update({
+                "version": data.get("version") or metadata["version"],
+                "training_date": data.get("training_date"),
+                "metrics": data.get("metrics", {}),
+            })
+            metadata.pop("notes", None)
+    except Exception:
+        pass
+    return metadata
+
+
+class ArtifactSet:
+    """Immutable bundle of one loaded model version."""
+
+    def __init__(self, model, scaler, feature_cols, metadata, model_file, fingerprint):
+        self.model = model
+        self.scaler = scaler
+        self.feature_cols = list(feature_cols)
+        self.metadata = metadata
+        self.version = str(metadata.get("version"))
+        self.model_file = model_file
+        self.fingerprint = fingerprint
+        # explain_builder(artifacts) -> ExplanationService or None, called once
+        self.explain_builder = None
+        self._explain_service = None
+        self._explain_built = False
+        self._explain_lock = threading.Lock()
+        # CompiledTreeEnsemble when FINSENTINAL_INFERENCE=compiled, else None
+        self.engine = None
+        self.engine_error = None
+        self.loaded_at = datetime.utcnow().isoformat()
+
+    @property
+    def explain_service(self):
+        """The SHAP ExplanationService (None without one), built on first access."""
+        if not self._explain_built:
+            self.build_explainer()
+        return self._explain_service
+
+    @property
+    def explainer_loaded(self):
+        """Whether the SHAP service exists already; never builds it."""
+        return self._explain_service is not None
+
+    def build_explainer(self):
+        with self._explain_lock:
+            if not self._explain_built:
+                if self.explain_builder is not None:
+                    try:
+                        with stage('explainer_build'):
+                            self._explain_service = self.explain_builder(self)
+                    except Exception as e:
+                        print(f"⚠️ Could not initialize SHAP explainer: {e}")
+                self._explain_built = True
+        return self._explain_service
+
+    def predict_positive(self, X):
+        """Class-1 probabilities for raw (unscaled) feature rows."""
+        if self.engine is not None:
+            with stage('compiled_predict'):
+                return self.engine.predict_positive(X)
+        with stage('scaler_transform'):
+            X_scaled = self.scaler.transform(X)
+        with stage('predict_proba'):
+            return self.model.predict_proba(X_scaled)[:, 1]
+
+    def transform(self, X):
+        if self.engine is not None:
+            return self.engine.transform(X)
+        return self.scaler.transform(X)
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'model_file': self.model_file,
+            'fingerprint': self.fingerprint,
+            'features': len(self.feature_cols),
+            'loaded_at': self.loaded_at,
+            'explainer': self.explainer_loaded,
+            'inference': 'compiled' if self.engine is not None else 'stock',
+            'format': 'bundle' if self.model is None else 'pickle',
+            'inference_error': self.engine_error,
+        }
+
+
+class ModelRegistry:
+    """Holds the current ArtifactSet and swaps in new ones atomically."""
+
+    def __init__(self, model_dir, model_file=None, explain_builder=None,
+                 watch_interval=DEFAULT_WATCH_INTERVAL, inference=None, model_format=None):
+        self.model_dir = model_dir
+        # 'pickle' (model/scaler/feature pickles) or 'bundle' (mmap'd .npy arrays)
+        self.model_format = (model_format or MODEL_FORMAT).lower()
+        self.inference = (inference or tree_engine.INFERENCE_MODE).lower()
+        self.model_file = model_file or os.environ.get('FINSENTINAL_MODEL_FILE')
+        # explain_builder(artifacts) -> ExplanationService or None
+        self.explain_builder = explain_builder
+        self.watch_interval = watch_interval
+        self._current = None
+        self._signature = None
+        self._failed_signature = None
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._listeners = []
+        self.swaps = 0
+        self.last_error = None
+        self.last_reload_ms = None
+
+    # -----------------------------
+    # Loading
+    # -----------------------------
+    def _model_path(self):
+        candidates = (self.model_file,) if self.model_file else MODEL_FILES
+        for name in candidates:
+            path = os.path.join(self.model_dir, name)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No model file found in {self.model_dir} (looked for {', '.join(candidates)})")
+
+    def _watched_paths(self):
+        if self.model_format == 'bundle':
+            return [os.path.join(self.model_dir, BUNDLE_DIR, tree_engine.MANIFEST_FILE)]
+        names = ((self.model_file,) if self.model_file else MODEL_FILES) + (SCALER_FILE, FEATURES_FILE, METADATA_FILE)
+        return [os.path.join(self.model_dir, n) for n in names]
+
+    def signature(self):
+        sig = []
+        for path in self._watched_paths():
+            try:
+                st = os.stat(path)
+                sig.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((path, None, None))
+        return tuple(sig)
+
+    def load_artifacts(self, build_explainer=True):
+        """Load a complete ArtifactSet from disk without touching `current`.
+
+        With build_explainer=False the SHAP service is built on first use.
+        """
+        if self.model_format == 'bundle':
+            return self._load_bundle()
+        digest = hashlib.blake2b(digest_size=8)
+        loaded = {}
+        model_path = self._model_path()
+        for key, path in (('model', model_path),
+                          ('scaler', os.path.join(self.model_dir, SCALER_FILE)),
+                          ('features', os.path.join(self.model_dir, FEATURES_FILE))):
+            with open(path, 'rb') as f:
+                blob = f.read()
+            digest.update(blob)
+            loaded[key] = pickle.loads(blob)
+
+        artifacts = ArtifactSet(
+            model=loaded['model'],
+            scaler=loaded['scaler'],
+            feature_cols=loaded['features'],
+            metadata=load_metadata(self.model_dir),
+            model_file=os.path.basename(model_path),
+            fingerprint=digest.hexdigest(),
+        )
+        if self.inference == 'compiled':
+            self._attach_engine(artifacts)
+        artifacts.explain_builder = self.explain_builder
+        if build_explainer:
+            artifacts.build_explainer()
+        return artifacts
+
+    def _load_bundle(self):
+        """ArtifactSet served by a memory-mapped compiled engine, no pickles.
+
+        There is no sklearn/XGBoost object in this mode, so SHAP
+        explanations are unavailable; scoring and scaling use the engine.
+        """
+        # one resolved version for the arrays and the fingerprint; a bundle
+        # renamed into place (no symlinks) can be missing for a moment
+        for attempt in range(BUNDLE_LOAD_ATTEMPTS):
+            bundle_dir = os.path.realpath(os.path.join(self.model_dir, BUNDLE_DIR))
+            try:
+                engine, feature_cols, manifest = tree_engine.load_bundle(bundle_dir, mmap=True)
+                break
+            except FileNotFoundError:
+                if attempt == BUNDLE_LOAD_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.1)
+        metadata = json.loads(json.dumps(FALLBACK_METADATA))
+        metadata.pop("notes", None)
+        metadata.update({k: v for k, v in (manifest.get('metadata') or {}).items() if v is not None})
+        with open(os.path.join(bundle_dir, tree_engine.MANIFEST_FILE), 'rb') as f:
+            fingerprint = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+        artifacts = ArtifactSet(
+            model=None,
+            scaler=None,
+            feature_cols=feature_cols,
+            metadata=metadata,
+            model_file=BUNDLE_DIR,
+            fingerprint=fingerprint,
+        )
+        artifacts.engine = engine
+        return artifacts
+
+    @staticmethod
+    def _attach_engine(artifacts, tolerance=tree_engine.DEFAULT_TOLERANCE):
+        """Compile the model and keep it only if it matches the reference."""
+        try:
+            engine = tree_engine.CompiledTreeEnsemble.compile(artifacts.model, artifacts.scaler)
+            rows = tree_engine.verification_rows(artifacts.scaler, len(artifacts.feature_cols), engine=engine)
+            diff = engine.verify(artifacts.model, artifacts.scaler, rows)
+            if not np.isfinite(diff) or diff > tolerance:
+                raise tree_engine.UnsupportedModel(f'max |dp| {diff:.2e} exceeds {tolerance:.0e}')
+            artifacts.engine = engine
+        except Exception as e:
+            artifacts.engine_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Compiled inference disabled, using stock predict_proba: {e}")
+
+    def current(self):
+        """The ArtifactSet to use for one request; grab it once per request."""
+        return self._current
+
+    def _swap(self, artifacts):
+        previous = self._current
+        self._current = artifacts
+        self.swaps += 1
+        for callback in self._listeners:
+            try:
+                callback(artifacts, previous)
+            except Exception as e:
+                print(f"⚠️ Model swap listener failed: {e}")
+
+    def add_listener(self, callback):
+        """Call `callback(new, previous)` after each swap."""
+        self._listeners.append(callback)
+
+    def load_initial(self, build_explainer=True):
+        self._signature = self.signature()
+        self._swap(self.load_artifacts(build_explainer))
+        return self._current
+
+    def _reload(self):
+        with self._reload_lock:
+            started = time.perf_counter()
+            signature = self.signature()
+            try:
+                artifacts = self.load_artifacts()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._failed_signature = signature
+                print(f"⚠️ Model reload failed, keeping v{self._current.version if self._current else '?'}: {e}")
+                return False
+            self._signature = signature
+            self.last_error = None
+            self.last_reload_ms = (time.perf_counter() - started) * 1000
+            self._swap(artifacts)
+            print(f"🔄 Model v{artifacts.version} ({artifacts.model_file}) swapped in")
+            return True
+
+    def reload(self, wait=False):
+        """Load the artifacts in the background and swap them in when ready."""
+        thread = self._reload_thread
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=self._reload, name='model-reload', daemon=True)
+            self._reload_thread = thread
+            thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    # -----------------------------
+    # File watching
+    # -----------------------------
+    def start_watcher(self):
+        if self._watcher is not None or self.watch_interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.watch_interval):
+            signature = self.signature()
+            if signature in (self._signature, self._failed_signature):
+                pending = None
+                continue
+            # retrains write several files; reload once they stop changing
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            self._reload()
+
+    def status(self):
+        current = self._current
+        return {
+            'current': current.describe() if current else None,
+            'swaps': self.swaps,
+            'reloading': bool(self._reload_thread and self._reload_thread.is_alive()),
+            'watching': bool(self._watcher and self._watcher.is_alive()),
+            'watch_interval_seconds': self.watch_interval,
+            'last_reload_ms': self.last_reload_ms,
+            'last_error': self.last_error,
+        }
@@ -1,33 +1,23 @@
 import sqlite3
 import json
-import pandas as pd
 import os
-from datetime import datetime
-import joblib
 
-# --- CONFIG ---
-DB_PATH = 'data/predictions.db'
-CSV_PATH = 'data/FINSENTINAL_FINAL.csv'
-MODEL_PATH = 'models/rf_model.pkl'
-SCALER_PATH = 'models/scaler.pkl'
-FEATURES_PATH = 'models/feature_cols.pkl'
+from history_store import HistoryStore
+from model_registry import ModelRegistry
+from scoring_scheduler import TRACKED_COMPANIES, ScoringScheduler
 
-TRACKED_COMPANIES = [
-    ('Apple Inc.', 'AAPL'),
-    ('Microsoft Corp.', 'MSFT'),
-    ('NVIDIA Corp.', 'NVDA'),
-    ('Meta Platforms', 'META'),
-    ('Amazon.com Inc.', 'AMZN'),
-    ('Tesla Inc.', 'TSLA'),
-    ('Google (Alphabet)', 'GOOGL'),
-    ('Netflix Inc.', 'NFLX'),
-]
+# --- CONFIG ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, 'data', 'predictions.db')
+CSV_PATH = os.path.join(BASE_DIR, 'data', 'FINSENTINAL_FINAL.csv')
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
 
 def get_existing_companies():
     try:
         conn = sqlite3.connect(DB_PATH)
         cur = conn.cursor()
-        cur.execute('SELECT DISTINCT json_extract(payload, "$.company") FROM predictions')
+        # indexed column added by history_store's migration; no JSON decoding
+        cur.execute('SELECT DISTINCT company FROM predictions')
         rows = cur.fetchall()
         conn.close()
         return set(r[0] for r in rows if r[0])
@@ -35,68 +25,27 @@ def get_existing_companies():
         # Table doesn't exist, return empty set
         return set()
 
-def load_model():
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    with open(FEATURES_PATH, 'rb') as f:
-        feature_cols = joblib.load(f)
-    return model, scaler, feature_cols
-
-def get_sample_for_company(df, company_name, ticker):
-    # Try to find a row for this ticker (since 'company' column does not exist)
-    if 'ticker' in df.columns:
-        row = df[df['ticker'].str.upper() == ticker.upper()]
-        if not row.empty:
-            return row.iloc[0]
-    # fallback: any row
-    return df.iloc[0]
-
-def predict_and_store(company_name, ticker, sample, model, scaler, feature_cols):
-    # Ensure columns match by stripping whitespace
-    sample = sample.copy()
-    sample.index = sample.index.str.strip()
-    clean_features = [c.strip() for c in feature_cols]
-    X = sample[clean_features].values.reshape(1, -1)
-    X_scaled = scaler.transform(X)
-    prob = float(model.predict_proba(X_scaled)[0][1])
-    if prob >= 0.7:
-        risk_label = "Healthy"
-    elif prob >= 0.4:
-        risk_label = "Moderate"
-    else:
-        risk_label = "Distressed"
-    payload = sample[clean_features].to_dict()
-    payload['company'] = company_name
-    payload['ticker'] = ticker
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute('INSERT INTO predictions (ts, fdi, risk, confidence, payload) VALUES (?,?,?,?,?)', (
-        datetime.utcnow().isoformat(), prob, risk_label, prob, json.dumps(payload)
-    ))
-    conn.commit()
-    conn.close()
-    print(f"Added prediction for {company_name} ({ticker}): {prob:.2%} ({risk_label})")
-
 def main():
+    # create the table / apply the company+ticker column migration if needed
+    store = HistoryStore(DB_PATH)
+    store.init_schema()
     existing = get_existing_companies()
-    df = pd.read_csv(CSV_PATH)
-    # Compute roa_trend and price_momentum if missing
-    if 'roa_trend' not in df.columns or 'price_momentum' not in df.columns:
-        # Clean up column names for easier access
-        df.columns = [c.strip() for c in df.columns]
-        # Compute roa_trend: 3-year rolling mean of ROA(A) for each ticker
-        if 'roa_trend' not in df.columns:
-            df['roa_trend'] = df.groupby('ticker')['ROA(A) before interest and % after tax'].transform(lambda x: x.rolling(window=3, min_periods=1).mean())
-        # Compute price_momentum: percent change in Close price for each ticker
-        if 'price_momentum' not in df.columns:
-            df['price_momentum'] = df.groupby('ticker')['Close'].transform(lambda x: x.pct_change().fillna(0))
-    model, scaler, feature_cols = load_model()
-    for company_name, ticker in TRACKED_COMPANIES:
+    for company_name, _ in TRACKED_COMPANIES:
         if company_name in existing:
             print(f"{company_name} already has data. Skipping.")
-            continue
-        sample = get_sample_for_company(df, company_name, ticker)
-        predict_and_store(company_name, ticker, sample, model, scaler, feature_cols)
+
+    # same feature pass, model and single-transaction write as the scheduled rescoring;
+    # a company without rows for its ticker is reported below, not scored from another row
+    registry = ModelRegistry(MODEL_DIR)
+    registry.load_initial()
+    scheduler = ScoringScheduler(registry, store, CSV_PATH, interval=0)
+    summary = scheduler.run_once(skip_companies=existing)
+    store.close()
+    for company_name, error in summary['errors'].items():
+        print(f"Skipped {company_name}: {error}")
+    if not summary.get('ok'):
+        print(f"Failed: {summary.get('error')}")
+    print(json.dumps({k: summary.get(k) for k in ('scored', 'model_version', 'duration_ms')}))
     print("\nDone populating missing predictions.")
 
 if __name__ == "__main__":
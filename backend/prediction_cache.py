@@ -0,0 +1,190 @@
+"""
+Prediction Cache
+Scores for repeated feature vectors, keyed on model fingerprint + vector hash
+
+The key is (model name, model fingerprint, blake2b of the float64 feature
+vector the model actually scores), so a hit can skip scaling and inference.
+A new model version has a new fingerprint and can never hit old entries;
+`invalidate()` additionally frees this process's memory as soon as a swap is
+observed.
+
+The in-process TTLCache is always used. With `FINSENTINAL_PREDICTION_CACHE_DB`
+set, a local SQLite file is used as a second level shared by all workers on
+the host (WAL mode, one connection per thread). Workers pick up a new model
+at different times, so shared rows are only ever removed by TTL and size,
+never because one worker stopped serving their model. A failing shared level
+(locked, missing or corrupt file) is logged once and treated as a miss; it
+never fails scoring.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+DEFAULT_CACHE_SIZE = int(os.environ.get('FINSENTINAL_PREDICTION_CACHE_SIZE', 4096))
+DEFAULT_CACHE_TTL = float(os.environ.get('FINSENTINAL_PREDICTION_CACHE_TTL', 900))
+SHARED_DB_PATH = os.environ.get('FINSENTINAL_PREDICTION_CACHE_DB')
+
+# prune expired / excess shared rows once every this many writes
+PRUNE_EVERY = 256
+
+
+def model_fingerprint(model):
+    return str(getattr(model, 'fingerprint', None) or model.version)
+
+
+def vector_key(name, model, row):
+    """Cache key for one feature row (already in the model's column order)."""
+    row = np.ascontiguousarray(row, dtype=np.float64)
+    digest = hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest()
+    return f"{name}:{model_fingerprint(model)}:{digest}"
+
+
+class SQLiteCacheBackend:
+    """Shared second-level cache in a local SQLite file."""
+
+    def __init__(self, db_path, maxsize, ttl):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        # a connection of its own: thread-local ones must not be inherited by forked workers
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_cache (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            value REAL,
+            expires REAL
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_prediction_cache_expires ON prediction_cache(expires)')
+        conn.commit()
+        conn.close()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # a lost cache row is only a miss
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM prediction_cache WHERE key = ? AND expires > ?', (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, fingerprint, value):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO prediction_cache (key, fingerprint, value, expires) VALUES (?, ?, ?, ?)',
+                     (key, fingerprint, value, time.time() + self.ttl))
+        conn.commit()
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM prediction_cache WHERE expires <= ?', (time.time(),))
+        conn.execute('''
+        DELETE FROM prediction_cache WHERE key IN (
+            SELECT key FROM prediction_cache ORDER BY expires DESC LIMIT -1 OFFSET ?
+        )''', (self.maxsize,))
+        conn.commit()
+
+    def size(self):
+        return self._conn().execute('SELECT COUNT(*) FROM prediction_cache').fetchone()[0]
+
+
+class PredictionCache:
+    """LRU + TTL cache of class-1 probabilities in front of model scoring."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL, shared_db=SHARED_DB_PATH):
+        self._memory = TTLCache(maxsize, ttl)
+        self._stats_lock = threading.Lock()
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.invalidations = 0
+        self.shared = None
+        if shared_db:
+            try:
+                self.shared = SQLiteCacheBackend(shared_db, maxsize * 4, ttl)
+            except sqlite3.Error as e:
+                self._shared_failed('open', e)
+
+    def _shared_failed(self, operation, error):
+        # the shared level is only an optimisation: log the first failure, then just count
+        with self._stats_lock:
+            self.shared_errors += 1
+            first = self.shared_errors == 1
+        if first:
+            print(f"⚠️ Shared prediction cache {operation} failed, continuing without it: {error}")
+
+    def get(self, key):
+        value = self._memory.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            value = self.shared.get(key)
+        except sqlite3.Error as e:
+            self._shared_failed('read', e)
+            return None
+        if value is not None:
+            with self._stats_lock:
+                self.shared_hits += 1
+            self._memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        value = float(value)
+        self._memory.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, key.split(':')[1], value)
+            except sqlite3.Error as e:
+                self._shared_failed('write', e)
+
+    def invalidate(self):
+        """Forget this process's cached scores; shared rows just expire."""
+        self._memory.clear()
+        if self.shared is not None:
+            try:
+                self.shared.prune()
+            except sqlite3.Error as e:
+                self._shared_failed('prune', e)
+        with self._stats_lock:
+            self.invalidations += 1
+
+    def _shared_size(self):
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.size()
+        except sqlite3.Error as e:
+            self._shared_failed('read', e)
+            return None
+
+    def stats(self):
+        stats = self._memory.stats()
+        stats.update({
+            'shared_backend': self.shared.db_path if self.shared is not None else None,
+            'shared_hits': self.shared_hits,
+            'shared_size': self._shared_size(),
+            'shared_errors': self.shared_errors,
+            'invalidations': self.invalidations,
+        })
+        # a shared hit counts as a memory miss; report the overall rate too
+        lookups = stats['hits'] + stats['misses']
+        stats['overall_hit_rate'] = (stats['hits'] + self.shared_hits) / lookups if lookups else 0.0
+        return stats
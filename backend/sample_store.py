@@ -0,0 +1,151 @@
+"""
+Sample Store
+Indexed random access into FINSENTINAL_FINAL.csv
+
+The CSV is scanned once to record the byte offset of every data row, plus a
+(ticker, year) index and the summary fields served by /samples. Lookups then
+seek straight to the row instead of re-reading the file. The index is rebuilt
+automatically when the file's mtime or size changes.
+"""
+
+import csv
+import os
+import threading
+
+SUMMARY_FIELDS = ('ticker', 'year', 'Close', 'fdi')
+
+
+def _norm_ticker(value):
+    return (value or '').strip().upper()
+
+
+def _norm_year(value):
+    """Normalise a year so '2019', ' 2019' and '2019.0' compare equal."""
+    value = str(value if value is not None else '').strip()
+    try:
+        f = float(value)
+        if f.is_integer():
+            return str(int(f))
+    except ValueError:
+        pass
+    return value
+
+
+class SampleStore:
+    """Byte-offset index over a CSV file with O(1) row lookups."""
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._header = []
+        self._offsets = []
+        self._summaries = []
+        self._by_ticker = {}
+        self._by_year = {}
+        self._by_ticker_year = {}
+
+    # -----------------------------
+    # Index maintenance
+    # -----------------------------
+    def _file_signature(self):
+        try:
+            st = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Rebuild the index if the file changed since it was last built."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature:
+                return False
+            self._build(signature)
+        return True
+
+    def _build(self, signature):
+        header, offsets, summaries = [], [], []
+        by_ticker, by_year, by_ticker_year = {}, {}, {}
+        if signature is not None:
+            with open(self.csv_path, 'rb') as f:
+                first = f.readline()
+                header = next(csv.reader([first.decode('utf-8-sig')]), [])
+                positions = {name: header.index(name) for name in SUMMARY_FIELDS if name in header}
+                pos = len(first)
+                for line in f:
+                    start = pos
+                    pos += len(line)
+                    if not line.strip():
+                        continue
+                    values = next(csv.reader([line.decode('utf-8')]), [])
+                    idx = len(offsets)
+                    offsets.append(start)
+                    summary = {name: (values[i] if i < len(values) else None) for name, i in positions.items()}
+                    summaries.append(summary)
+                    ticker = _norm_ticker(summary.get('ticker'))
+                    year = _norm_year(summary.get('year'))
+                    by_year.setdefault(year, []).append(idx)
+                    if ticker:
+                        by_ticker.setdefault(ticker, []).append(idx)
+                        by_ticker_year.setdefault((ticker, year), []).append(idx)
+
+        self._header = header
+        self._offsets = offsets
+        self._summaries = summaries
+        self._by_ticker = by_ticker
+        self._by_year = by_year
+        self._by_ticker_year = by_ticker_year
+        self._signature = signature
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def __len__(self):
+        self.refresh()
+        return len(self._offsets)
+
+    def get(self, idx):
+        """Return row `idx` as a dict (like csv.DictReader), or None."""
+        self.refresh()
+        offsets, header = self._offsets, self._header
+        if idx < 0 or idx >= len(offsets):
+            return None
+        with open(self.csv_path, 'rb') as f:
+            f.seek(offsets[idx])
+            line = f.readline().decode('utf-8')
+        values = next(csv.reader([line]), [])
+        return dict(zip(header, values))
+
+    def find(self, ticker=None, year=None):
+        """Return the row ids matching a ticker (and optionally a year)."""
+        self.refresh()
+        if ticker is None:
+            if year is None:
+                return list(range(len(self._offsets)))
+            return list(self._by_year.get(_norm_year(year), []))
+        ticker = _norm_ticker(ticker)
+        if year is None:
+            return list(self._by_ticker.get(ticker, []))
+        return list(self._by_ticker_year.get((ticker, _norm_year(year)), []))
+
+    def page(self, offset=0, limit=50, ticker=None, year=None):
+        """Return (total, items) for a page of sample summaries."""
+        self.refresh()
+        summaries = self._summaries
+        if ticker is None and year is None:
+            total = len(summaries)
+            ids = range(max(offset, 0), min(offset + limit, total))
+        else:
+            matches = self.find(ticker=ticker, year=year)
+            total = len(matches)
+            ids = matches[max(offset, 0):offset + limit]
+        items = []
+        for i in ids:
+            item = {'id': i}
+            item.update({name: summaries[i].get(name) for name in SUMMARY_FIELDS})
+            items.append(item)
+        return total, items
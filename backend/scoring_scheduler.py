@@ -0,0 +1,247 @@
+"""
+Scoring Scheduler
+Periodic rescoring of the tracked company universe
+
+Every `interval` seconds the scheduler takes the latest CSV row per tracked
+ticker, derives `roa_trend` / `price_momentum` in one vectorized groupby pass
+(feature_pipeline), scores all companies with a single predict call on the
+registry's current (already loaded) model and queues the results to the
+history writer as one unit, i.e. one transaction.
+
+The derived feature table is cached per CSV (mtime, size), so unchanged data
+is only rescored, not re-read. With several worker processes an flock on
+`<db>.scoring.lock` lets only one of them run the schedule.
+
+Scheduling is opt-in (FINSENTINAL_SCORING_INTERVAL, default 0 = off) and
+the first run comes one interval after start, so restarting or scaling the
+server does not rescore; POST /scoring/run (or --once) scores right away.
+
+Standalone use:
+    python scoring_scheduler.py [--once] [--interval SECONDS]
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every process schedules
+    fcntl = None
+
+from feature_pipeline import add_derived_features, canonical, pipeline_for
+from history_store import history_row, risk_label
+
+DEFAULT_INTERVAL = float(os.environ.get('FINSENTINAL_SCORING_INTERVAL', 0))
+
+TRACKED_COMPANIES = [
+    ('Apple Inc.', 'AAPL'),
+    ('Microsoft Corp.', 'MSFT'),
+    ('NVIDIA Corp.', 'NVDA'),
+    ('Meta Platforms', 'META'),
+    ('Amazon.com Inc.', 'AMZN'),
+    ('Tesla Inc.', 'TSLA'),
+    ('Google (Alphabet)', 'GOOGL'),
+    ('Netflix Inc.', 'NFLX'),
+]
+
+
+def latest_company_rows(df):
+    """Latest row per ticker (ticker as the index) with the derived features filled in."""
+    df = df.rename(columns=canonical)
+    df['ticker'] = df['ticker'].astype(str).str.strip().str.upper()
+    df = add_derived_features(df)
+    return df.groupby('ticker', sort=False).tail(1).set_index('ticker')
+
+
+class ScoringScheduler:
+    """Background thread that rescores TRACKED_COMPANIES on an interval."""
+
+    def __init__(self, registry, history_store, csv_path, companies=None,
+                 interval=DEFAULT_INTERVAL, lock_path=None):
+        self.registry = registry
+        self.history_store = history_store
+        self.csv_path = csv_path
+        self.companies = list(companies or TRACKED_COMPANIES)
+        self.interval = interval
+        self.lock_path = lock_path or f"{history_store.db_path}.scoring.lock"
+        self._lock_file = None
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._table = None
+        self._table_signature = None
+        self.runs = 0
+        self.last_run = None
+        self.next_run_at = None
+
+    # -----------------------------
+    # Features
+    # -----------------------------
+    def _csv_signature(self):
+        st = os.stat(self.csv_path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def company_table(self):
+        """Latest feature row per ticker, re-read only when the CSV changes."""
+        signature = self._csv_signature()
+        if signature != self._table_signature:
+            import pandas as pd
+            self._table = latest_company_rows(pd.read_csv(self.csv_path))
+            self._table_signature = signature
+        return self._table
+
+    # -----------------------------
+    # One run
+    # -----------------------------
+    def run_once(self, skip_companies=()):
+        """Score every tracked company now; returns the run summary."""
+        with self._run_lock:
+            started = time.perf_counter()
+            summary = {'started_at': datetime.utcnow().isoformat(), 'scored': 0, 'skipped': [], 'errors': {}}
+            try:
+                art = self.registry.current()
+                table = self.company_table()
+                t_features = time.perf_counter()
+
+                companies = [(c, t) for c, t in self.companies if c not in skip_companies]
+                summary['skipped'] = [c for c, _ in self.companies if c in skip_companies]
+                present = [(c, t) for c, t in companies if t in table.index]
+                for company, ticker in companies:
+                    if ticker not in table.index:
+                        summary['errors'][company] = f'no rows for {ticker} in {os.path.basename(self.csv_path)}'
+
+                rows = []
+                if present:
+                    columns = [canonical(c) for c in art.feature_cols]
+                    missing = [c for c in columns if c not in table.columns]
+                    if missing:
+                        raise ValueError(f'CSV lacks model features: {missing}')
+                    X = pipeline_for(art.feature_cols).transform_frame(
+                        table.loc[[t for _, t in present]], fill_value=0.0)
+                    probs = art.predict_positive(X)
+                    t_predict = time.perf_counter()
+
+                    ts = datetime.utcnow().isoformat()
+                    for (company, ticker), x, prob in zip(present, X, probs):
+                        record = dict(zip(art.feature_cols, x.tolist()))
+                        record.update(company=company, ticker=ticker, source='scheduler')
+                        prob = float(prob)
+                        rows.append(history_row(ts, prob, risk_label(prob), record, art.version))
+                    # one unit on the writer queue = one transaction
+                    if not self.history_store.record_many(rows):
+                        raise RuntimeError('history queue full; run dropped')
+                else:
+                    t_predict = time.perf_counter()
+                finished = time.perf_counter()
+                summary.update({
+                    'ok': True,
+                    'scored': len(rows),
+                    'model_version': art.version,
+                    'features_ms': (t_features - started) * 1000,
+                    'predict_ms': (t_predict - t_features) * 1000,
+                    'persist_ms': (finished - t_predict) * 1000,
+                })
+            except Exception as e:
+                summary.update({'ok': False, 'error': f"{type(e).__name__}: {e}"})
+                print(f"⚠️ Scheduled scoring failed: {e}")
+            summary['finished_at'] = datetime.utcnow().isoformat()
+            summary['duration_ms'] = (time.perf_counter() - started) * 1000
+            self.runs += 1
+            self.last_run = summary
+            return summary
+
+    # -----------------------------
+    # Scheduling
+    # -----------------------------
+    def _acquire_process_lock(self):
+        if fcntl is None:
+            return True
+        self._lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+
+    def start(self):
+        """Start the schedule unless disabled or another process already runs it."""
+        if self._thread is not None or self.interval <= 0:
+            return False
+        if not self._acquire_process_lock():
+            return False
+        self._thread = threading.Thread(target=self._loop, name='scoring-scheduler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Run as soon as possible without blocking the caller."""
+        if self._thread is not None and self._thread.is_alive():
+            self._wake.set()
+        else:
+            threading.Thread(target=self.run_once, name='scoring-manual', daemon=True).start()
+
+    def _loop(self):
+        # wait first: a (re)start must not rescore, only the interval or trigger() does
+        while not self._stop.is_set():
+            self.next_run_at = datetime.utcfromtimestamp(time.time() + self.interval).isoformat()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.run_once()
+
+    def status(self):
+        return {
+            'enabled': self._thread is not None and self._thread.is_alive(),
+            'interval_seconds': self.interval,
+            'companies': len(self.companies),
+            'runs': self.runs,
+            'running': self._run_lock.locked(),
+            'last_run': self.last_run,
+            'next_run_at': self.next_run_at if self._thread is not None else None,
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from history_store import HistoryStore
+    from model_registry import ModelRegistry
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Rescore the tracked companies periodically')
+    parser.add_argument('--once', action='store_true', help='score once and exit')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds between runs (default FINSENTINAL_SCORING_INTERVAL, 0 = off)')
+    args = parser.parse_args()
+
+    store = HistoryStore(os.path.join(BASE_DIR, 'data', 'predictions.db'))
+    store.init_schema()
+    store.start()
+    registry = ModelRegistry(os.path.join(BASE_DIR, 'models'))
+    registry.load_initial()
+    scheduler = ScoringScheduler(registry, store, os.path.join(BASE_DIR, 'data', 'FINSENTINAL_FINAL.csv'),
+                                 interval=args.interval)
+    try:
+        if args.once:
+            print(json.dumps(scheduler.run_once(), indent=2))
+        else:
+            registry.start_watcher()
+            if not scheduler.start():
+                raise SystemExit('Scheduling disabled (interval <= 0) or already running in another process')
+            while True:
+                time.sleep(60)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        store.close()
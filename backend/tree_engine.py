@@ -0,0 +1,462 @@
+"""
+Compiled Tree Engine
+Low-latency scoring of the serving tree ensemble with flat NumPy arrays
+
+The RandomForest (sklearn) or XGBoost classifier is flattened into one set of
+node arrays (feature, threshold, left, right, default-left, leaf value) that
+covers every tree. For XGBoost the StandardScaler is folded into the split
+thresholds:
+
+    (x - mean) / scale < t   <=>   x < t * scale + mean      (scale > 0)
+
+so raw feature rows are scored directly, without `scaler.transform` or the
+per-call validation overhead of `predict_proba`. sklearn trees compare the
+float32 cast of the scaled value with a float64 threshold, which folding
+cannot reproduce at a split boundary, so forests scale and cast the rows
+first (`float32_splits`). All trees are traversed in lock step, one
+vectorized step per tree level.
+
+Select it with FINSENTINAL_INFERENCE=compiled; the registry checks it against
+the reference model at load and falls back to the stock path on mismatch.
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+INFERENCE_MODE = os.environ.get('FINSENTINAL_INFERENCE', 'stock').lower()
+
+# default max |p_compiled - p_stock| accepted when verifying at load
+DEFAULT_TOLERANCE = 1e-4
+
+
+class UnsupportedModel(ValueError):
+    """The model cannot be compiled; callers should use the stock path."""
+
+
+def _scaler_params(scaler, n_features):
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    if scaler is not None:
+        if getattr(scaler, 'mean_', None) is not None:
+            mean = np.asarray(scaler.mean_, dtype=np.float64)
+        if getattr(scaler, 'scale_', None) is not None:
+            scale = np.asarray(scaler.scale_, dtype=np.float64)
+    return mean, scale
+
+
+class CompiledTreeEnsemble:
+    """Flat-array tree ensemble producing class-1 probabilities."""
+
+    def __init__(self, feature, threshold, left, right, default_left, value,
+                 roots, max_depth, n_features, kind, base_margin=0.0,
+                 mean=None, scale=None, float32_splits=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        # 'forest': average of leaf probabilities (split test x <= t)
+        # 'xgboost': sigmoid(base margin + sum of leaf margins) (split test x < t)
+        self.kind = kind
+        self.base_margin = float(base_margin)
+        self.mean = mean if mean is not None else np.zeros(self.n_features)
+        self.scale = scale if scale is not None else np.ones(self.n_features)
+        # True: thresholds are in scaled space and rows are scaled, then cast
+        # to float32 like sklearn does; False: thresholds have the scaler folded in
+        self.float32_splits = bool(float32_splits)
+
+    # -----------------------------
+    # Compilation
+    # -----------------------------
+    @classmethod
+    def compile(cls, model, scaler=None):
+        if hasattr(model, 'get_booster'):
+            parts = _flatten_xgboost(model)
+        elif hasattr(model, 'estimators_') or hasattr(model, 'tree_'):
+            parts = _flatten_forest(model)
+        else:
+            raise UnsupportedModel(f'cannot compile {type(model).__name__}')
+
+        mean, scale = _scaler_params(scaler, parts['n_features'])
+        if np.any(scale <= 0):
+            raise UnsupportedModel('scaler has non-positive scale')
+        float32_splits = parts['kind'] != 'xgboost'
+        threshold = parts['threshold'].copy()
+        if not float32_splits:
+            internal = parts['left'] != np.arange(len(threshold))
+            f = parts['feature'][internal]
+            threshold[internal] = threshold[internal] * scale[f] + mean[f]
+        return cls(parts['feature'], threshold, parts['left'], parts['right'],
+                   parts['default_left'], parts['value'], parts['roots'],
+                   parts['max_depth'], parts['n_features'], parts['kind'],
+                   parts.get('base_margin', 0.0), mean, scale, float32_splits)
+
+    def raw_thresholds(self):
+        """(node index, split threshold in raw feature units) of every internal node."""
+        nodes = np.flatnonzero(self.left != np.arange(len(self.left)))
+        threshold = self.threshold[nodes]
+        if self.float32_splits:
+            f = self.feature[nodes]
+            threshold = threshold * self.scale[f] + self.mean[f]
+        return nodes, threshold
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def leaves(self, X):
+        """Leaf node index reached in every tree, shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.float32_splits:
+            # float32 vs float64 compares in float64, as in sklearn's tree code
+            X = self.transform(X).astype(np.float32)
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        rows = np.arange(n_rows)[:, None]
+        strict = self.kind == 'xgboost'
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            thr = self.threshold[nodes]
+            go_left = (x < thr) if strict else (x <= thr)
+            missing = np.isnan(x)
+            if missing.any():
+                go_left = np.where(missing, self.default_left[nodes], go_left)
+            # leaves point at themselves, so finished trees stay put
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_positive(self, X):
+        leaf_values = self.value[self.leaves(X)]
+        if self.kind == 'xgboost':
+            margin = self.base_margin + leaf_values.sum(axis=1)
+            return 1.0 / (1.0 + np.exp(-margin))
+        return leaf_values.mean(axis=1)
+
+    def predict_proba(self, X):
+        """Same layout as sklearn's predict_proba: columns [p0, p1]."""
+        p = self.predict_positive(X)
+        return np.column_stack([1.0 - p, p])
+
+    def transform(self, X):
+        """Scaled features, equivalent to StandardScaler.transform."""
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+    def verify(self, model, scaler, X):
+        """Max absolute difference against the reference model on raw rows X."""
+        X = np.asarray(X, dtype=np.float64)
+        X_scaled = scaler.transform(X) if scaler is not None else X
+        reference = model.predict_proba(X_scaled)[:, 1]
+        return float(np.max(np.abs(reference - self.predict_positive(X)))) if len(X) else 0.0
+
+    def arrays(self):
+        """Flat arrays and scalars describing the ensemble (for export)."""
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'default_left': self.default_left,
+            'value': self.value,
+            'roots': self.roots,
+            'mean': self.mean,
+            'scale': self.scale,
+        }, {
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'base_margin': self.base_margin,
+            'float32_splits': self.float32_splits,
+            'n_trees': int(len(self.roots)),
+            'n_nodes': int(len(self.feature)),
+        }
+
+
+# -----------------------------
+# sklearn forests
+# -----------------------------
+def _flatten_forest(model):
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        estimators = [model]
+    n_classes = getattr(model, 'n_classes_', None)
+    if n_classes != 2 or not all(hasattr(e, 'tree_') for e in estimators):
+        raise UnsupportedModel('only binary sklearn tree classifiers / forests are supported')
+
+    features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in estimators:
+        tree = est.tree_
+        n = tree.node_count
+        idx = np.arange(n)
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+        left = np.where(is_leaf, idx, left) + offset
+        right = np.where(is_leaf, idx, right) + offset
+        counts = tree.value[:, 0, :].astype(np.float64)
+        totals = counts.sum(axis=1)
+        totals[totals == 0] = 1.0
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        features.append(feature)
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+        lefts.append(left)
+        rights.append(right)
+        defaults.append(np.zeros(n, dtype=bool) if missing_left is None else np.asarray(missing_left, dtype=bool))
+        values.append(counts[:, 1] / totals)
+        roots.append(offset)
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += n
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'default_left': np.concatenate(defaults),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'max_depth': max_depth,
+        'n_features': int(getattr(model, 'n_features_in_', estimators[0].tree_.n_features)),
+        'kind': 'forest',
+    }
+
+
+# -----------------------------
+# XGBoost
+# -----------------------------
+def _xgb_base_margin(booster):
+    config = json.loads(booster.save_config())
+    learner = config['learner']
+    objective = learner.get('objective', {}).get('name')
+    if objective != 'binary:logistic':
+        raise UnsupportedModel(f'unsupported XGBoost objective: {objective}')
+    raw = str(learner['learner_model_param']['base_score']).strip('[]')
+    base_score = float(raw)
+    base_score = min(max(base_score, 1e-16), 1 - 1e-16)
+    return math.log(base_score / (1.0 - base_score))
+
+
+def _flatten_xgboost(model):
+    booster = model.get_booster()
+    base_margin = _xgb_base_margin(booster)
+    names = booster.feature_names
+    name_index = {n: i for i, n in enumerate(names)} if names else {}
+
+    dumps = booster.get_dump(dump_format='json')
+    best = getattr(model, 'best_iteration', None) if _has_best_iteration(model) else None
+    if best is not None:
+        per_round = max(1, len(dumps) // max(1, booster.num_boosted_rounds()))
+        dumps = dumps[:(best + 1) * per_round]
+
+    features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for dump in dumps:
+        nodes = {}
+        stack = [(json.loads(dump), 0)]
+        while stack:
+            node, depth = stack.pop()
+            nodes[node['nodeid']] = node
+            max_depth = max(max_depth, depth)
+            for child in node.get('children', ()):
+                stack.append((child, depth + 1))
+        local = {nid: offset + i for i, nid in enumerate(sorted(nodes))}
+        for nid in sorted(nodes):
+            node = nodes[nid]
+            me = local[nid]
+            if 'leaf' in node:
+                features.append(0)
+                thresholds.append(0.0)
+                lefts.append(me)
+                rights.append(me)
+                defaults.append(True)
+                values.append(float(node['leaf']))
+                continue
+            if 'split_condition' not in node:
+                raise UnsupportedModel('categorical XGBoost splits are not supported')
+            split = node['split']
+            if split in name_index:
+                feature = name_index[split]
+            elif split.startswith('f') and split[1:].isdigit():
+                feature = int(split[1:])
+            else:
+                raise UnsupportedModel(f'unknown XGBoost split feature: {split}')
+            features.append(feature)
+            thresholds.append(float(node['split_condition']))
+            lefts.append(local[node['yes']])
+            rights.append(local[node['no']])
+            defaults.append(node.get('missing', node['yes']) == node['yes'])
+            values.append(0.0)
+        roots.append(local[0])
+        offset += len(nodes)
+
+    n_features = booster.num_features()
+    return {
+        'feature': np.asarray(features, dtype=np.int64),
+        'threshold': np.asarray(thresholds, dtype=np.float64),
+        'left': np.asarray(lefts, dtype=np.int64),
+        'right': np.asarray(rights, dtype=np.int64),
+        'default_left': np.asarray(defaults, dtype=bool),
+        'value': np.asarray(values, dtype=np.float64),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'max_depth': max_depth,
+        'n_features': n_features,
+        'kind': 'xgboost',
+        'base_margin': base_margin,
+    }
+
+
+def _has_best_iteration(model):
+    try:
+        return model.best_iteration is not None
+    except AttributeError:
+        return False
+
+
+def verification_rows(scaler, n_features, n_rows=256, seed=0, engine=None):
+    """Synthetic raw rows spread around the scaler's training distribution.
+
+    With an `engine`, as many rows again put one feature on a split
+    threshold of the engine or one float32 step either side of it, where a
+    rounding difference to the reference model would send a row down the
+    other branch; random rows almost never land there.
+    """
+    mean, scale = _scaler_params(scaler, n_features)
+    rng = np.random.default_rng(seed)
+    rows = mean + rng.standard_normal((n_rows, n_features)) * scale * 2.0
+    if engine is None or n_rows == 0:
+        return rows
+    nodes, raw = engine.raw_thresholds()
+    if len(nodes) == 0:
+        return rows
+    pick = rng.integers(0, len(nodes), n_rows)
+    f = engine.feature[nodes[pick]]
+    # the threshold in scaled float32 space and its neighbours, back in raw units
+    t = ((raw[pick] - mean[f]) / scale[f]).astype(np.float32)
+    step = rng.integers(-1, 2, n_rows)
+    t = np.where(step < 0, np.nextafter(t, np.float32(-np.inf)),
+                 np.where(step > 0, np.nextafter(t, np.float32(np.inf)), t))
+    boundary = rows[rng.integers(0, n_rows, n_rows)].copy()
+    boundary[np.arange(n_rows), f] = np.where(step == 0, raw[pick], t.astype(np.float64) * scale[f] + mean[f])
+    return np.vstack([rows, boundary])
+
+
+# -----------------------------
+# Zero-pickle bundle
+# -----------------------------
+BUNDLE_FORMAT = 'finsentinal-tree-bundle'
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+
+def save_bundle(engine, feature_cols, metadata, bundle_dir):
+    """Write the engine as flat .npy arrays plus a JSON manifest.
+
+    Each export goes to its own sibling directory (`bundle.v<time>-<pid>`)
+    and `bundle_dir` is a symlink switched to it with a single rename, so
+    the path always resolves to one complete bundle. The previous version
+    is kept for readers still opening it. Without symlink support (Windows
+    without the privilege) the directory itself is renamed into place.
+    """
+    bundle_dir = os.path.abspath(bundle_dir)
+    version_dir = f"{bundle_dir}.v{time.time_ns()}-{os.getpid()}"
+    os.makedirs(version_dir)
+    arrays, info = engine.arrays()
+    entries = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        np.save(os.path.join(version_dir, f"{name}.npy"), array, allow_pickle=False)
+        entries[name] = {'file': f"{name}.npy", 'dtype': str(array.dtype), 'shape': list(array.shape)}
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'feature_cols': list(feature_cols),
+        'engine': info,
+        'arrays': entries,
+        'metadata': metadata,
+    }
+    with open(os.path.join(version_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    if _point_link(bundle_dir, version_dir):
+        _prune_versions(bundle_dir)
+    else:
+        _rename_into_place(version_dir, bundle_dir)
+    return bundle_dir
+
+
+def _point_link(bundle_dir, version_dir):
+    """Atomically point the `bundle_dir` symlink at `version_dir`; False without symlinks."""
+    link_tmp = f"{bundle_dir}.link-{os.getpid()}"
+    try:
+        os.symlink(os.path.basename(version_dir), link_tmp, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        return False
+    if os.path.isdir(bundle_dir) and not os.path.islink(bundle_dir):
+        # a bundle exported before the versioned layout: moved aside once, pruned below
+        os.replace(bundle_dir, f"{bundle_dir}.v0-{os.getpid()}")
+    os.replace(link_tmp, bundle_dir)
+    return True
+
+
+def _prune_versions(bundle_dir, keep_previous=1):
+    parent, base = os.path.split(bundle_dir)
+    current = os.path.basename(os.path.realpath(bundle_dir))
+    pattern = re.compile(re.escape(base) + r'\.v(\d+)-\d+$')
+    versions = sorted((int(m.group(1)), m.group(0)) for m in map(pattern.match, os.listdir(parent))
+                      if m and m.group(0) != current)
+    for _, name in versions[:max(0, len(versions) - keep_previous)]:
+        shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def _rename_into_place(version_dir, bundle_dir):
+    old_dir = None
+    if os.path.lexists(bundle_dir):
+        old_dir = f"{bundle_dir}.old-{os.getpid()}"
+        os.replace(bundle_dir, old_dir)
+    os.replace(version_dir, bundle_dir)
+    if old_dir:
+        if os.path.islink(old_dir):
+            os.remove(old_dir)
+        else:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_bundle(bundle_dir, mmap=True):
+    """Load (engine, feature_cols, manifest) from a bundle directory.
+
+    With `mmap=True` the arrays are opened with np.load(mmap_mode='r'), so
+    every worker process maps the same page-cache pages instead of holding
+    a private unpickled copy.
+    """
+    # resolve the symlink once, so the manifest and arrays come from one version
+    bundle_dir = os.path.realpath(bundle_dir)
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"{bundle_dir} is not a {BUNDLE_FORMAT}")
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        arrays[name] = np.load(os.path.join(bundle_dir, entry['file']),
+                               mmap_mode='r' if mmap else None, allow_pickle=False)
+    info = manifest['engine']
+    engine = CompiledTreeEnsemble(
+        arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+        arrays['default_left'], arrays['value'], arrays['roots'],
+        info['max_depth'], info['n_features'], info['kind'], info.get('base_margin', 0.0),
+        arrays['mean'], arrays['scale'], info.get('float32_splits', False),
+    )
+    return engine, manifest['feature_cols'], manifest
@@ -0,0 +1,216 @@
+"""
+Hyperparameter Search
+K-fold random search / successive halving for the XGBoost models
+
+Fold splits are made once: each fold's scaler is fitted on its training part
+and the scaled train/validation matrices are saved as `.npy` files in the
+work dir. Worker processes memory-map them in the pool initializer and build
+one DMatrix per fold, so trials never rescale or copy the data again.
+
+Every finished trial is appended to `trials.jsonl` (one JSON object per line,
+flushed immediately). Trial parameters are derived from (seed, trial id), so
+an interrupted search re-run with the same settings skips the logged trials
+and continues where it stopped.
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+import numpy as np
+
+DEFAULT_FOLDS = 5
+DEFAULT_TRIALS = 30
+DEFAULT_MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+HALVING_ETA = 3
+HALVING_RUNGS = 3
+
+TRIAL_LOG = 'trials.jsonl'
+FOLD_DIRNAME = 'folds'
+
+
+def sample_params(seed, trial):
+    """Parameters for one trial; deterministic in (seed, trial)."""
+    rng = np.random.default_rng([seed, trial])
+    return {
+        'max_depth': int(rng.integers(3, 9)),
+        'learning_rate': float(10 ** rng.uniform(-2, math.log10(0.3))),
+        'subsample': float(rng.uniform(0.6, 1.0)),
+        'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+        'min_child_weight': float(10 ** rng.uniform(0, 1)),
+        'reg_lambda': float(10 ** rng.uniform(-1, 1)),
+    }
+
+
+# -----------------------------
+# Cached folds
+# -----------------------------
+def dataset_hash(X, y):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+def prepare_folds(X, y, work_dir, n_folds=DEFAULT_FOLDS, seed=42):
+    """Split, scale and save the folds once; returns the fold directory.
+
+    The directory name includes the data hash, fold count and seed, so a
+    changed dataset gets fresh folds and an unchanged one reuses them.
+    """
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.preprocessing import StandardScaler
+
+    fold_dir = os.path.join(work_dir, FOLD_DIRNAME, f"{dataset_hash(X, y)}-k{n_folds}-s{seed}")
+    if os.path.exists(os.path.join(fold_dir, 'folds.json')):
+        return fold_dir
+
+    tmp_dir = f"{fold_dir}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    for i, (train_idx, val_idx) in enumerate(splitter.split(X, y)):
+        scaler = StandardScaler()
+        parts = {
+            'X_train': scaler.fit_transform(X[train_idx]).astype(np.float32),
+            'y_train': y[train_idx].astype(np.float32),
+            'X_val': scaler.transform(X[val_idx]).astype(np.float32),
+            'y_val': y[val_idx].astype(np.float32),
+        }
+        for name, array in parts.items():
+            np.save(os.path.join(tmp_dir, f"fold{i}_{name}.npy"), array, allow_pickle=False)
+    with open(os.path.join(tmp_dir, 'folds.json'), 'w') as f:
+        json.dump({'folds': n_folds, 'seed': seed, 'rows': int(len(y)), 'features': int(X.shape[1])}, f)
+    os.replace(tmp_dir, fold_dir)
+    return fold_dir
+
+
+# worker process state, filled by _init_worker
+_FOLDS = []
+
+
+def _init_worker(fold_dir, n_threads):
+    import xgboost as xgb
+
+    with open(os.path.join(fold_dir, 'folds.json'), 'r') as f:
+        n_folds = json.load(f)['folds']
+    _FOLDS.clear()
+    for i in range(n_folds):
+        load = lambda name: np.load(os.path.join(fold_dir, f"fold{i}_{name}.npy"), mmap_mode='r')
+        _FOLDS.append((
+            xgb.DMatrix(load('X_train'), label=load('y_train'), nthread=n_threads),
+            xgb.DMatrix(load('X_val'), label=load('y_val'), nthread=n_threads),
+        ))
+
+
+def _evaluate(trial, rung, params, max_rounds, n_threads):
+    """Cross-validate one configuration on the worker's cached folds."""
+    import xgboost as xgb
+
+    started = time.perf_counter()
+    booster_params = dict(params, objective='binary:logistic', eval_metric='logloss',
+                          nthread=n_threads, seed=42)
+    losses, iterations = [], []
+    for dtrain, dval in _FOLDS:
+        booster = xgb.train(booster_params, dtrain, num_boost_round=max_rounds,
+                            evals=[(dval, 'val')], early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                            verbose_eval=False)
+        losses.append(float(booster.best_score))
+        iterations.append(int(booster.best_iteration) + 1)
+    return {
+        'trial': trial,
+        'rung': rung,
+        'budget': max_rounds,
+        'params': params,
+        'logloss': float(np.mean(losses)),
+        'fold_logloss': losses,
+        'best_iterations': iterations,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+# -----------------------------
+# Search
+# -----------------------------
+def _read_log(path, signature):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interruption
+            if record.get('signature') == signature:
+                done[(record['trial'], record['rung'])] = record
+    return done
+
+
+def _rungs(strategy, n_trials, max_rounds):
+    """[(rung, budget, number of configs kept)] for the search strategy."""
+    if strategy == 'random':
+        return [(0, max_rounds, n_trials)]
+    rungs = []
+    for rung in range(HALVING_RUNGS):
+        budget = max(EARLY_STOPPING_ROUNDS * 2, max_rounds // HALVING_ETA ** (HALVING_RUNGS - 1 - rung))
+        keep = max(1, math.ceil(n_trials / HALVING_ETA ** rung))
+        rungs.append((rung, budget, keep))
+    return rungs
+
+
+def run_search(X, y, work_dir, strategy='random', n_trials=DEFAULT_TRIALS, n_folds=DEFAULT_FOLDS,
+               max_rounds=DEFAULT_MAX_ROUNDS, workers=1, threads=1, seed=42, fresh=False):
+    """Run (or resume) a search; returns (best trial record, all final-rung records).
+
+    `strategy` is 'random' (every trial at the full round budget) or
+    'halving' (all trials at a small budget, the best 1/3 promoted to the
+    next budget, and so on). Early stopping applies in both.
+    """
+    if strategy not in ('random', 'halving'):
+        raise ValueError(f"Unknown strategy {strategy!r} (use random or halving)")
+    os.makedirs(work_dir, exist_ok=True)
+    fold_dir = prepare_folds(X, y, work_dir, n_folds=n_folds, seed=seed)
+    signature = hashlib.blake2b(json.dumps(
+        [os.path.basename(fold_dir), strategy, n_trials, max_rounds, seed]).encode(), digest_size=6).hexdigest()
+    log_path = os.path.join(work_dir, TRIAL_LOG)
+    if fresh and os.path.exists(log_path):
+        os.remove(log_path)
+    done = _read_log(log_path, signature)
+    if done:
+        print(f"↩️  Resuming: {len(done)} trial(s) already in {log_path}")
+
+    candidates = list(range(n_trials))
+    records = []
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(fold_dir, threads)) as pool, \
+            open(log_path, 'a', encoding='utf-8') as log:
+        for rung, budget, keep in _rungs(strategy, n_trials, max_rounds):
+            candidates = candidates[:keep]
+            records = [done[(t, rung)] for t in candidates if (t, rung) in done]
+            pending = [t for t in candidates if (t, rung) not in done]
+            futures = [pool.submit(_evaluate, t, rung, sample_params(seed, t), budget, threads) for t in pending]
+            for future in as_completed(futures):
+                record = dict(future.result(), signature=signature)
+                log.write(json.dumps(record) + '\n')
+                log.flush()
+                records.append(record)
+                print(f"   trial {record['trial']:>3} rung {rung} ({budget} rounds): "
+                      f"logloss {record['logloss']:.5f}  [{record['seconds']:.1f}s]")
+            records.sort(key=lambda r: r['logloss'])
+            candidates = [r['trial'] for r in records]
+
+    best = records[0]
+    return best, records
+
+
+def best_config(record):
+    """XGBClassifier parameters for a trial, n_estimators from early stopping."""
+    params = dict(record['params'])
+    params['n_estimators'] = int(round(np.mean(record['best_iterations'])))
+    return params
@@ -0,0 +1,88 @@
+"""
+Warm-up
+Loading of optional subsystems after startup, and readiness
+
+A Warmup runs named tasks (SHAP explainer, bankruptcy model, market data
+client) one after another, inline with `run()` or in a daemon thread with
+`start()`. Every subsystem also loads on first use, so a task that fails is
+recorded and the next one runs; a request that needs the subsystem first
+simply pays its load. `finished()` turns true once every task has run (or
+they were all skipped) and backs the /ready probe.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+
+class Warmup:
+    """Ordered warm-up tasks with per-task status and timing."""
+
+    def __init__(self):
+        # [(name, callable)]
+        self._tasks = []
+        # name -> {'status': pending|running|done|failed|skipped, 'ms', 'error'}
+        self._state = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self.mode = None
+        self.started_at = None
+        self.finished_at = None
+
+    def add(self, name, fn):
+        self._tasks.append((name, fn))
+        self._state[name] = {'status': 'pending', 'ms': None, 'error': None}
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._state[name].update(fields)
+
+    def run(self, mode='eager'):
+        """Run every task in this thread."""
+        self.mode = mode
+        self.started_at = datetime.utcnow().isoformat()
+        for name, fn in self._tasks:
+            self._set(name, status='running')
+            started = time.perf_counter()
+            try:
+                fn()
+                status, error = 'done', None
+            except Exception as e:
+                status, error = 'failed', f"{type(e).__name__}: {e}"
+                print(f"⚠️ Warm-up of {name} failed (it loads on first use instead): {e}")
+            self._set(name, status=status, error=error, ms=(time.perf_counter() - started) * 1000)
+        self.finished_at = datetime.utcnow().isoformat()
+        self._done.set()
+
+    def start(self):
+        """Run the tasks in a background thread (once per process)."""
+        if self._thread is not None or self._done.is_set():
+            return
+        self._thread = threading.Thread(target=self.run, args=('background',), name='warmup', daemon=True)
+        self._thread.start()
+
+    def skip(self):
+        """Leave every subsystem to load on first use."""
+        self.mode = 'lazy'
+        for name, _ in self._tasks:
+            self._set(name, status='skipped')
+        self.finished_at = datetime.utcnow().isoformat()
+        self._done.set()
+
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def status(self):
+        with self._lock:
+            tasks = {name: dict(state) for name, state in self._state.items()}
+        return {
+            'mode': self.mode,
+            'finished': self.finished(),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'tasks': tasks,
+        }
@@ -0,0 +1,21 @@
+"""
+WSGI entry point for production serving
+
+    gunicorn -c gunicorn.conf.py wsgi:app      (from backend/)
+
+Importing this module builds the app: the history schema, the sample CSV
+index, the FDI model and, with the default eager startup, the SHAP
+explainer, bankruptcy model and yfinance are loaded here. With gunicorn's
+preload_app that happens once in the master, and the forked workers share
+those pages copy-on-write. Background threads are started in each worker by
+gunicorn.conf.py (or by its first request under other servers).
+
+FINSENTINAL_STARTUP=background|lazy trades that sharing for a faster master
+start: each worker then warms up (or loads on first use) on its own.
+"""
+
+import os
+
+from app import create_app
+
+app = create_app(start_threads=False, startup=os.environ.get('FINSENTINAL_STARTUP', 'eager'))
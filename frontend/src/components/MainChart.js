@@ -10,6 +10,7 @@ import {
   Filler,
   Legend,
 } from 'chart.js';
+import { historyStreamSupported, subscribeHistory } from '../utils/historyStream';
 
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Tooltip, Filler, Legend);
 
@@ -17,14 +18,25 @@ export default function MainChart({ selectedCompany }) {
   const [history, setHistory] = useState([]);
   const [lastUpdated, setLastUpdated] = useState(null);
   const mountedRef = useRef(true);
+  const lastIdRef = useRef(null);
 
+  // Poll incrementally: only rows newer than the last seen id, without payloads.
+  // Unchanged polls come back as 304 and leave the chart untouched.
   const fetchHistory = async () => {
     try {
-      const res = await fetch('/history?limit=100');
+      const cursor = lastIdRef.current != null ? `&since_id=${lastIdRef.current}` : '';
+      const res = await fetch(`/history?limit=100&fields=id,ts,fdi,risk,company,ticker${cursor}`);
       if (!res.ok) return;
       const j = await res.json();
       if (Array.isArray(j.history)) {
-        setHistory(j.history);
+        if (j.last_id != null) lastIdRef.current = Math.max(lastIdRef.current ?? j.last_id, j.last_id);
+        if (j.history.length > 0 || cursor === '') {
+          setHistory(prev => {
+            if (!cursor) return j.history.slice(-100);
+            const seen = new Set(prev.map(h => h.id));
+            return [...prev, ...j.history.filter(h => !seen.has(h.id))].slice(-100);
+          });
+        }
         setLastUpdated(new Date());
       }
     } catch (e) {
@@ -35,6 +47,26 @@ export default function MainChart({ selectedCompany }) {
   useEffect(() => {
     mountedRef.current = true;
     fetchHistory();
+    // Prefer pushed updates; fall back to polling without EventSource support
+    if (historyStreamSupported()) {
+      const unsubscribe = subscribeHistory((type, row) => {
+        if (!mountedRef.current) return;
+        if (type === 'resync') {
+          // we missed rows: reload the latest 100 instead of paging on from the old cursor
+          lastIdRef.current = null;
+          fetchHistory();
+          return;
+        }
+        if (lastIdRef.current != null && row.id <= lastIdRef.current) return;
+        lastIdRef.current = row.id;
+        setHistory(prev => [...prev, row].slice(-100));
+        setLastUpdated(new Date());
+      });
+      return () => {
+        mountedRef.current = false;
+        unsubscribe();
+      };
+    }
     const id = setInterval(() => {
       if (mountedRef.current) fetchHistory();
     }, 5000);
@@ -47,8 +79,8 @@ export default function MainChart({ selectedCompany }) {
   // Filter by selected company if provided
   const filtered = selectedCompany
     ? history.filter(h => {
-        const name = h.payload?.company || '';
-        const ticker = h.payload?.ticker || '';
+        const name = h.company || '';
+        const ticker = h.ticker || '';
         return (
           name.toLowerCase().includes(selectedCompany.toLowerCase()) ||
           selectedCompany.toLowerCase().includes(ticker.toLowerCase())
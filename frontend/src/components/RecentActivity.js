@@ -1,4 +1,19 @@
 import React, { useEffect, useState } from 'react';
+import { subscribeHistory } from '../utils/historyStream';
+
+// newest first, one entry per id
+const mergeNewestFirst = (rows, limit) => {
+  const seen = new Set();
+  return rows
+    .filter(row => {
+      if (row.id == null) return true;
+      if (seen.has(row.id)) return false;
+      seen.add(row.id);
+      return true;
+    })
+    .sort((a, b) => (b.id ?? 0) - (a.id ?? 0))
+    .slice(0, limit);
+};
 
 export default function RecentActivity({ limit = 10 }) {
   const [activities, setActivities] = useState([]);
@@ -12,7 +27,8 @@ export default function RecentActivity({ limit = 10 }) {
         if (!res.ok) return;
         const data = await res.json();
         if (mounted && data.history) {
-          setActivities(data.history.slice(0, limit));
+          // /history is oldest first; keep rows streamed while the fetch was in flight
+          setActivities(prev => mergeNewestFirst([...prev, ...data.history], limit));
         }
       } catch (err) {
         console.error('Failed to fetch activity:', err);
@@ -20,7 +36,16 @@ export default function RecentActivity({ limit = 10 }) {
         if (mounted) setLoading(false);
       }
     })();
-    return () => (mounted = false);
+    // New predictions are pushed by the server; newest first
+    const unsubscribe = subscribeHistory((type, row) => {
+      if (mounted && type === 'prediction') {
+        setActivities(prev => mergeNewestFirst([row, ...prev], limit));
+      }
+    });
+    return () => {
+      mounted = false;
+      unsubscribe();
+    };
   }, [limit]);
 
   const formatTime = (timestamp) => {
@@ -75,8 +100,8 @@ export default function RecentActivity({ limit = 10 }) {
     <div className="activity-log">
       <h4>📊 Recent Activity</h4>
       {activities.map((activity, idx) => {
-        const company = activity.payload?.company || 'Unknown';
-        const ticker = activity.payload?.ticker || '';
+        const company = activity.company || activity.payload?.company || 'Unknown';
+        const ticker = activity.ticker || activity.payload?.ticker || '';
         const fdi = activity.fdi ? `${(activity.fdi * 100).toFixed(0)}%` : 'N/A';
         const riskColor = getRiskColor(activity.risk);
         
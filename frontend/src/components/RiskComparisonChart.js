@@ -11,18 +11,14 @@ export default function RiskComparisonChart() {
     let mounted = true;
     (async () => {
       try {
-        const res = await fetch('/history?limit=200');
+        // Latest FDI for each company, grouped server-side
+        const res = await fetch('/history/latest');
         if (!res.ok) return;
         const data = await res.json();
-        const history = data.history || [];
 
-        // Group by company and get latest FDI for each
         const companyFdiMap = {};
-        history.forEach((h) => {
-          const company = h.payload?.company || 'Unknown';
-          if (!companyFdiMap[company]) {
-            companyFdiMap[company] = h.fdi * 100; // Convert to percentage
-          }
+        (data.latest || []).forEach((h) => {
+          companyFdiMap[h.company] = h.fdi * 100; // Convert to percentage
         });
 
         // Sort by company name
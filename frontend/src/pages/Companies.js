@@ -20,17 +20,13 @@ export default function Companies() {
     let mounted = true;
     (async () => {
       try {
-        const res = await fetch('/history?limit=200');
+        // Latest FDI/risk for each company, grouped server-side
+        const res = await fetch('/history/latest');
         if (!res.ok) return;
         const data = await res.json();
-        const history = data.history || [];
-        // Get latest FDI/risk for each company
         const latestByCompany = {};
-        history.forEach((h) => {
-          const name = h.payload?.company || 'Unknown';
-          if (!latestByCompany[name]) {
-            latestByCompany[name] = h;
-          }
+        (data.latest || []).forEach((h) => {
+          latestByCompany[h.company] = h;
         });
         // Only show tracked companies
         const tracked = Object.keys(companyMeta).map((name) => {
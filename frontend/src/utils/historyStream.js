@@ -0,0 +1,36 @@
+// Shared subscription to the backend's /history/stream server-sent events.
+// All components in a tab share one EventSource; it is opened for the first
+// listener and closed when the last one unsubscribes.
+
+const listeners = new Set();
+let source = null;
+
+const dispatch = (type, data) => {
+  listeners.forEach((listener) => {
+    try {
+      listener(type, data);
+    } catch (e) {
+      console.error('History stream listener failed:', e);
+    }
+  });
+};
+
+export const historyStreamSupported = () => typeof EventSource !== 'undefined';
+
+// listener(type, data): type is 'prediction' (data = history row) or 'resync'
+export const subscribeHistory = (listener) => {
+  if (!historyStreamSupported()) return () => {};
+  listeners.add(listener);
+  if (!source) {
+    source = new EventSource('/history/stream');
+    source.addEventListener('prediction', (e) => dispatch('prediction', JSON.parse(e.data)));
+    source.addEventListener('resync', () => dispatch('resync', null));
+  }
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+    }
+  };
+};